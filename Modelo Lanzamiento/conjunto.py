@@ -0,0 +1,465 @@
+# -*- coding: utf-8 -*-
+"""
+@author: Team REOS
+
+Módulo que contiene la integración en conjunto de N lanzamientos a la vez
+(por ejemplo, para estudios de dispersión). Las posiciones y velocidades se
+guardan en arrays (N, 3) y las masas, tiempos y pérdidas en arrays (N,), de
+modo que cada paso de integración se calcula de forma vectorizada para
+todos los lanzadores que siguen en vuelo.
+
+Cada lanzador lleva su propia fase (retardos de encendido, etapas y vuelo
+libre final) y sus propios eventos. Los lanzadores que han terminado se
+enmascaran y dejan de integrarse.
+
+El esquema de integración es el de paso fijo de integracion.py, por lo que
+un conjunto de un único lanzador reproduce integracion.lanzamiento() con
+rtol=None.
+"""
+
+from collections import namedtuple
+
+from numpy import (asarray, broadcast_to, zeros, empty, full, inf, nan,
+                   minimum, maximum, where, flatnonzero, newaxis, degrees,
+                   arccos, einsum, clip)
+from numpy.linalg import norm
+
+from mecanica import (fuerzas_conjunto, ley_alfa_conjunto, FuerzasConjunto,
+                      ProgramaAlfa)
+from integracion import DT, estado_taylor, posicion_fuerzas
+from modulos.aerodinamica.aero_misil import (ConfiguracionVuelo,
+                                              coeficientes_configuracion,
+                                              cd_vectorizado, cn_vectorizado)
+from modulos.aerodinamica.geometria_misil import GEOMETRIA_NOMINAL
+from modulos.atmosfera.gravedad import RT
+from modulos.eventos import (buscar_eventos, terminar_en_evento,
+                             evento_techo, evento_caida, evento_impacto,
+                             ALTURA_IMPACTO)
+from modulos.tiempo.division_temporal import tiempos_lanzamiento
+from inputs_iniciales import GAMMA_INY_MIN
+
+T_VUELO_LIBRE = 3000  # Duración máxima del vuelo libre final (s)
+GAMMA_CAIDA = -5.0  # Ángulo de trayectoria que termina un vuelo libre (deg)
+MIN_VECTORIZADO = 16  # Lanzadores a partir de los que se vectoriza cd y cn
+
+
+class ResultadoConjunto(namedtuple('ResultadoConjunto',
+                                   ['masa', 'tiempo', 'posicion',
+                                    'velocidad', 'gamma', 'gam_iny', 'v_iny',
+                                    'vloss', 'final'])):
+    '''
+    Resultado de lanzamiento_conjunto(). Todos los atributos son arrays con
+    un elemento (o una fila) por lanzador.
+
+    Atributos
+    ---------
+    masa, tiempo, posicion, velocidad, gamma, vloss : array
+        Estado final de cada lanzador, como en integracion.lanzamiento().
+
+    gam_iny, v_iny : array (N,)
+        Ángulo de trayectoria (deg) y velocidad (m/s) de inyección. Valen
+        nan si el lanzador no ha llegado al final de la última etapa.
+
+    final : array (N,)
+        Motivo por el que termina cada lanzamiento: 'techo' (se supera la
+        altura máxima), 'inyeccion' (el gamma de inyección no es admisible),
+        'caida' (durante el vuelo libre final), 'impacto' (el lanzador
+        llega al suelo durante cualquier vuelo libre) y 'vuelo_libre' (se
+        completa el vuelo libre final).
+    '''
+    __slots__ = ()
+
+
+def angulo_trayectoria_conjunto(pos, vel):
+    '''
+    Ángulo de la trayectoria sobre el horizonte local (deg) de un conjunto
+    de lanzadores.
+
+    pos, vel : array (N, 3)
+        Vectores posición y velocidad.
+    '''
+    cos_angulo = (einsum('ij,ij->i', vel, pos)
+                  / (norm(vel, axis=1) * norm(pos, axis=1)))
+    return 90 - degrees(arccos(clip(cos_angulo, -1, 1)))
+
+
+def coeficientes_conjunto(etapa, alfa, propulsion, aletas, ala, delta=0,
+                          geometria=GEOMETRIA_NOMINAL, tabla=None):
+    '''
+    Devuelve la función coeficientes(mach, altur) que utiliza
+    mecanica.fuerzas_conjunto() para obtener los coeficientes de resistencia
+    y normal de N lanzadores, cada uno con su propia configuración.
+
+    A partir de MIN_VECTORIZADO lanzadores se evalúan con una única llamada
+    a las versiones vectorizadas de aero_misil; con menos, el coste fijo de
+    las operaciones con arrays supera al de evaluarlos uno a uno con
+    aero_misil.coeficientes_configuracion(). Si se indica una tabla, los
+    coeficientes de cada lanzador se interpolan en ella.
+
+    etapa, alfa, propulsion, aletas, ala : array (N,)
+        Configuración de cada lanzador: etapa, ángulo de ataque (rad) y si
+        tiene propulsión, aletas y ala.
+
+    delta : float
+        Deflexión de mando (rad), común a todos. Por defecto es delta=0.
+
+    geometria : GeometriaLanzador
+        Geometría de los lanzadores, común a todos. Por defecto es
+        GEOMETRIA_NOMINAL.
+
+    tabla : object
+        Base de datos de coeficientes aerodinámicos
+        (modulos.aerodinamica.tabla_aerodinamica.TablaAerodinamica). Si
+        tabla=None, se evalúa el modelo analítico. Por defecto es
+        tabla=None.
+    '''
+    def coeficientes(mach, altur):
+        if tabla is None and len(mach) >= MIN_VECTORIZADO:
+            return (cd_vectorizado(mach, altur, etapa, delta, alfa,
+                                   propulsion, aletas, ala, geometria),
+                    cn_vectorizado(mach, etapa, delta, alfa, propulsion,
+                                   aletas, ala, geometria))
+        cd = empty(len(mach))
+        cn = empty(len(mach))
+        for j in range(len(mach)):
+            configuracion = ConfiguracionVuelo(int(etapa[j]), delta,
+                                               float(alfa[j]),
+                                               bool(propulsion[j]),
+                                               bool(aletas[j]), bool(ala[j]),
+                                               geometria)
+            if tabla is None:
+                cd[j], cn[j] = coeficientes_configuracion(configuracion,
+                                                          mach[j], altur[j])
+            else:
+                cd[j] = tabla.cd(configuracion, mach[j], altur[j])
+                cn[j] = tabla.cn(configuracion, mach[j])
+        return cd, cn
+
+    return coeficientes
+
+
+def step_conjunto(mas, tie, pos, vel, gasto, isp, alfa, coeficientes, vloss,
+                  masa_minima, step_size, fue, geometria=GEOMETRIA_NOMINAL):
+    '''
+    Paso de integración de un conjunto de N lanzadores. Es la versión
+    vectorizada de integracion.step() (con perdidas=True): devuelve la masa,
+    el tiempo, la posición, la velocidad, las pérdidas y el registro de
+    fuerzas (mecanica.FuerzasConjunto) del estado final.
+
+    mas, tie, gasto, isp, alfa, vloss, masa_minima, step_size : array (N,)
+        Masas, tiempos, gastos másicos, impulsos específicos, ángulos de
+        ataque (rad) del paso, pérdidas, masas mínimas y saltos temporales
+        de cada lanzador.
+
+    pos, vel : array (N, 3)
+        Posiciones y velocidades.
+
+    coeficientes : function
+        Función de los coeficientes aerodinámicos (ver
+        coeficientes_conjunto()).
+
+    fue : object
+        Registro de fuerzas del estado inicial.
+
+    geometria : GeometriaLanzador
+        Geometría de los lanzadores. Por defecto es GEOMETRIA_NOMINAL.
+    '''
+    dtl = step_size
+    masa = maximum(mas - gasto * dtl, masa_minima)
+    tiempo = tie + dtl
+
+    acc = fue.aceleracion((mas + masa) / 2)
+    posicion = pos + vel * dtl[:, newaxis] + .5 * acc * dtl[:, newaxis]**2
+    velocidad = vel + acc * dtl[:, newaxis]
+
+    fue_final = fuerzas_conjunto(posicion_fuerzas(posicion), velocidad, masa,
+                                 gasto, isp, alfa, coeficientes, geometria)
+
+    # Pérdida de velocidad (regla del trapecio entre ambos estados)
+    vloss = vloss + dtl * (fue.tasa_perdidas(vel)
+                           + fue_final.tasa_perdidas(velocidad)) / 2
+    return masa, tiempo, posicion, velocidad, vloss, fue_final
+
+
+def por_lanzador(valor, num, ndim=1):
+    '''
+    Convierte <valor> en un array con <num> filas (una por lanzador),
+    repitiendo el valor si es común a todos ellos.
+    '''
+    valor = asarray(valor, dtype=float)
+    if valor.ndim < ndim:
+        valor = broadcast_to(valor, (num,) + valor.shape)
+    return valor.copy()
+
+
+def lanzamiento_conjunto(masas, estructuras, gastos, isps, posiciones,
+                         velocidades, retardos, tiempo_inicial=0,
+                         step_size=DT, alt_maxima=inf, aletas=True, ala=True,
+                         geometria=GEOMETRIA_NOMINAL, programa_alfa=None,
+                         tabla=None):
+    '''
+    Integra a la vez los lanzamientos de N lanzadores. Cada lanzamiento se
+    desarrolla como en integracion.lanzamiento(): retardo de encendido y
+    combustión de cada etapa, comprobación del gamma de inyección y vuelo
+    libre final. Siempre se computan las pérdidas de velocidad.
+
+    Devuelve un objeto ResultadoConjunto.
+
+    Los parámetros de los lanzadores pueden ser comunes a todos ellos o
+    tener una fila por lanzador.
+
+    masas : array (n + 1) o (N, n + 1)
+        Masas de las n etapas, incluyendo la masa de la carga de pago como
+        último elemento.
+
+    estructuras, gastos, isps, retardos : array (n) o (N, n)
+        Razones estructurales, gastos másicos, impulsos específicos y
+        tiempos de retardo de encendido de las etapas.
+
+    posiciones, velocidades : array (N, 3)
+        Posiciones y velocidades iniciales.
+
+    tiempo_inicial : float o array (N,)
+        Tiempo inicial del lanzamiento. Por defecto es tiempo_inicial=0.
+
+    step_size : float
+        Salto temporal. Por defecto es step_size=DT (DT=0.05).
+
+    alt_maxima : float
+        Altura máxima. Por defecto es alt_maxima=inf.
+
+    aletas, ala : bool
+        Indican si la primera etapa lleva aletas y ala. Por defecto son
+        aletas=True y ala=True.
+
+    geometria : GeometriaLanzador
+        Geometría de los lanzadores (modulos.aerodinamica.geometria_misil).
+        Por defecto es GEOMETRIA_NOMINAL.
+
+    programa_alfa : object
+        Programa del ángulo de ataque de la primera etapa
+        (mecanica.ProgramaAlfa), con ángulos comunes o con un valor por
+        lanzador. Si programa_alfa=None, se sigue la ley fija de
+        mecanica.ley_alfa(). Por defecto es programa_alfa=None.
+
+    tabla : object
+        Base de datos de coeficientes aerodinámicos
+        (modulos.aerodinamica.tabla_aerodinamica.TablaAerodinamica) con la
+        que se obtienen cd y cn de todos los lanzadores. Su geometría ha de
+        ser <geometria>. Por defecto es tabla=None (modelo analítico).
+    '''
+    pos = asarray(posiciones, dtype=float).copy()
+    vel = asarray(velocidades, dtype=float).copy()
+    num = len(pos)
+    masas = por_lanzador(masas, num, 2)
+    estructuras = por_lanzador(estructuras, num, 2)
+    gastos = por_lanzador(gastos, num, 2)
+    isps = por_lanzador(isps, num, 2)
+    retardos = por_lanzador(retardos, num, 2)
+    n_etapas = gastos.shape[1]
+    fase_final = 2 * n_etapas  # Fases: retardo i (2i), etapa i (2i + 1)
+
+    masa = masas.sum(axis=1)
+    tiempo = por_lanzador(tiempo_inicial, num)
+    vloss = zeros(num)
+    dic_tie = tiempos_lanzamiento(tiempo.copy(), retardos.T, gastos=gastos.T,
+                                  masas=masas.T, estructuras=estructuras.T)
+    if programa_alfa is not None:
+        programa_alfa = ProgramaAlfa(*(por_lanzador(alfa, num)
+                                       for alfa in programa_alfa))
+
+    fase = full(num, -1)
+    activo = full(num, True)
+    final = full(num, '', dtype='<U11')
+    t_fin_fase = zeros(num)
+    resto = zeros(num)
+    gam_iny = full(num, nan)
+    v_iny = full(num, nan)
+
+    # Registro de las fuerzas al inicio del siguiente paso de cada lanzador;
+    # deja de ser válido cuando el lanzador cambia de fase.
+    valido = full(num, False)
+    fue_total = FuerzasConjunto(zeros((num, 3)), zeros((num, 3)),
+                                zeros((num, 3)), zeros((num, 3)), zeros(num),
+                                zeros(num), zeros(num), zeros(num),
+                                zeros(num), zeros(num))
+
+    techo = evento_techo(alt_maxima)
+    caida = evento_caida(GAMMA_CAIDA)
+    impacto = evento_impacto()
+
+    def gamma(j):
+        return angulo_trayectoria_conjunto(pos[j:j+1], vel[j:j+1])[0]
+
+    def fin_fase(j, motivo=''):
+        # Termina la fase del lanzador j y lo lleva a la siguiente fase que
+        # tenga duración no nula, o lo da por terminado.
+        while True:
+            k = fase[j]
+            if norm(pos[j]) - RT >= alt_maxima:
+                activo[j] = False
+                final[j] = 'techo'
+                return
+            if motivo == 'impacto':
+                # El lanzador está en el suelo: no puede seguir con la
+                # siguiente fase.
+                activo[j] = False
+                final[j] = motivo
+                return
+            if k == fase_final:
+                activo[j] = False
+                final[j] = motivo or 'vuelo_libre'
+                return
+            if k >= 0 and k % 2 == 1:
+                # Fin de la etapa i: se suelta la estructura.
+                i = k // 2
+                masa[j] = masa[j] - masas[j, i] * estructuras[j, i]
+                if i == n_etapas - 1:
+                    v_iny[j] = norm(vel[j])
+                    gam_iny[j] = gamma(j)
+                    if abs(gam_iny[j]) > GAMMA_INY_MIN:
+                        activo[j] = False
+                        final[j] = 'inyeccion'
+                        return
+            valido[j] = False
+            motivo = ''
+            k = fase[j] = k + 1
+            if k == fase_final:
+                t_fin_fase[j] = tiempo[j] + T_VUELO_LIBRE
+                if gamma(j) > GAMMA_CAIDA:
+                    return
+            elif k % 2 == 0:
+                t_fin_fase[j] = tiempo[j] + retardos[j, k // 2]
+                if retardos[j, k // 2] != 0 and gamma(j) > GAMMA_CAIDA:
+                    return
+            else:
+                i = k // 2
+                resto[j] = masa[j] - masas[j, i] * (1 - estructuras[j, i])
+                if masa[j] > resto[j]:
+                    return
+
+    for j in range(num):
+        fin_fase(j)
+
+    while activo.any():
+        ind = flatnonzero(activo)
+        k = fase[ind]
+        i = minimum(k // 2, n_etapas - 1)
+        combustion = (k % 2 == 1) & (k < fase_final)
+        gasto = where(combustion, gastos[ind, i], 0)
+        isp = where(combustion, isps[ind, i], 0)
+        masa_minima = where(combustion, resto[ind], 0)
+
+        # El salto se limita para no sobrepasar el fin de la combustión o
+        # del tiempo de vuelo libre.
+        con_gasto = gasto > 0
+        restante = where(con_gasto,
+                         (masa[ind] - resto[ind]) / where(con_gasto, gasto,
+                                                          1),
+                         t_fin_fase[ind] - tiempo[ind])
+        h = minimum(step_size, restante)
+
+        # Configuración aerodinámica de cada lanzador. Como en
+        # integracion.lanzamiento(), la ley de control solo actúa en la
+        # primera etapa y la propulsión queda activada desde el encendido de
+        # la primera etapa.
+        etapa = i + 1
+        dic = {'t_inicial': dic_tie['t_inicial'][ind],
+               'etapa_1': [dic_tie['etapa_1'][0][ind],
+                           dic_tie['etapa_1'][1][ind]]}
+        if programa_alfa is not None:
+            dic['programa_alfa'] = ProgramaAlfa(*(alfa[ind] for alfa
+                                                  in programa_alfa))
+        alfa = where(etapa == 1, ley_alfa_conjunto(tiempo[ind] + h, dic), 0.)
+        alfa_inicial = where(etapa == 1, ley_alfa_conjunto(tiempo[ind], dic),
+                             0.)
+        propulsion = k >= 1
+        aletas_ind = (etapa == 1) & aletas
+        ala_ind = (etapa == 1) & ala
+
+        def coeficientes(sel):
+            return coeficientes_conjunto(etapa[sel], alfa[sel],
+                                         propulsion[sel], aletas_ind[sel],
+                                         ala_ind[sel], geometria=geometria,
+                                         tabla=tabla)
+
+        # Fuerzas al inicio del paso de los lanzadores que cambian de fase o
+        # cuyo ángulo de ataque ha cambiado desde el paso anterior (como en
+        # integracion.step(), se calculan con el del final del paso).
+        nuevos = ~valido[ind] | (alfa_inicial != alfa)
+        if nuevos.any():
+            sub = ind[nuevos]
+            fue_nuevos = fuerzas_conjunto(pos[sub], vel[sub], masa[sub],
+                                          gasto[nuevos], isp[nuevos],
+                                          alfa[nuevos], coeficientes(nuevos),
+                                          geometria)
+            for campo, valor in zip(fue_total, fue_nuevos):
+                campo[sub] = valor
+        fue = fue_total.seleccionar(ind)
+
+        masa_n, tiempo_n, pos_n, vel_n, vloss_n, fue_n = step_conjunto(
+            masa[ind], tiempo[ind], pos[ind], vel[ind], gasto, isp, alfa,
+            coeficientes(slice(None)), vloss[ind], masa_minima, h, fue,
+            geometria)
+
+        # Eventos terminales: techo en todas las fases; caída e impacto en
+        # los vuelos libres.
+        altur = norm(pos[ind], axis=1) - RT
+        altur_n = norm(pos_n, axis=1) - RT
+        gamma_n = angulo_trayectoria_conjunto(pos_n, vel_n)
+        cruce_techo = (altur < alt_maxima) & (altur_n >= alt_maxima)
+        cruce_libre = ~combustion & ((gamma_n <= GAMMA_CAIDA)
+                                     | (altur_n <= ALTURA_IMPACTO))
+        motivos = full(len(ind), '', dtype='<U11')
+        for a in flatnonzero(cruce_techo | cruce_libre):
+            j = ind[a]
+            eventos = [techo] + ([] if combustion[a] else [caida, impacto])
+            valores = [evento(tiempo[j], masa[j], pos[j], vel[j])
+                       for evento in eventos]
+            nuevos_valores = [evento(tiempo_n[a], masa_n[a], pos_n[a],
+                                     vel_n[a]) for evento in eventos]
+            estado = estado_taylor(masa[j], tiempo[j], pos[j], vel[j],
+                                   gasto[a], h[a], vel_n[a])
+            ocurridos = buscar_eventos(eventos, valores, nuevos_valores,
+                                       estado, h[a])
+            if not ocurridos:
+                continue
+            s, evento = ocurridos[-1]
+            motivos[a] = evento.nombre
+            if s < h[a]:
+                # Se repite el paso del lanzador para terminar en el evento.
+                def repetir(s, a=a, j=j):
+                    una = slice(a, a + 1)
+                    m, t, p, v, vl, f = step_conjunto(
+                        masa[j:j+1], tiempo[j:j+1], pos[j:j+1], vel[j:j+1],
+                        gasto[una], isp[una], alfa[una], coeficientes(una),
+                        vloss[j:j+1], masa_minima[una], asarray([s]),
+                        fue.seleccionar(una), geometria)
+                    return t[0], m[0], p[0], v[0], vl[0], f
+
+                t, m, p, v, vl, f = terminar_en_evento(
+                    evento, valores[eventos.index(evento)], repetir, s, h[a])
+                tiempo_n[a], masa_n[a], pos_n[a], vel_n[a] = t, m, p, v
+                vloss_n[a] = vl
+                for campo, valor in zip(fue_n, f):
+                    campo[a] = valor[0]
+
+        masa[ind] = masa_n
+        tiempo[ind] = tiempo_n
+        pos[ind] = pos_n
+        vel[ind] = vel_n
+        vloss[ind] = vloss_n
+        for campo, valor in zip(fue_total, fue_n):
+            campo[ind] = valor
+        valido[ind] = True
+
+        # Lanzadores que terminan su fase en este paso
+        terminados = ((motivos != '')
+                      | (combustion & (masa_n <= resto[ind]))
+                      | (~combustion & (tiempo_n >= t_fin_fase[ind] - 1e-9)))
+        for a in flatnonzero(terminados):
+            fin_fase(ind[a], motivos[a])
+
+    return ResultadoConjunto(masa, tiempo, pos, vel,
+                             angulo_trayectoria_conjunto(pos, vel), gam_iny,
+                             v_iny, vloss, final)
@@ -134,4 +134,35 @@ class TimeDictionaryError(Exception):
     def __init__(self):
         self.message = ('No se ha introducido un diccionario válido.')
         
-        Exception.__init__(self, self.message)
\ No newline at end of file
+        Exception.__init__(self, self.message)
+
+
+class ConvergenciaError(Exception):
+    '''
+    Error que se produce cuando un método iterativo agota el número máximo
+    de evaluaciones permitido o no puede continuar.
+
+    Parámetros
+    ----------
+    metodo : string
+        Nombre del método iterativo.
+
+    evaluaciones : int
+        Número de evaluaciones realizadas.
+
+    motivo : string, opcional
+        Descripción de la causa del error. Por defecto es None.
+
+    Atributos
+    ---------
+    message : string
+        Mensaje de error.
+    '''
+    def __init__(self, metodo, evaluaciones, motivo=None):
+        if motivo is None:
+            motivo = 'se ha agotado el número máximo de evaluaciones'
+        self.message = ('El método ' + metodo + ' no converge tras '
+                        + str(evaluaciones) + ' evaluaciones: ' + motivo
+                        + '.')
+
+        Exception.__init__(self, self.message)
@@ -5,25 +5,74 @@
 Módulo que contiene las integraciones del movimiento
 """
 
-from numpy import inf, dot, arccos, degrees
+from collections import OrderedDict
+
+from numpy import (inf, degrees, concatenate, hstack, floor, atleast_1d,
+                   maximum)
 from numpy.linalg import norm
 
 from errores import TimeDictionaryError
-from mecanica import numero_mach, altitud, aceleracion, resistencia, sustentacion, peso, ley_alfa
-from modulos.aerodinamica.aero_misil import CoeficienteFuerza
+from mecanica import fuerzas, ley_alfa
+from modulos.aerodinamica.aero_misil import ConfiguracionVuelo
+from modulos.aerodinamica.geometria_misil import GEOMETRIA_NOMINAL
 from modulos.atmosfera.gravedad import RT
+from modulos.runge_kutta import IntegradorDormandPrince
+from modulos.kepler import propagar_kepler
+from modulos.registro import RegistroTrayectoria
+from modulos.eventos import (buscar_eventos, terminar_en_evento,
+                             angulo_trayectoria, evento_fin_combustion,
+                             evento_techo, evento_apogeo, evento_caida,
+                             evento_impacto, ALTURA_IMPACTO)
 from inputs_iniciales import GAMMA_INY_MIN
 
 DT = .05
+ATOL = 1e-6  # Tolerancia absoluta por defecto del integrador adaptativo
+INTERVALO_CACHE = 5.  # Intervalo entre puntos guardados de un retardo (s)
+MAX_CLAVES_CACHE = 64  # Número máximo de claves de CacheLanzamiento
+Q_KEPLER = 1e-2  # Presión dinámica de paso a la propagación kepleriana (Pa)
+PASO_KEPLER = 10.  # Duración de los tramos de la propagación kepleriana (s)
+HISTERESIS_KEPLER = 2.  # Factor de Q_KEPLER para volver a integrar
+
+
+def configuracion_instante(configuracion, tiempo, dic_tie):
+    '''
+    Configuración del lanzador en el instante <tiempo>: en la primera etapa
+    el ángulo de ataque lo fija la ley de control ley_alfa(). Devuelve una
+    configuración nueva (aero_misil.ConfiguracionVuelo) sin modificar
+    <configuracion>.
+    '''
+    if configuracion.etapa == 1:
+        return configuracion._replace(alpha=ley_alfa(tiempo, dic_tie))
+    return configuracion
 
 
-def step(mas, tie, pos, vel, gasto, isp, coeficientes_fuerza, vloss=0,
-         masa_minima=0, step_size=DT, perdidas=False, dic_tie={}):
+def posicion_fuerzas(pos):
+    '''
+    Posición en la que se evalúan las fuerzas del estado <pos>. Un estado
+    por debajo de la altitud de impacto solo aparece en el paso en el que
+    se detecta el evento de impacto, que después se repite hasta esa
+    altitud; como el modelo atmosférico no admite altitudes negativas, las
+    fuerzas de ese estado se evalúan en la vertical de <pos> a la altitud
+    de impacto. Admite también un array (N, 3) con las posiciones de un
+    conjunto de lanzadores.
+    '''
+    radio = norm(pos, axis=-1, keepdims=True)
+    if (radio >= RT + ALTURA_IMPACTO).all():
+        return pos
+    return pos * maximum(1, (RT + ALTURA_IMPACTO) / radio)
+
+
+def step(mas, tie, pos, vel, gasto, isp, configuracion, vloss=0,
+         masa_minima=0, step_size=DT, perdidas=False, dic_tie={}, fue=None,
+         tabla=None, atmosfera=None):
     '''
     Paso de integración que se utiliza en las demás funciones de integración.
     Devuelve la masa, la velocidad, el tiempo y la posición habiendo
     transcurrido un diferencial de tiempo DT.
     También devuelve las pérdidas en el caso de que se tengan en cuenta.
+    Por último devuelve el registro de fuerzas (mecanica.Fuerzas) del estado
+    final, que puede pasarse al siguiente paso mediante <fue> para no volver
+    a evaluar la atmósfera ni la aerodinámica en el mismo estado.
 
     mas : float
         Masa.
@@ -43,8 +92,9 @@ def step(mas, tie, pos, vel, gasto, isp, coeficientes_fuerza, vloss=0,
     isp : float
         Impulso específico.
     
-    coeficientes_fuerza : object
-        Es un objeto en el cual está definida la aerodinámica del lanzador.
+    configuracion : object
+        Configuración aerodinámica del lanzador
+        (aero_misil.ConfiguracionVuelo).
 
     vloss : float
         Pérdidas de velocidad. Por defecto es vloss=0.
@@ -61,6 +111,23 @@ def step(mas, tie, pos, vel, gasto, isp, coeficientes_fuerza, vloss=0,
     dic_tie : dictionary
         Define el lanzamiento en función del tiempo inicial de lanzamiento y
         los tiempos característicos de cada etapa. Por defecto está vacío.
+
+    fue : object
+        Registro de fuerzas del estado inicial devuelto por el paso anterior.
+        Si fue=None o el ángulo de ataque ha cambiado desde entonces, se
+        calcula. Por defecto es fue=None.
+
+    tabla : object
+        Base de datos de coeficientes aerodinámicos
+        (modulos.aerodinamica.tabla_aerodinamica.TablaAerodinamica) con la
+        que se obtienen cd y cn. Si tabla=None, se evalúa el modelo
+        analítico de aero_misil. Por defecto es tabla=None.
+
+    atmosfera : object
+        Modelo atmosférico tabulado
+        (modulos.atmosfera.tabla_atmosfera.AtmosferaTabulada) con el que se
+        obtiene el estado atmosférico. Si atmosfera=None, se evalúa el
+        modelo NRL-MSISE00. Por defecto es atmosfera=None.
     '''
     
     dtl = step_size
@@ -69,42 +136,150 @@ def step(mas, tie, pos, vel, gasto, isp, coeficientes_fuerza, vloss=0,
         masa = masa_minima
         dtl = (mas - masa_minima) / gasto
     tiempo = tie + dtl
-    if coeficientes_fuerza._etapa == 1:
-        coeficientes_fuerza._angulo_ataque = ley_alfa(tiempo, dic_tie)
-        
-    alfa = degrees(coeficientes_fuerza._angulo_ataque) # Valor en grados del ángulo de ataque
-    
-    acc = aceleracion(pos, vel, (mas + masa) / 2, gasto, isp,
-                      coeficientes_fuerza)
+    configuracion_inicial = configuracion_instante(configuracion, tie,
+                                                   dic_tie)
+    configuracion = configuracion_instante(configuracion, tiempo, dic_tie)
+
+    # El registro del paso anterior se calculó con el ángulo de ataque del
+    # instante inicial; mientras la ley de alfa lo modifica, las fuerzas
+    # del estado inicial se recalculan con el del instante final.
+    if fue is None or configuracion_inicial.alpha != configuracion.alpha:
+        fue = fuerzas(pos, vel, mas, gasto, isp, configuracion, tabla,
+                      atmosfera)
+    acc = fue.aceleracion((mas + masa) / 2)
     posicion = pos + vel * dtl + .5 * acc * dtl**2
     velocidad = vel + acc * dtl
-    factor_carga = norm(sustentacion(posicion, velocidad, coeficientes_fuerza)) / norm(peso(posicion, masa))
-    
-    mach = numero_mach(posicion, velocidad)
-    alt = altitud(posicion)
 
-    cd = coeficientes_fuerza.cd_total(mach, alt)
-    cn = coeficientes_fuerza.cn_total(mach)
+    # Las fuerzas del estado final sirven para la salida y para el
+    # siguiente paso.
+    fue_final = fuerzas(posicion_fuerzas(posicion), velocidad, masa, gasto,
+                        isp, configuracion, tabla, atmosfera)
     
-    # Pérdida de velocidad
+    # Pérdida de velocidad (regla del trapecio entre ambos estados)
     if perdidas:
-        pos_media = (pos + posicion) / 2
-        vel_media = (vel + velocidad) / 2
-        mas_media = (mas + masa) / 2
-        loss_aero = (dtl*
-                     norm(resistencia(pos_media, vel_media, coeficientes_fuerza))/
-                     mas_media)
-        loss_grav = -dtl * (dot(peso(pos_media, mas_media), vel_media)
-                            / (norm(vel_media) * mas_media))
-        vloss = vloss + loss_aero + loss_grav
-        return masa, tiempo, posicion, velocidad, vloss, factor_carga, cd, cn, alfa
-    return masa, tiempo, posicion, velocidad, factor_carga, cd, cn, alfa
+        vloss = vloss + dtl * (fue.tasa_perdidas(vel)
+                               + fue_final.tasa_perdidas(velocidad)) / 2
+        return masa, tiempo, posicion, velocidad, vloss, fue_final
+    return masa, tiempo, posicion, velocidad, fue_final
+
+
+def ecuaciones_movimiento(gasto, isp, configuracion, dic_tie={}, tabla=None,
+                          atmosfera=None):
+    '''
+    Devuelve la función derivada(t, y) de las ecuaciones del movimiento que
+    utiliza el integrador adaptativo, siendo el vector de estado
+    y = [posición (3), velocidad (3), masa, pérdidas de velocidad].
+    También devuelve un diccionario en el que se guarda, con la clave 'fue',
+    el registro de fuerzas de la última evaluación.
+
+    gasto : float
+        Gasto másico.
+
+    isp : float
+        Impulso específico.
+
+    configuracion : object
+        Configuración aerodinámica del lanzador
+        (aero_misil.ConfiguracionVuelo).
+
+    dic_tie : dictionary
+        Define el lanzamiento en función del tiempo inicial de lanzamiento y
+        los tiempos característicos de cada etapa. Por defecto está vacío.
+
+    tabla : object
+        Base de datos de coeficientes aerodinámicos (ver step()). Por
+        defecto es tabla=None.
+
+    atmosfera : object
+        Modelo atmosférico tabulado (ver step()). Por defecto es
+        atmosfera=None.
+    '''
+    ultimo = {}
+
+    def derivada(t, y):
+        pos = y[:3]
+        vel = y[3:6]
+        fue = fuerzas(posicion_fuerzas(pos), vel, y[6], gasto, isp,
+                      configuracion_instante(configuracion, t, dic_tie),
+                      tabla, atmosfera)
+        ultimo['fue'] = fue
+        return concatenate((vel, fue.aceleracion(),
+                            [-gasto, fue.tasa_perdidas(vel)]))
+
+    return derivada, ultimo
+
+
+def actualizar_informe(informe, pasos, rechazados, evaluaciones):
+    '''
+    Acumula en el diccionario <informe> el número de pasos aceptados, de
+    pasos rechazados y de evaluaciones de las fuerzas. Si informe=None no
+    hace nada.
+    '''
+    if informe is None:
+        return
+    informe['pasos'] = informe.get('pasos', 0) + pasos
+    informe['rechazados'] = informe.get('rechazados', 0) + rechazados
+    informe['evaluaciones'] = informe.get('evaluaciones', 0) + evaluaciones
+
+
+def estado_taylor(masa, tiempo, pos, vel, gasto, h, velocidad_final):
+    '''
+    Devuelve la función estado(s) que interpola el estado (tiempo, masa,
+    posición y velocidad) dentro de un paso de Taylor de salto <h>, con la
+    aceleración constante del paso, sin nuevas evaluaciones de las fuerzas.
+    Se utiliza para localizar los eventos.
+
+    masa, tiempo, pos, vel : float, float, array, array
+        Estado al inicio del paso.
+
+    gasto : float
+        Gasto másico.
+
+    h : float
+        Salto temporal del paso.
+
+    velocidad_final : array (3 componentes)
+        Velocidad al final del paso.
+    '''
+    acc = (velocidad_final - vel) / h
+
+    def estado(s):
+        return (tiempo + s, masa - gasto * s, pos + vel * s + .5 * acc * s**2,
+                vel + acc * s)
+
+    return estado
+
+
+def estado_dormand_prince(integrador):
+    '''
+    Devuelve la función estado(s) que interpola el estado (tiempo, masa,
+    posición y velocidad) dentro del último paso aceptado por el integrador
+    adaptativo (salida densa). Se utiliza para localizar los eventos.
+    '''
+    def estado(s):
+        y = integrador.interpolar(s)
+        return integrador.t_anterior + s, y[6], y[:3], y[3:6]
+
+    return estado
+
+
+def registrar_eventos(informe, ocurridos, tiempo):
+    '''
+    Añade a la lista 'eventos' del diccionario <informe> las tuplas
+    (nombre, tiempo) de los eventos <ocurridos> en un paso que empieza en
+    <tiempo>. Si informe=None no hace nada.
+    '''
+    if informe is None:
+        return
+    informe.setdefault('eventos', []).extend(
+        (evento.nombre, tiempo + s) for s, evento in ocurridos)
 
 
 def etapa(masa_etapa, masa_total, gasto, isp, posicion_inicial,
-          velocidad_inicial, coeficientes_fuerza, tiempo_inicial=0, vloss=0,
-          step_size=DT, altura_maxima=inf, perdidas=False, imprimir=False,
-          archivo2=False, dic_tie={}):
+          velocidad_inicial, configuracion, tiempo_inicial=0, vloss=0,
+          step_size=DT, altura_maxima=inf, perdidas=False, registro=None,
+          dic_tie={}, rtol=None, atol=ATOL, informe=None, eventos=(),
+          tabla=None, atmosfera=None):
     '''
     Ejecuta todos los pasos de integración de una etapa.
     Devuelve la masa, la velocidad, el tiempo y la posición una vez haya
@@ -132,8 +307,9 @@ def etapa(masa_etapa, masa_total, gasto, isp, posicion_inicial,
     velocidad_inicial : array (3 componentes)
         Velocidad inicial.
     
-    coeficientes_fuerza : object
-        Es un objeto en el cual está definida la aerodinámica del lanzador.
+    configuracion : object
+        Configuración aerodinámica del lanzador
+        (aero_misil.ConfiguracionVuelo).
 
     tiempo_inicial : float
         Tiempo inicial. Por defecto es tiempo_inicial=0.
@@ -151,80 +327,165 @@ def etapa(masa_etapa, masa_total, gasto, isp, posicion_inicial,
         Indica si deben computarse las pérdidas de velocidad o no. Por
         defecto es perdidas=False.
 
-    imprimir : string
-        Nombre del archivo de escritura. Si imprimir=False, no se
-        escribe. Por defecto es imprimir=False.
+    registro : object
+        Objeto modulos.registro.RegistroTrayectoria en el que se añade el
+        estado tras cada paso. Si registro=None, no se registra. Por
+        defecto es registro=None.
+
     dic_tie : dictionary
         Define el lanzamiento en función del tiempo inicial de lanzamiento y
         los tiempos característicos de cada etapa.
+
+    rtol : float
+        Tolerancia relativa del integrador adaptativo Dormand-Prince 5(4).
+        Si rtol=None se integra con paso fijo step_size; en caso contrario
+        step_size es el salto inicial. Por defecto es rtol=None.
+
+    atol : float o array (8 componentes)
+        Tolerancia absoluta del integrador adaptativo. Por defecto es
+        atol=ATOL (ATOL=1e-6).
+
+    informe : dictionary
+        Diccionario en el que se acumulan los pasos aceptados ('pasos'),
+        rechazados ('rechazados') y las evaluaciones de las fuerzas
+        ('evaluaciones'). Los eventos ocurridos se añaden a la lista
+        'eventos' como tuplas (nombre, tiempo). Por defecto es informe=None.
+
+    eventos : list
+        Eventos adicionales (objetos modulos.eventos.Evento) que se
+        localizan durante la integración. Por defecto es eventos=().
+
+    tabla : object
+        Base de datos de coeficientes aerodinámicos (ver step()). Por
+        defecto es tabla=None.
+
+    atmosfera : object
+        Modelo atmosférico tabulado (ver step()). Por defecto es
+        atmosfera=None.
     '''
     mase = masa_etapa
     masa = masa_total
     resto = masa - mase  # Como si fuera la carga de pago
     pos = posicion_inicial
     vel = velocidad_inicial
-    # Cuando empieza la etapa de combustión enciendo el motor, cuando termine
-    # de correrse esta función volverá a su valor.
-    encendido = True
-    coeficientes_fuerza.set_propulsion(prop=encendido)
+    # Cuando empieza la etapa de combustión se enciende el motor.
+    configuracion = configuracion._replace(propulsion=True)
 
-    consumido = mase <= 0
     altur = norm(pos) - RT
     tiempo = tiempo_inicial
-    gamma = 90 - degrees(arccos(dot(vel, pos)/(norm(vel)*norm(pos))))
-
-    while (altur < altura_maxima
-           and not consumido):
-        # Condiciones de parada:
-        # 1) que se haya superado la altura máxima
-        # 2) que se haya consumido todo el combustible de la etapa
-        if perdidas:
-            masa, tiempo, pos, vel, vloss, factor_carga, cd, cn, alfa = step(masa, tiempo, pos, vel, gasto,
-                                                 isp, coeficientes_fuerza,
-                                                 vloss=vloss,
-                                                 masa_minima=resto,
-                                                 step_size=step_size,
-                                                 perdidas=perdidas,
-                                                 dic_tie=dic_tie)
+    fue = None
+    pasos = 0
+    if rtol is not None:
+        derivada, ultimo = ecuaciones_movimiento(gasto, isp,
+                                                 configuracion, dic_tie,
+                                                 tabla, atmosfera)
+        integrador = IntegradorDormandPrince(derivada, tiempo,
+                                             hstack((pos, vel, masa, vloss)),
+                                             step_size, rtol, atol)
+
+        def repetir_dormand_prince(s):
+            tiempo, y = integrador.recortar(s)
+            return tiempo, y[6], y[:3], y[3:6], y[7], ultimo['fue']
+
+    # Condiciones de parada (eventos terminales):
+    # 1) que se haya consumido todo el combustible de la etapa
+    # 2) que se haya superado la altura máxima
+    eventos = [evento_fin_combustion(resto), evento_techo(altura_maxima),
+               evento_apogeo()] + list(eventos)
+    valores = [evento(tiempo, masa, pos, vel) for evento in eventos]
+    terminado = altur >= altura_maxima or mase <= 0
+
+    while not terminado:
+        inicial = masa, tiempo, pos, vel, vloss, fue
+        if rtol is not None:
+            # El salto se limita para no sobrepasar el fin de la combustión.
+            tiempo, y = integrador.avanzar(h_max=(masa - resto) / gasto)
+            pos, vel, masa, vloss = y[:3], y[3:6], y[6], y[7]
+            if masa - resto <= 1e-9 * masa_total:
+                masa = resto
+            fue = ultimo['fue']
+            estado = estado_dormand_prince(integrador)
+            repetir = repetir_dormand_prince
         else:
-            masa, tiempo, pos, vel, factor_carga, cd, cn, alfa = step(masa, tiempo, pos, vel, gasto, isp,
-                                          coeficientes_fuerza,
-                                          masa_minima=resto,
-                                          step_size=step_size,
-                                          dic_tie=dic_tie)
+            masa, tiempo, pos, vel, vloss, fue = step(
+                masa, tiempo, pos, vel, gasto, isp, configuracion,
+                vloss=vloss, masa_minima=resto, step_size=step_size,
+                perdidas=True, dic_tie=dic_tie, fue=fue, tabla=tabla,
+                atmosfera=atmosfera)
+            estado = estado_taylor(*inicial[:4], gasto, tiempo - inicial[1],
+                                   vel)
+
+            def repetir(s, inicial=inicial):
+                masa, tiempo, pos, vel, vloss, fue = step(
+                    *inicial[:4], gasto, isp, configuracion,
+                    vloss=inicial[4], masa_minima=resto, step_size=s,
+                    perdidas=True, dic_tie=dic_tie, fue=inicial[5],
+                    tabla=tabla, atmosfera=atmosfera)
+                return tiempo, masa, pos, vel, vloss, fue
+        pasos += 1
+
+        # Localización de los eventos ocurridos durante el paso
+        h = tiempo - inicial[1]
+        nuevos = [evento(tiempo, masa, pos, vel) for evento in eventos]
+        ocurridos = buscar_eventos(eventos, valores, nuevos, estado, h)
+        registrar_eventos(informe, ocurridos, inicial[1])
+        if ocurridos and ocurridos[-1][1].terminal:
+            terminado = True
+            s, evento = ocurridos[-1]
+            if s < h:
+                # Se repite el paso para terminar en el evento.
+                tiempo, masa, pos, vel, vloss, fue = terminar_en_evento(
+                    evento, valores[eventos.index(evento)], repetir, s, h)
+        valores = nuevos
+
         altur = norm(pos) - RT
-        gamma = 90 - degrees(arccos(dot(vel, pos)/(norm(vel)*norm(pos))))
-        mase = masa - resto
-        consumido = mase <= 0
+        gamma = angulo_trayectoria(pos, vel)
+
+        if registro is not None:
+            alfa = degrees(configuracion_instante(configuracion, tiempo,
+                                                  dic_tie).alpha)
+            registro.anadir(tiempo, altur, norm(vel), masa, gamma, alfa,
+                            fue.factor_carga, configuracion.etapa,
+                            True, fue.cd, fue.cn)
+
+    if rtol is not None:
+        actualizar_informe(informe, integrador.pasos, integrador.rechazados,
+                           integrador.evaluaciones)
+    else:
+        actualizar_informe(informe, pasos, 0, pasos + (pasos > 0))
 
-        if imprimir:
-            imprimir.write('\n' + format(tiempo, '^12.3f')
-                           + '\t' + format(altur, '^12.1f')
-                           + '\t' + format(norm(vel), '^17.1f')
-                           + '\t' + format(masa, '^11.1f')
-                           + '\t' + format(gamma, '^13.3f')
-                           + '\t' + format(alfa, '^14.3f')
-                           + '\t' + format(factor_carga, '^14.3f')
-                           + '\t' + format(coeficientes_fuerza._etapa, '^17.3f')
-                           + '\t' + format('On', '^14'))
-           
-            archivo2.write('\n' + format(tiempo, '^17.3f')
-                           + '\t' + format(cd, '^17.3f')
-                           + '\t' + format(cn, '^17.3f')
-                           + '\t' + format(alfa, '^17.3f'))
-            
+    gamma = angulo_trayectoria(pos, vel)
     if perdidas:
-        gamma = 90 - degrees(arccos(dot(vel, pos)/(norm(vel)*norm(pos))))
         return masa, tiempo, pos, vel, gamma, vloss
-    
-    gamma = 90 - degrees(arccos(dot(vel, pos)/(norm(vel)*norm(pos))))
     return masa, tiempo, pos, vel, gamma
 
 
-def vuelo_libre(masa, posicion_inicial, velocidad_inicial, coeficientes_fuerza,
+def propagar_arco(arco, t_vuelo):
+    '''
+    Devuelve la posición, la velocidad y las pérdidas de velocidad en el
+    tiempo de vuelo libre <t_vuelo> de un arco kepleriano, propagando
+    analíticamente desde su estado inicial. Como solo actúa el peso, las
+    pérdidas (gravitatorias) son la disminución del módulo de la velocidad.
+
+    arco : dictionary
+        Estado inicial del arco: tiempo de vuelo libre ('t_vuelo'),
+        posición ('pos'), velocidad ('vel') y pérdidas ('vloss').
+
+    t_vuelo : float
+        Tiempo de vuelo libre.
+    '''
+    pos, vel = propagar_kepler(arco['pos'], arco['vel'],
+                               t_vuelo - arco['t_vuelo'])
+    return pos, vel, arco['vloss'] + norm(arco['vel']) - norm(vel)
+
+
+def vuelo_libre(masa, posicion_inicial, velocidad_inicial, configuracion,
                 t_de_vuelo=inf, tiempo_inicial=0, vloss=0, step_size=DT,
-                altura_maxima=inf, perdidas=False, imprimir=False,
-                archivo2=False, dic_tie={}):
+                altura_maxima=inf, perdidas=False, registro=None,
+                dic_tie={}, rtol=None, atol=ATOL,
+                informe=None, eventos=(), inicio=None, puntos=None,
+                kepler=None, paso_kepler=PASO_KEPLER, tabla=None,
+                atmosfera=None):
     '''
     Ejecuta todos los pasos de integración del vuelo sin propulsión.
     Funciona de la misma manera que la función anterior etapa(), pero al usar
@@ -244,8 +505,9 @@ def vuelo_libre(masa, posicion_inicial, velocidad_inicial, coeficientes_fuerza,
     velocidad_inicial : array (3 componentes)
         Velocidad inicial.
     
-    coeficientes_fuerza : object
-        Es un objeto en el cual está definida la aerodinámica del lanzador.
+    configuracion : object
+        Configuración aerodinámica del lanzador
+        (aero_misil.ConfiguracionVuelo).
 
     t_de_vuelo : float
 
@@ -265,82 +527,350 @@ def vuelo_libre(masa, posicion_inicial, velocidad_inicial, coeficientes_fuerza,
         Indica si deben computarse las pérdidas de velocidad o no. Por
         defecto es perdidas=False.
 
-    imprimir : string
-        Nombre del archivo de escritura. Si imprimir=False, no se
-        escribe. Por defecto es imprimir=False.
+    registro : object
+        Objeto modulos.registro.RegistroTrayectoria en el que se añade el
+        estado tras cada paso. Si registro=None, no se registra. Por
+        defecto es registro=None.
+
     dic_tie : dictionary
         Define el lanzamiento en función del tiempo inicial de lanzamiento y
         los tiempos característicos de cada etapa.
+
+    rtol : float
+        Tolerancia relativa del integrador adaptativo Dormand-Prince 5(4).
+        Si rtol=None se integra con paso fijo step_size; en caso contrario
+        step_size es el salto inicial. Por defecto es rtol=None.
+
+    atol : float o array (8 componentes)
+        Tolerancia absoluta del integrador adaptativo. Por defecto es
+        atol=ATOL (ATOL=1e-6).
+
+    informe : dictionary
+        Diccionario en el que se acumulan los pasos aceptados ('pasos'),
+        rechazados ('rechazados') y las evaluaciones de las fuerzas
+        ('evaluaciones'). Los eventos ocurridos se añaden a la lista
+        'eventos' como tuplas (nombre, tiempo). Por defecto es informe=None.
+
+    eventos : list
+        Eventos adicionales (objetos modulos.eventos.Evento) que se
+        localizan durante la integración. Por defecto es eventos=().
+
+    inicio : dictionary
+        Punto del vuelo libre, guardado en <puntos> por una integración
+        anterior con el mismo estado inicial, desde el que se reanuda la
+        integración. Los pasos siguientes son idénticos a los de la
+        integración original. Por defecto es inicio=None.
+
+    puntos : list
+        Lista a la que se añade un punto del vuelo libre cada
+        INTERVALO_CACHE segundos (ver CacheLanzamiento). Por defecto es
+        puntos=None.
+
+    kepler : float
+        Presión dinámica (Pa) por debajo de la cual el vuelo se propaga
+        analíticamente (problema de los dos cuerpos, ver modulos.kepler) en
+        tramos de <paso_kepler> segundos, en lugar de integrarse. Se vuelve
+        a integrar al final del tramo en el que la presión dinámica supera
+        HISTERESIS_KEPLER veces este valor. Si kepler=None, siempre se
+        integra. Por defecto es kepler=None.
+
+    paso_kepler : float
+        Duración de los tramos de la propagación analítica. Los eventos se
+        localizan dentro de cada tramo. Por defecto es
+        paso_kepler=PASO_KEPLER.
+
+    tabla : object
+        Base de datos de coeficientes aerodinámicos (ver step()). Por
+        defecto es tabla=None.
+
+    atmosfera : object
+        Modelo atmosférico tabulado (ver step()). Por defecto es
+        atmosfera=None.
     '''
     t_vuelo = 0
     tiempo = tiempo_inicial
     pos = posicion_inicial
     vel = velocidad_inicial
+    fue = None
+    arco = None  # Estado inicial del arco kepleriano en curso
+    if inicio is not None:
+        t_vuelo, tiempo = inicio['t_vuelo'], inicio['tiempo']
+        masa, pos, vel = inicio['masa'], inicio['pos'], inicio['vel']
+        vloss, fue = inicio['vloss'], inicio['fue']
+        arco = inicio.get('arco')
+    proximo_punto = (floor(t_vuelo / INTERVALO_CACHE) + 1) * INTERVALO_CACHE
     altur = norm(pos) - RT
-    gamma = 90 - degrees(arccos(dot(vel, pos)/(norm(vel)*norm(pos))))
+    gamma = angulo_trayectoria(pos, vel)
     encendido = False
-
-    while (altur < altura_maxima
-           and t_vuelo <= t_de_vuelo
-           and gamma > -5.0):
-        # Condiciones de parada:
-        # 1) que se haya superado la altura máxima
-        # 2) que se haya superado el tiempo de vuelo libre
-        # 3) que esté cayendo a más de 5º
-        # 4) El misil se choca con la tierra.
-        if (tiempo > 300) and altur < 100:
-            print('El misil choca con la tierra')
-            break
-        if t_de_vuelo < step_size + t_vuelo:
+    pasos = 0
+    tramos = 0
+    if rtol is not None:
+        derivada, ultimo = ecuaciones_movimiento(0, 0, configuracion,
+                                                 dic_tie, tabla, atmosfera)
+        if inicio is None:
+            integrador = IntegradorDormandPrince(derivada, tiempo,
+                                                 hstack((pos, vel, masa,
+                                                         vloss)),
+                                                 step_size, rtol, atol)
+        elif arco is None:
+            integrador = IntegradorDormandPrince(derivada, tiempo,
+                                                 inicio['y'], inicio['h'],
+                                                 rtol, atol, k1=inicio['k1'])
+        else:
+            # Se reanuda dentro de un arco kepleriano: el integrador se crea
+            # al terminar el arco.
+            integrador = None
+
+        def repetir_dormand_prince(s):
+            tiempo, y = integrador.recortar(s)
+            return tiempo, y[6], y[:3], y[3:6], y[7], ultimo['fue']
+
+    # Condiciones de parada (eventos terminales):
+    # 1) que se haya superado la altura máxima
+    # 2) que esté cayendo a más de 5º
+    # 3) El misil se choca con la tierra.
+    # El fin del tiempo de vuelo libre se alcanza ajustando el último salto.
+    impacto = evento_impacto()
+    eventos = [evento_techo(altura_maxima), evento_caida(-5.0), impacto,
+               evento_apogeo()] + list(eventos)
+    valores = [evento(tiempo, masa, pos, vel) for evento in eventos]
+    terminado = altur >= altura_maxima or gamma <= -5.0
+
+    while not terminado:
+        inicial = masa, tiempo, pos, vel, vloss, fue
+        if arco is None and rtol is None and t_de_vuelo < step_size + t_vuelo:
             step_size = t_de_vuelo - t_vuelo
             encendido = True
-        if perdidas:
-            masa, t_vuelo, pos, vel, vloss, factor_carga, cd, cn, alfa = step(masa, t_vuelo, pos, vel, 0,
-                                                  0, coeficientes_fuerza,
-                                                  vloss=vloss,
-                                                  step_size=step_size,
-                                                  perdidas=perdidas,
-                                                  dic_tie=dic_tie)
+        if arco is not None:
+            # Tramo kepleriano hasta el siguiente múltiplo de paso_kepler
+            # desde el inicio del arco, sin sobrepasar el tiempo de vuelo
+            # libre. Se propaga siempre desde el inicio del arco.
+            tramo = round((t_vuelo - arco['t_vuelo']) / paso_kepler) + 1
+            t_vuelo = min(arco['t_vuelo'] + tramo * paso_kepler, t_de_vuelo)
+            pos, vel, vloss = propagar_arco(arco, t_vuelo)
+            tiempo = t_vuelo + tiempo_inicial
+            encendido = t_vuelo >= t_de_vuelo
+            fue = fuerzas(pos, vel, masa, 0, 0, configuracion, tabla,
+                          atmosfera)
+            tramos += 1
+
+            def estado(s, inicial=inicial, arco=arco):
+                pos, vel, _ = propagar_arco(arco, inicial[1] + s
+                                            - tiempo_inicial)
+                return inicial[1] + s, masa, pos, vel
+
+            def repetir(s, inicial=inicial, arco=arco):
+                pos, vel, vloss = propagar_arco(arco, inicial[1] + s
+                                                - tiempo_inicial)
+                return (inicial[1] + s, masa, pos, vel, vloss,
+                        fuerzas(pos, vel, masa, 0, 0, configuracion,
+                                tabla, atmosfera))
+        elif rtol is not None:
+            # El salto se limita para no sobrepasar el tiempo de vuelo libre.
+            tiempo, y = integrador.avanzar(h_max=t_de_vuelo - t_vuelo)
+            pos, vel, masa, vloss = y[:3], y[3:6], y[6], y[7]
+            t_vuelo = tiempo - tiempo_inicial
+            encendido = t_vuelo >= t_de_vuelo - 1e-9
+            fue = ultimo['fue']
+            estado = estado_dormand_prince(integrador)
+            repetir = repetir_dormand_prince
         else:
-            masa, t_vuelo, pos, vel, factor_carga, cd, cn, alfa = step(masa, t_vuelo, pos, vel, 0, 0,
-                                           coeficientes_fuerza,
-                                           step_size=step_size,
-                                           dic_tie=dic_tie)
+            masa, t_vuelo, pos, vel, vloss, fue = step(
+                masa, t_vuelo, pos, vel, 0, 0, configuracion, vloss=vloss,
+                step_size=step_size, perdidas=True, dic_tie=dic_tie,
+                fue=fue, tabla=tabla, atmosfera=atmosfera)
+            tiempo = t_vuelo + tiempo_inicial
+            estado = estado_taylor(*inicial[:4], 0, tiempo - inicial[1], vel)
+
+            def repetir(s, inicial=inicial):
+                masa, t_vuelo, pos, vel, vloss, fue = step(
+                    inicial[0], inicial[1] - tiempo_inicial, *inicial[2:4],
+                    0, 0, configuracion, vloss=inicial[4], step_size=s,
+                    perdidas=True, dic_tie=dic_tie, fue=inicial[5],
+                    tabla=tabla, atmosfera=atmosfera)
+                return t_vuelo + tiempo_inicial, masa, pos, vel, vloss, fue
+            pasos += 1
+
+        # Localización de los eventos ocurridos durante el paso
+        h = tiempo - inicial[1]
+        nuevos = [evento(tiempo, masa, pos, vel) for evento in eventos]
+        ocurridos = buscar_eventos(eventos, valores, nuevos, estado, h)
+        registrar_eventos(informe, ocurridos, inicial[1])
+        if ocurridos and ocurridos[-1][1].terminal:
+            terminado = True
+            encendido = False
+            s, evento = ocurridos[-1]
+            if s < h:
+                # Se repite el paso para terminar en el evento.
+                tiempo, masa, pos, vel, vloss, fue = terminar_en_evento(
+                    evento, valores[eventos.index(evento)], repetir, s, h)
+                t_vuelo = tiempo - tiempo_inicial
+            if evento is impacto:
+                print('El misil choca con la tierra')
+        valores = nuevos
+
         altur = norm(pos) - RT
-        tiempo = t_vuelo + tiempo_inicial
-        gamma = 90 - degrees(arccos(dot(vel, pos)/(norm(vel)*norm(pos))))
-        if imprimir:
-            imprimir.write('\n' + format(tiempo, '^12.3f')
-                           + '\t' + format(altur, '^12.1f')
-                           + '\t' + format(norm(vel), '^17.1f')
-                           + '\t' + format(masa, '^11.1f')
-                           + '\t' + format(gamma, '^13.3f')
-                           + '\t' + format(alfa, '^14.3f')
-                           + '\t' + format(factor_carga, '^14.3f')
-                           + '\t' + format(coeficientes_fuerza._etapa, '^17.3f')
-                           + '\t' + format('Off', '^14'))
-            
-            
-            archivo2.write('\n' + format(tiempo, '^17.3f')
-                           + '\t' + format(cd, '^17.3f')
-                           + '\t' + format(cn, '^17.3f')
-                           + '\t' + format(alfa, '^17.3f'))
-            
-        if encendido:
+        gamma = angulo_trayectoria(pos, vel)
+        if registro is not None:
+            alfa = degrees(configuracion_instante(configuracion, tiempo,
+                                                  dic_tie).alpha)
+            registro.anadir(tiempo, altur, norm(vel), masa, gamma, alfa,
+                            fue.factor_carga, configuracion.etapa,
+                            False, fue.cd, fue.cn)
+
+        if encendido or terminado:
             break
 
+        # Paso a la propagación kepleriana fuera de la atmósfera y vuelta a
+        # la integración si la presión dinámica vuelve a aumentar.
+        if kepler is not None:
+            if arco is None and fue.presion_dinamica < kepler:
+                arco = {'t_vuelo': t_vuelo, 'pos': pos, 'vel': vel,
+                        'vloss': vloss}
+                if rtol is not None:
+                    arco['h'] = integrador.h
+            elif (arco is not None
+                  and fue.presion_dinamica > HISTERESIS_KEPLER * kepler):
+                if rtol is not None:
+                    if integrador is not None:
+                        actualizar_informe(informe, integrador.pasos,
+                                           integrador.rechazados,
+                                           integrador.evaluaciones)
+                    integrador = IntegradorDormandPrince(derivada, tiempo,
+                                                         hstack((pos, vel,
+                                                                 masa,
+                                                                 vloss)),
+                                                         arco['h'], rtol,
+                                                         atol)
+                arco = None
+
+        if puntos is not None and t_vuelo >= proximo_punto:
+            punto = {'t_vuelo': t_vuelo, 'tiempo': tiempo, 'masa': masa,
+                     'pos': pos, 'vel': vel, 'vloss': vloss, 'fue': fue,
+                     'arco': arco}
+            if rtol is not None and arco is None:
+                punto.update(y=integrador.y, h=integrador.h,
+                             k1=integrador.k1)
+            puntos.append(punto)
+            proximo_punto = proximo_punto + INTERVALO_CACHE
+
+    if rtol is not None:
+        if integrador is not None:
+            actualizar_informe(informe, integrador.pasos,
+                               integrador.rechazados, integrador.evaluaciones)
+    else:
+        actualizar_informe(informe, pasos, 0, pasos + (pasos > 0))
+    actualizar_informe(informe, tramos, 0, tramos)
+    if informe is not None and kepler is not None:
+        informe['kepler'] = informe.get('kepler', 0) + tramos
+
+    gamma = angulo_trayectoria(pos, vel)
     if perdidas:
-        gamma = 90 - degrees(arccos(dot(vel, pos)/(norm(vel)*norm(pos))))
         return masa, tiempo, pos, vel, gamma, vloss
-    
-    gamma = 90 - degrees(arccos(dot(vel, pos)/(norm(vel)*norm(pos))))
     return masa, tiempo, pos, vel, gamma
 
 
+class CacheLanzamiento(object):
+    '''
+    Cache de estados del lanzamiento para reanudar integraciones que solo
+    cambian parámetros posteriores (por ejemplo, el retardo de la última
+    etapa en el bucle de simulador_trayectorias.py).
+
+    Para cada frontera entre etapas (antes del retardo de encendido de cada
+    etapa y tras la última etapa) se guarda el estado del lanzador bajo una
+    clave formada por los parámetros de los que depende (ver
+    clave_frontera()). Durante el retardo que sigue a la frontera se
+    guardan además puntos del vuelo libre cada INTERVALO_CACHE segundos, de
+    modo que un retardo distinto se reanuda desde el último punto anterior
+    a su fin.
+
+    Parámetros
+    ----------
+    max_claves : int
+        Número máximo de claves que se conservan; se descartan las usadas
+        hace más tiempo. Por defecto es max_claves=MAX_CLAVES_CACHE.
+    '''
+    def __init__(self, max_claves=MAX_CLAVES_CACHE):
+        self.max_claves = max_claves
+        self.entradas = OrderedDict()
+
+    def entrada(self, clave):
+        '''
+        Devuelve la entrada (diccionario con la frontera y los puntos del
+        retardo) de la clave <clave>, o None si no existe.
+        '''
+        entrada = self.entradas.get(clave)
+        if entrada is not None:
+            self.entradas.move_to_end(clave)
+        return entrada
+
+    def guardar_frontera(self, clave, estado):
+        '''
+        Guarda el estado <estado> de la frontera de clave <clave>.
+        '''
+        if clave not in self.entradas:
+            self.entradas[clave] = {'frontera': estado, 'puntos': []}
+            if len(self.entradas) > self.max_claves:
+                self.entradas.popitem(last=False)
+        self.entradas.move_to_end(clave)
+
+    def punto_previo(self, clave, t_vuelo):
+        '''
+        Devuelve el último punto guardado del retardo de la clave <clave>
+        anterior al tiempo de vuelo libre <t_vuelo>, o None si no hay.
+        '''
+        previos = [punto for punto in self.entradas[clave]['puntos']
+                   if punto['t_vuelo'] < t_vuelo]
+        return previos[-1] if previos else None
+
+    def anadir_puntos(self, clave, puntos):
+        '''
+        Añade al retardo de la clave <clave> los puntos de <puntos>
+        posteriores a los ya guardados.
+        '''
+        guardados = self.entradas[clave]['puntos']
+        ultimo = guardados[-1]['t_vuelo'] if guardados else -inf
+        guardados.extend(punto for punto in puntos
+                         if punto['t_vuelo'] > ultimo)
+
+
+def clave_frontera(i, masas, estructuras, gastos, isps, posicion_inicial,
+                   velocidad_inicial, retardos, diccionario_tiempo, ajustes,
+                   geometria=GEOMETRIA_NOMINAL, tabla=None, atmosfera=None):
+    '''
+    Clave de CacheLanzamiento de la frontera anterior a la etapa <i>
+    (empezando en 0; i = número de etapas para la frontera tras la última
+    etapa). Contiene todo aquello de lo que depende el estado en la
+    frontera: el estado inicial, la masa total, los parámetros de las
+    etapas anteriores, los tiempos de esas etapas en el diccionario de
+    tiempos y su programa del ángulo de ataque, los ajustes de la
+    integración <ajustes>, la geometría del lanzador <geometria>, la base
+    de datos de coeficientes aerodinámicos <tabla> y el modelo atmosférico
+    tabulado <atmosfera>.
+    '''
+    def valores(valor):
+        return tuple(float(x) for x in atleast_1d(valor).ravel())
+
+    etapas = tuple(valores([masas[j], estructuras[j], gastos[j], isps[j],
+                            retardos[j]]) for j in range(i))
+    tiempos = tuple(valores(diccionario_tiempo['etapa_' + str(j + 1)])
+                    for j in range(i))
+    return (valores(posicion_inicial), valores(velocidad_inicial),
+            float(sum(masas)), etapas,
+            float(diccionario_tiempo['t_inicial']), tiempos,
+            tuple(valores(ajuste) if ajuste is not None else None
+                  for ajuste in ajustes),
+            diccionario_tiempo.get('programa_alfa'), geometria, tabla,
+            atmosfera)
+
+
 def lanzamiento(masas, estructuras, gastos, isps, posicion_inicial,
                 velocidad_inicial, inc_inicial, retardos,
                 diccionario_tiempo={}, step_size=DT, alt_maxima=inf,
-                perdidas=False, imprimir=False, aletas=True, ala=True):
+                perdidas=False, imprimir=False, aletas=True, ala=True,
+                rtol=None, atol=ATOL, informe=None, eventos=(), cache=None,
+                kepler=None, registro=None, geometria=GEOMETRIA_NOMINAL,
+                tabla=None, atmosfera=None):
     '''
     Ejecuta todos los pasos de integración del lanzamiento.
     Utiliza las condiciones iniciales para iniciarse. En función de las
@@ -389,8 +919,71 @@ def lanzamiento(masas, estructuras, gastos, isps, posicion_inicial,
         defecto es perdidas=False.
 
     imprimir : string
-        Nombre del archivo de escritura. Si imprimir=False, no se
-        escribe. Por defecto es imprimir=False.
+        Nombre del archivo de texto de resultados (ver
+        RegistroTrayectoria.guardar_texto()), que se escribe al terminar el
+        lanzamiento junto con la velocidad de inyección por pantalla. Si
+        imprimir=False, no se escribe nada. Por defecto es imprimir=False.
+
+    rtol : float
+        Tolerancia relativa del integrador adaptativo Dormand-Prince 5(4).
+        Si rtol=None se integra con paso fijo step_size. Por defecto es
+        rtol=None.
+
+    atol : float o array (8 componentes)
+        Tolerancia absoluta del integrador adaptativo. Por defecto es
+        atol=ATOL (ATOL=1e-6).
+
+    informe : dictionary
+        Diccionario en el que se acumulan los pasos aceptados ('pasos'),
+        rechazados ('rechazados') y las evaluaciones de las fuerzas
+        ('evaluaciones') de todo el lanzamiento, así como los eventos
+        ocurridos ('eventos'). Si se llega al final de la última etapa,
+        también se guarda el estado de inyección ('inyeccion'), un
+        diccionario con el tiempo, la altitud, la velocidad, el ángulo de
+        la trayectoria y las pérdidas de velocidad (None si no se computan).
+        Por defecto es informe=None.
+
+    eventos : list
+        Eventos adicionales (objetos modulos.eventos.Evento) que se
+        localizan en todas las fases del lanzamiento. Por defecto es
+        eventos=().
+
+    cache : object
+        Objeto CacheLanzamiento en el que se guardan los estados en las
+        fronteras entre etapas y desde el que se reanuda el lanzamiento si
+        ya se ha integrado con los mismos parámetros previos. Solo se usa
+        si imprimir=False, registro=None y no hay eventos adicionales. Por
+        defecto es cache=None.
+
+    kepler : float
+        Presión dinámica (Pa) por debajo de la cual los vuelos libres se
+        propagan analíticamente (ver vuelo_libre()). Si kepler=None, siempre
+        se integran. Por defecto es kepler=None.
+
+    registro : object
+        Objeto modulos.registro.RegistroTrayectoria en el que se registra
+        la trayectoria completa (el estado inicial y el final de cada paso).
+        Si imprimir no es False y registro=None, se crea uno internamente
+        para escribir el archivo de resultados. Por defecto es
+        registro=None.
+
+    geometria : GeometriaLanzador
+        Geometría del lanzador (modulos.aerodinamica.geometria_misil). Por
+        defecto es GEOMETRIA_NOMINAL.
+
+    tabla : object
+        Base de datos de coeficientes aerodinámicos
+        (modulos.aerodinamica.tabla_aerodinamica.TablaAerodinamica) con la
+        que se obtienen cd y cn en todo el lanzamiento, en lugar del modelo
+        analítico. Su geometría ha de ser <geometria>. Por defecto es
+        tabla=None (modelo analítico).
+
+    atmosfera : object
+        Modelo atmosférico tabulado
+        (modulos.atmosfera.tabla_atmosfera.AtmosferaTabulada) con el que se
+        obtiene el estado atmosférico en todo el lanzamiento, en lugar del
+        modelo NRL-MSISE00. Por defecto es atmosfera=None (modelo
+        NRL-MSISE00).
     '''
     # Condiciones iniciales
     mas = sum(masas)
@@ -398,8 +991,8 @@ def lanzamiento(masas, estructuras, gastos, isps, posicion_inicial,
     vel = velocidad_inicial
     gamma = degrees(inc_inicial)
     altur = norm(pos) - RT
-    archivo = False
-    coef_fuerzas = CoeficienteFuerza()
+    # Configuración aerodinámica inicial: primera etapa, con aletas y ala
+    config = ConfiguracionVuelo(aletas=True, ala=True, geometria=geometria)
     v_iny = False
     gam_iny = False
 
@@ -408,145 +1001,191 @@ def lanzamiento(masas, estructuras, gastos, isps, posicion_inicial,
     except(KeyError):
         raise TimeDictionaryError()
 
-    coef_fuerzas.set_aletas()
-    coef_fuerzas.set_ala()
-    if perdidas:
-        per = 0
-
-    if imprimir:
-        archivo = open(imprimir, 'w')
-        archivo.write(format('Tiempo (s)','^12')
-                      + '\t' + format('Altura (m)','^12')
-                      + '\t' + format('Velocidad (m/s)','^17')
-                      + '\t' + format('Masa (kg)', '^11')
-                      + '\t' + format('Gamma (º)','^13')
-                      + '\t' + format('Alfa (º)','^17')
-                      + '\t' + format('Factor de Carga (-)','^13')
-                      + '\t' + format('Etapa (-)','^13')
-                      + '\t' + format('Propulsión (-)','^15')
-                      + '\n' + format(tie, '^12.3f')
-                      + '\t' + format(altur, '^12.1f')
-                      + '\t' + format(norm(vel), '^17.1f')
-                      + '\t' + format(mas, '^11.1f')
-                      + '\t' + format(gamma, '^13.3f')
-                      + '\t' + format(0, '^14.3f')
-                      + '\t' + format(1, '^14.3f')
-                      + '\t' + format(1, '^17.3f')
-                      + '\t' + format('Off', '^14'))
-        
-        archivo2 = open('caracteristicas_aerodinamicas', 'w')
-        archivo2.write(format('Tiempo (s)','^17')
-                      + '\t' + format('CD (-)','^17')
-                      + '\t' + format('CN (-)','^17')
-                      + '\t' + format('Alfa (º)','^17'))
-
-    for i, gas in enumerate(gastos):
-        coef_fuerzas.set_etapa(i + 1)
-        if coef_fuerzas._etapa != 1:  # Si etapa no es 1 quita ala y aletas
-            coef_fuerzas.set_ala(ala=False)
-            coef_fuerzas.set_aletas(aletas=False)
-        # Retardos de encendido
-        if retardos[i] != 0:
+    per = 0
+
+    # Se reanuda desde la frontera más avanzada que esté en la cache.
+    usar_cache = (cache is not None and not imprimir and registro is None
+                  and not eventos)
+    primera = 0
+    if usar_cache:
+        ajustes = (step_size, alt_maxima, perdidas, aletas, ala, rtol, atol,
+                   kepler)
+        claves = [clave_frontera(i, masas, estructuras, gastos, isps,
+                                 posicion_inicial, velocidad_inicial,
+                                 retardos, diccionario_tiempo, ajustes,
+                                 geometria, tabla, atmosfera)
+                  for i in range(len(gastos) + 1)]
+        for i in range(len(gastos), 0, -1):
+            entrada = cache.entrada(claves[i])
+            if entrada is not None:
+                mas, tie, pos, vel, gamma, per, config = entrada['frontera']
+                primera = i
+                break
+
+    if imprimir and registro is None:
+        registro = RegistroTrayectoria()
+    if registro is not None:
+        registro.anadir(tie, altur, norm(vel), mas, gamma, 0, 1, 1, False)
+
+    # El archivo de resultados se escribe en cualquier salida del
+    # lanzamiento (también si no se alcanza la inyección o si la
+    # integración falla), con la trayectoria registrada hasta entonces.
+    try:
+        for i, gas in enumerate(gastos):
+            if i < primera:
+                continue
+            if usar_cache:
+                cache.guardar_frontera(claves[i], (mas, tie, pos, vel, gamma, per,
+                                                   config))
+            config = config._replace(etapa=i + 1)
+            if config.etapa != 1:  # Si etapa no es 1 quita ala y aletas
+                # La ley de control solo actúa en la primera etapa: fuera de ella
+                # el ángulo de ataque es nulo (ver ley_alfa()).
+                config = config._replace(ala=False, aletas=False, alpha=0)
+            # Retardos de encendido
+            if retardos[i] != 0:
+                reanudar = {}
+                if usar_cache:
+                    reanudar = {'inicio': cache.punto_previo(claves[i],
+                                                             retardos[i]),
+                                'puntos': []}
+                if perdidas:
+                    mas, tie, pos, vel, gamma, per = vuelo_libre(mas, pos, vel,
+                                                                 config,
+                                                                 t_de_vuelo=retardos[i],
+                                                                 tiempo_inicial=tie,
+                                                                 vloss=per,
+                                                                 step_size=step_size,
+                                                                 altura_maxima=alt_maxima,
+                                                                 perdidas=perdidas,
+                                                                 registro=registro,
+                                                                 dic_tie=diccionario_tiempo,
+                                                                 rtol=rtol, atol=atol,
+                                                                 informe=informe,
+                                                                 eventos=eventos,
+                                                                 kepler=kepler,
+                                                                 **reanudar,
+                                                                 tabla=tabla,
+                                                                 atmosfera=atmosfera)
+                else:
+                    mas, tie, pos, vel, gamma = vuelo_libre(mas, pos, vel,
+                                                            config,
+                                                            t_de_vuelo=retardos[i],
+                                                            tiempo_inicial=tie,
+                                                            step_size=step_size,
+                                                            altura_maxima=alt_maxima,
+                                                            registro=registro,
+                                                            dic_tie=diccionario_tiempo,
+                                                            rtol=rtol, atol=atol,
+                                                            informe=informe,
+                                                            eventos=eventos,
+                                                            kepler=kepler,
+                                                            **reanudar,
+                                                            tabla=tabla,
+                                                            atmosfera=atmosfera)
+                if usar_cache:
+                    cache.anadir_puntos(claves[i], reanudar['puntos'])
+                altur = norm(pos) - RT
+                if altur >= alt_maxima:
+                    if perdidas:
+                        return mas, tie, pos, vel, gamma, gam_iny, per
+                    return mas, tie, pos, vel, gamma, gam_iny
+            # Etapas
             if perdidas:
-                mas, tie, pos, vel, gamma, per = vuelo_libre(mas, pos, vel,
-                                                             coef_fuerzas,
-                                                             t_de_vuelo=retardos[i],
-                                                             tiempo_inicial=tie,
-                                                             vloss=per,
-                                                             step_size=step_size,
-                                                             altura_maxima=alt_maxima,
-                                                             perdidas=perdidas,
-                                                             imprimir=archivo,
-                                                             archivo2=archivo2,
-                                                             dic_tie=diccionario_tiempo)
+                mas, tie, pos, vel, gamma, per = etapa(masas[i]*(1 - estructuras[i]),
+                                                       mas, gas, isps[i], pos, vel,
+                                                       config,
+                                                       tiempo_inicial=tie,
+                                                       vloss=per,
+                                                       step_size=step_size,
+                                                       altura_maxima=alt_maxima,
+                                                       perdidas=perdidas,
+                                                       registro=registro,
+                                                       dic_tie=diccionario_tiempo,
+                                                       rtol=rtol, atol=atol,
+                                                       informe=informe,
+                                                       eventos=eventos,
+                                                       tabla=tabla,
+                                                       atmosfera=atmosfera)
             else:
-                mas, tie, pos, vel, gamma = vuelo_libre(mas, pos, vel,
-                                                        coef_fuerzas,
-                                                        t_de_vuelo=retardos[i],
-                                                        tiempo_inicial=tie,
-                                                        step_size=step_size,
-                                                        altura_maxima=alt_maxima,
-                                                        imprimir=archivo,
-                                                        archivo2=archivo2,
-                                                        dic_tie=diccionario_tiempo)
+                mas, tie, pos, vel, gamma = etapa(masas[i] * (1 - estructuras[i]),
+                                                  mas, gas, isps[i], pos, vel,
+                                                  config,
+                                                  tiempo_inicial=tie,
+                                                  step_size=step_size,
+                                                  altura_maxima=alt_maxima,
+                                                  registro=registro,
+                                                  dic_tie=diccionario_tiempo,
+                                                  rtol=rtol, atol=atol,
+                                                  informe=informe,
+                                                  eventos=eventos,
+                                                  tabla=tabla,
+                                                  atmosfera=atmosfera)
+            # La propulsión queda activada desde el encendido de la primera etapa
+            # (también en los retardos y en el vuelo libre posteriores).
+            config = config._replace(propulsion=True)
             altur = norm(pos) - RT
             if altur >= alt_maxima:
-                if imprimir:
-                    archivo.close()
-                    archivo2.close()
                 if perdidas:
                     return mas, tie, pos, vel, gamma, gam_iny, per
                 return mas, tie, pos, vel, gamma, gam_iny
-        # Etapas
-        if perdidas:
-            mas, tie, pos, vel, gamma, per = etapa(masas[i]*(1 - estructuras[i]),
-                                                   mas, gas, isps[i], pos, vel,
-                                                   coef_fuerzas,
-                                                   tiempo_inicial=tie,
-                                                   vloss=per,
-                                                   step_size=step_size,
-                                                   altura_maxima=alt_maxima,
-                                                   perdidas=perdidas,
-                                                   imprimir=archivo,
-                                                   archivo2=archivo2,
-                                                   dic_tie=diccionario_tiempo)
-        else:
-            mas, tie, pos, vel, gamma = etapa(masas[i] * (1 - estructuras[i]),
-                                              mas, gas, isps[i], pos, vel,
-                                              coef_fuerzas,
-                                              tiempo_inicial=tie,
-                                              step_size=step_size,
-                                              altura_maxima=alt_maxima,
-                                              imprimir=archivo,
-                                              archivo2=archivo2,
-                                              dic_tie=diccionario_tiempo)
-        altur = norm(pos) - RT
-        if altur >= alt_maxima:
-            if imprimir:
-                archivo.close()
-                archivo2.close()
+            mas = mas - masas[i] * estructuras[i]
+        if usar_cache and primera < len(gastos):
+            cache.guardar_frontera(claves[-1], (mas, tie, pos, vel, gamma, per,
+                                                config))
+        v_iny = norm(vel)
+        gam_iny = gamma
+        if informe is not None:
+            informe['inyeccion'] = {'tiempo': tie, 'altitud': norm(pos) - RT,
+                                    'velocidad': v_iny, 'gamma': gam_iny,
+                                    'vloss': per if perdidas else None}
+    
+        # Condición que sale de la integración si el gamma de inyección no está
+        # dentro de un valor estipulado.
+        if abs(gam_iny) > GAMMA_INY_MIN:
             if perdidas:
                 return mas, tie, pos, vel, gamma, gam_iny, per
             return mas, tie, pos, vel, gamma, gam_iny
-        mas = mas - masas[i] * estructuras[i]
-    v_iny = norm(vel)
-    gam_iny = gamma
     
-    # Condición que sale de la integración si el gamma de inyección no está
-    # dentro de un valor estipulado.
-    if abs(gam_iny) > GAMMA_INY_MIN:
+        # Vuelo libre tras haberse consumido las etapas (maximo 3000 segundos)
+        if perdidas:
+            mas, tie, pos, vel, gamma, per = vuelo_libre(mas, pos, vel,
+                                                         config,
+                                                         tiempo_inicial=tie,
+                                                         t_de_vuelo=3000,
+                                                         vloss=per,
+                                                         step_size=step_size,
+                                                         altura_maxima=alt_maxima,
+                                                         perdidas=perdidas,
+                                                         registro=registro,
+                                                         dic_tie=diccionario_tiempo,
+                                                         rtol=rtol, atol=atol,
+                                                         informe=informe,
+                                                         eventos=eventos,
+                                                         kepler=kepler,
+                                                         tabla=tabla,
+                                                         atmosfera=atmosfera)
+        else:
+            mas, tie, pos, vel, gamma = vuelo_libre(mas, pos, vel,
+                                                    config,
+                                                    tiempo_inicial=tie,
+                                                    t_de_vuelo=3000,
+                                                    step_size=step_size,
+                                                    altura_maxima=alt_maxima,
+                                                    registro=registro,
+                                                    dic_tie=diccionario_tiempo,
+                                                    rtol=rtol, atol=atol,
+                                                    informe=informe,
+                                                    eventos=eventos,
+                                                    kepler=kepler,
+                                                    tabla=tabla,
+                                                    atmosfera=atmosfera)
+    
+        if imprimir:
+            print('\nVelocidad de inyección: {0:.2f} m/s'.format(v_iny))
         if perdidas:
             return mas, tie, pos, vel, gamma, gam_iny, per
         return mas, tie, pos, vel, gamma, gam_iny
-    
-    # Vuelo libre tras haberse consumido las etapas (maximo 3000 segundos)
-    if perdidas:
-        mas, tie, pos, vel, gamma, per = vuelo_libre(mas, pos, vel,
-                                                     coef_fuerzas,
-                                                     tiempo_inicial=tie,
-                                                     t_de_vuelo=3000,
-                                                     vloss=per,
-                                                     step_size=step_size,
-                                                     altura_maxima=alt_maxima,
-                                                     perdidas=perdidas,
-                                                     imprimir=archivo,
-                                                     archivo2=archivo2,
-                                                     dic_tie=diccionario_tiempo)
-    else:
-        mas, tie, pos, vel, gamma = vuelo_libre(mas, pos, vel,
-                                                coef_fuerzas,
-                                                tiempo_inicial=tie,
-                                                t_de_vuelo=3000,
-                                                step_size=step_size,
-                                                altura_maxima=alt_maxima,
-                                                imprimir=archivo,
-                                                archivo2=archivo2,
-                                                dic_tie=diccionario_tiempo)
-    
-    if imprimir:
-        archivo.close()
-        archivo2.close()
-    if perdidas:
-        print('\nVelocidad de inyección: {0:.2f} m/s'.format(v_iny))
-        return mas, tie, pos, vel, gamma, gam_iny, per
-    return mas, tie, pos, vel, gamma, gam_iny
+    finally:
+        if imprimir:
+            registro.guardar_texto(imprimir)
@@ -5,14 +5,19 @@
 Este módulo contiene la mecánica del lanzamiento.
 """
 
-from numpy import sqrt, cross, dot, cos, radians
+from collections import namedtuple
+
+from numpy import (sqrt, cross, dot, cos, sin, radians, einsum, where, errstate,
+                   newaxis, any as np_any)
 from numpy.linalg import norm
 
 from modulos.atmosfera.gravedad import gravity, MU, RT, vel_orbital
-from modulos.atmosfera.modelo_msise00 import temperature, pressure, GAMMA, R_AIR
+from modulos.atmosfera.modelo_msise00 import atmosfera_estado, GAMMA
 from modulos.velocidad_rotacional1 import OMEGA_R
-from modulos.aerodinamica.aero_misil import SREF_MISIL
-#from modulos.aerodinamica.aero_misil import CoeficienteFuerza
+from modulos.aerodinamica.aero_misil import (cd_configuracion,
+                                              cn_configuracion,
+                                              coeficientes_configuracion)
+from modulos.aerodinamica.geometria_misil import GEOMETRIA_NOMINAL
 
 G0 = 9.81  # Constante de dimensionalización del impulso específico (m/s2)
 
@@ -28,8 +33,7 @@ def numero_mach(pos, vel):
         Vector velocidad.
     '''
     altur = norm(pos) - RT
-    tem = temperature(altur)
-    vel_sonido = sqrt(GAMMA * R_AIR * tem)
+    vel_sonido = atmosfera_estado(altur).sonido
     vel_aire = cross(OMEGA_R, pos)
     vel_relativa = vel - vel_aire
     
@@ -47,7 +51,7 @@ def altitud(pos):
     return  alt
 
 
-def empuje(pos, vel, gasto, impulso, coeficientes_fuerza):
+def empuje(pos, vel, gasto, impulso, configuracion):
     '''
     Calcula el empuje del lanzador. En la dirección de la velocidad más el 
     ángulo de ataque del lanzador.
@@ -64,29 +68,33 @@ def empuje(pos, vel, gasto, impulso, coeficientes_fuerza):
     impulso : float
         Impulso específico normalizado.
     
-    coeficientes_fuerza : object
-        Es un objeto en el cual está definida la aerodinámica del lanzador.
+    configuracion : object
+        Configuración del lanzador (aero_misil.ConfiguracionVuelo), de la
+        que se toma el ángulo de ataque.
     '''
     # Calculo la dirección del empuje, suponiendo:
     #     - Forma un ángulo alfa con la velocidad
-    #       (coeficientes_fuerza._angulo_ataque)
+    #       (configuracion.alpha)
     #     - Está contenida en el plano que forman la velocidad y la posición
     #     - Se elige el sentido en el que el ángulo entre velocidad y empuje es
     #       alfa.
-    if coeficientes_fuerza._angulo_ataque != 0:
+    if configuracion.alpha != 0:
         pos_un = pos/norm(pos)
         vel_un = vel/norm(vel)
         prod_vec = dot(pos_un, vel_un)
         if prod_vec == 0:
-            t = cos(coeficientes_fuerza._angulo_ataque)
+            t = cos(configuracion.alpha)
             s = sqrt(1 - t**2)
         else:
             # Ec. Segundo grado
             a = (1/prod_vec**2) - 1
-            b = 2*cos(coeficientes_fuerza._angulo_ataque)*(1 - (1/prod_vec**2))
-            c = (cos(coeficientes_fuerza._angulo_ataque))**2/prod_vec**2 - 1
-            t = (-1*b - sqrt(b**2 - 4*a*c))/(2*a)
-            s = (cos(coeficientes_fuerza._angulo_ataque) - t)/prod_vec
+            b = 2*cos(configuracion.alpha)*(1 - (1/prod_vec**2))
+            # El discriminante b**2 - 4*a*c es igual a 4*a*sin(alfa)**2; se
+            # calcula así porque cerca de prod_vec = 0 la resta cancela y
+            # puede salir negativo.
+            t = (-1*b - 2*sqrt(a)
+                 * abs(sin(configuracion.alpha)))/(2*a)
+            s = (cos(configuracion.alpha) - t)/prod_vec
         dir_emp = s*pos_un + t*vel_un
         dir_emp_un = dir_emp/norm(dir_emp)
     else:
@@ -101,7 +109,7 @@ def empuje(pos, vel, gasto, impulso, coeficientes_fuerza):
     return gasto * G0 * impulso * dir_emp_un
 
 
-def resistencia(pos, vel, coeficientes_fuerza):
+def resistencia(pos, vel, configuracion):
     '''
     Calcula la fuerza de resistencia del lanzador. En la dirección de la
     velocidad pero sentido contrario.
@@ -112,19 +120,19 @@ def resistencia(pos, vel, coeficientes_fuerza):
     vel : array (3 componentes)
         Vector velocidad.
 
-    coeficientes_fuerza : object
-        Es un objeto en el cual está definida la aerodinámica del lanzador.
+    configuracion : object
+        Configuración del lanzador (aero_misil.ConfiguracionVuelo).
     '''
     altur = norm(pos) - RT
     mach = numero_mach(pos, vel)
 
-    cd_lanzador = coeficientes_fuerza.cd_total(mach, altur)
+    cd_lanzador = cd_configuracion(configuracion, mach, altur)
 
-    return -(.5 * GAMMA * pressure(altur) * mach**2 * SREF_MISIL * cd_lanzador
-             * vel / norm(vel))
+    return -(.5 * GAMMA * atmosfera_estado(altur).presion * mach**2
+             * configuracion.geometria.sref * cd_lanzador * vel / norm(vel))
 
 
-def sustentacion(pos, vel, coeficientes_fuerza):
+def sustentacion(pos, vel, configuracion):
     '''
     Calcula la fuerza normal o sustentación del lanzador. En dirección
     perpendicular a la velocidad.
@@ -132,20 +140,34 @@ def sustentacion(pos, vel, coeficientes_fuerza):
         Vector posición.
     vel : array (3 componentes)
         Vector velocidad.
-    coeficientes_fuerza : object
-        Es un objeto en el cual está definida la aerodinámica del lanzador.
+    configuracion : object
+        Configuración del lanzador (aero_misil.ConfiguracionVuelo).
     '''
     altur = norm(pos) - RT
     mach = numero_mach(pos, vel)
-    cn_lanzador = coeficientes_fuerza.cn_total(mach)
+    cn_lanzador = cn_configuracion(configuracion, mach)
     
+    n_un = direccion_normal(pos/norm(pos), vel/norm(vel))
+
+    return (.5*GAMMA*atmosfera_estado(altur).presion*mach**2
+            *configuracion.geometria.sref*cn_lanzador*n_un)
+
+
+def direccion_normal(pos_un, vel_un):
+    '''
+    Calcula el vector unitario en la dirección de la fuerza normal.
+
+    pos_un : array (3 componentes)
+        Vector posición unitario.
+
+    vel_un : array (3 componentes)
+        Vector velocidad unitario.
+    '''
     # Calculo la dirección de la sustentación, suponiendo:
     #     - Es perpendicular a la velocidad
     #     - Está contenida en el plano que forman la velocidad y la posición
     #     - Se elige el sentido en el que el ángulo entre velocidad y
     #       sustentación forman 90º partiendo desde vel. a sus.
-    pos_un = pos/norm(pos)
-    vel_un = vel/norm(vel)
     prod_vec = dot(pos_un, vel_un)
     if prod_vec == 0:
         t = 0
@@ -159,9 +181,8 @@ def sustentacion(pos, vel, coeficientes_fuerza):
         s = 1/sqrt(1 - prod_vec**2)
     n = s*pos_un + t*vel_un # Define un vector coplanario a la posición y la velocidad,
     # combinación lineal de estos dos vectores.
-    n_un = n/norm(n)
 
-    return (.5*GAMMA*pressure(altur)*mach**2*SREF_MISIL*cn_lanzador*n_un)
+    return n/norm(n)
 
 
 def peso(pos, mas):
@@ -179,7 +200,7 @@ def peso(pos, mas):
     return -mas * gravity(altur) * pos / norm(pos)
 
     
-def aceleracion(pos, vel, mas, gasto, isp, coeficientes_fuerza):
+def aceleracion(pos, vel, mas, gasto, isp, configuracion):
     '''Calcula la aceleración total del lanzador.
 
     pos : array (3 componentes)
@@ -197,18 +218,274 @@ def aceleracion(pos, vel, mas, gasto, isp, coeficientes_fuerza):
     isp : float
         Impulso específico.
 
-    coeficientes_fuerza : object
-        Es un objeto en el cual está definida la aerodinámica del lanzador.
+    configuracion : object
+        Configuración del lanzador (aero_misil.ConfiguracionVuelo).
     '''
     
-    emp = empuje(pos, vel, gasto, isp, coeficientes_fuerza)  # Empuje
-    res = resistencia(pos, vel, coeficientes_fuerza)  # Resistencia
-    nor = sustentacion(pos, vel, coeficientes_fuerza)  # Sustentación o Normal
-    pes = peso(pos, mas)  # Peso
+    return fuerzas(pos, vel, mas, gasto, isp, configuracion).aceleracion()
+
+
+class Fuerzas(namedtuple('Fuerzas', ['empuje', 'resistencia', 'sustentacion',
+                                     'peso', 'masa', 'mach', 'cd', 'cn',
+                                     'factor_carga', 'presion_dinamica'])):
+    '''
+    Registro de las fuerzas que actúan sobre el lanzador en un estado dado.
+    Se obtiene con la función fuerzas() y permite reutilizar en un mismo
+    paso de integración la atmósfera, el Mach y los coeficientes
+    aerodinámicos sin volver a calcularlos.
+
+    Atributos
+    ---------
+    empuje, resistencia, sustentacion, peso : array (3 componentes)
+        Fuerzas de empuje, resistencia, normal y peso (N).
+
+    masa : float
+        Masa con la que se ha calculado el peso (kg).
+
+    mach : float
+        Número de Mach.
+
+    cd, cn : float
+        Coeficientes de resistencia y normal.
+
+    factor_carga : float
+        Factor de carga (sustentación entre peso).
+
+    presion_dinamica : float
+        Presión dinámica (Pa).
+    '''
+    __slots__ = ()
+
+    def aceleracion(self, mas=None):
+        '''
+        Aceleración total del lanzador. Si se indica la masa <mas>, las
+        fuerzas aerodinámicas y el empuje se dividen entre ella, mientras que
+        el peso se escala con la gravedad local, de modo que el registro sirve
+        para cualquier masa.
+        '''
+        if mas is None:
+            mas = self.masa
+        return ((self.empuje + self.resistencia + self.sustentacion) / mas
+                + self.peso / self.masa)
+
+    def tasa_perdidas(self, vel):
+        '''
+        Derivada temporal de las pérdidas de velocidad aerodinámica y
+        gravitatoria (m/s2) para la velocidad <vel> del estado del registro.
+        '''
+        loss_aero = norm(self.resistencia) / self.masa
+        loss_grav = -dot(self.peso, vel) / (norm(vel) * self.masa)
+        return loss_aero + loss_grav
+
+
+def fuerzas(pos, vel, mas, gasto, isp, configuracion, tabla=None,
+            atmosfera=None):
+    '''
+    Calcula todas las fuerzas sobre el lanzador con una única evaluación de
+    la atmósfera, del número de Mach y de los coeficientes aerodinámicos.
+    Devuelve un registro Fuerzas.
+
+    pos : array (3 componentes)
+        Vector posición.
+
+    vel : array (3 componentes)
+        Vector velocidad.
+
+    mas : float
+        Masa.
+
+    gasto : float
+        Gasto másico.
+
+    isp : float
+        Impulso específico.
+
+    configuracion : object
+        Configuración del lanzador (aero_misil.ConfiguracionVuelo).
+
+    tabla : object
+        Base de datos de coeficientes aerodinámicos
+        (modulos.aerodinamica.tabla_aerodinamica.TablaAerodinamica) de la
+        que se obtienen cd y cn. Si tabla=None, se evalúa el modelo
+        analítico (aero_misil.coeficientes_configuracion()). Por defecto es
+        tabla=None.
+
+    atmosfera : object
+        Modelo atmosférico tabulado
+        (modulos.atmosfera.tabla_atmosfera.AtmosferaTabulada) del que se
+        obtiene el estado atmosférico. Si atmosfera=None, se evalúa
+        modelo_msise00.atmosfera_estado(). Por defecto es atmosfera=None.
+    '''
+    radio = norm(pos)
+    altur = radio - RT
+    pos_un = pos / radio
+    vel_un = vel / norm(vel)
+
+    # Estado atmosférico y número de Mach
+    if atmosfera is None:
+        atm = atmosfera_estado(altur)
+    else:
+        atm = atmosfera.estado(altur)
+    mach = norm(vel - cross(OMEGA_R, pos)) / atm.sonido
 
-    fuerza = emp + res + pes + nor  # Fuerza resultante total
+    # Coeficientes aerodinámicos
+    if tabla is None:
+        cd_lanzador, cn_lanzador = coeficientes_configuracion(configuracion,
+                                                              mach, altur)
+    else:
+        cd_lanzador = tabla.cd(configuracion, mach, altur)
+        cn_lanzador = tabla.cn(configuracion, mach)
 
-    return fuerza / mas
+    pres_dinamica = .5 * GAMMA * atm.presion * mach**2
+    sref = configuracion.geometria.sref  # Superficie de referencia
+    emp = empuje(pos, vel, gasto, isp, configuracion)  # Empuje
+    res = -pres_dinamica * sref * cd_lanzador * vel_un  # Resistencia
+    nor = (pres_dinamica * sref * cn_lanzador
+           * direccion_normal(pos_un, vel_un))  # Sustentación o Normal
+    pes = -mas * gravity(altur) * pos_un  # Peso
+
+    return Fuerzas(emp, res, nor, pes, mas, mach, cd_lanzador, cn_lanzador,
+                   norm(nor) / norm(pes), pres_dinamica)
+
+
+class FuerzasConjunto(Fuerzas):
+    '''
+    Registro de las fuerzas de un conjunto de N lanzadores, obtenido con la
+    función fuerzas_conjunto(). Tiene los mismos atributos que Fuerzas, pero
+    las fuerzas son arrays (N, 3) y los escalares arrays (N,).
+    '''
+    __slots__ = ()
+
+    def aceleracion(self, mas=None):
+        '''
+        Aceleración total de cada lanzador (array (N, 3)). Ver
+        Fuerzas.aceleracion().
+        '''
+        if mas is None:
+            mas = self.masa
+        return ((self.empuje + self.resistencia + self.sustentacion)
+                / mas[:, newaxis] + self.peso / self.masa[:, newaxis])
+
+    def tasa_perdidas(self, vel):
+        '''
+        Derivada temporal de las pérdidas de velocidad de cada lanzador
+        (array (N,)). Ver Fuerzas.tasa_perdidas().
+        '''
+        loss_aero = norm(self.resistencia, axis=1) / self.masa
+        loss_grav = (-einsum('ij,ij->i', self.peso, vel)
+                     / (norm(vel, axis=1) * self.masa))
+        return loss_aero + loss_grav
+
+    def seleccionar(self, indices):
+        '''
+        Devuelve el registro de los lanzadores <indices>.
+        '''
+        return FuerzasConjunto(*(campo[indices] for campo in self))
+
+
+def empuje_conjunto(pos_un, vel_un, vel_nom, altur, gasto, impulso, alfa):
+    '''
+    Calcula el empuje de un conjunto de N lanzadores (array (N, 3)). Es la
+    versión vectorizada de empuje(), con las mismas hipótesis sobre la
+    dirección del empuje.
+
+    pos_un, vel_un : array (N, 3)
+        Vectores posición y velocidad unitarios.
+
+    vel_nom, altur : array (N,)
+        Módulos de la velocidad y altitudes.
+
+    gasto, impulso, alfa : array (N,)
+        Gastos másicos, impulsos específicos y ángulos de ataque (rad).
+    '''
+    cos_alfa = cos(alfa)
+    prod_vec = einsum('ij,ij->i', pos_un, vel_un)
+    nulo = prod_vec == 0
+    with errstate(divide='ignore', invalid='ignore'):
+        # Ec. Segundo grado
+        a = (1/prod_vec**2) - 1
+        b = 2*cos_alfa*(1 - (1/prod_vec**2))
+        # Discriminante b**2 - 4*a*c = 4*a*sin(alfa)**2 (ver empuje())
+        t = where(nulo, cos_alfa,
+                  (-1*b - 2*sqrt(a)*abs(sin(alfa)))/(2*a))
+        s = where(nulo, sqrt(1 - cos_alfa**2), (cos_alfa - t)/prod_vec)
+    s = where(alfa != 0, s, 0)
+    t = where(alfa != 0, t, 1)
+    dir_emp = s[:, newaxis]*pos_un + t[:, newaxis]*vel_un
+    dir_emp_un = dir_emp / norm(dir_emp, axis=1)[:, newaxis]
+
+    # Sin empuje si se supera la velocidad orbital
+    modulo = where(vel_nom >= vel_orbital(altur), 0, gasto * G0 * impulso)
+    return modulo[:, newaxis] * dir_emp_un
+
+
+def direccion_normal_conjunto(pos_un, vel_un):
+    '''
+    Calcula los vectores unitarios (array (N, 3)) en la dirección de la
+    fuerza normal de un conjunto de N lanzadores. Es la versión vectorizada
+    de direccion_normal().
+
+    pos_un, vel_un : array (N, 3)
+        Vectores posición y velocidad unitarios.
+    '''
+    prod_vec = einsum('ij,ij->i', pos_un, vel_un)
+    if np_any(prod_vec == 1):
+        raise ValueError('Error: la posición y la velocidad están' +
+                         'en la misma dirección y no está definida la' +
+                         'dirección de la sustentación')
+    t = -1*prod_vec/sqrt(1 - prod_vec**2)
+    s = 1/sqrt(1 - prod_vec**2)
+    n = s[:, newaxis]*pos_un + t[:, newaxis]*vel_un
+
+    return n / norm(n, axis=1)[:, newaxis]
+
+
+def fuerzas_conjunto(pos, vel, mas, gasto, isp, alfa, coeficientes,
+                     geometria=GEOMETRIA_NOMINAL):
+    '''
+    Calcula todas las fuerzas sobre un conjunto de N lanzadores a la vez.
+    Es la versión vectorizada de fuerzas(). Devuelve un registro
+    FuerzasConjunto.
+
+    pos, vel : array (N, 3)
+        Vectores posición y velocidad.
+
+    mas, gasto, isp, alfa : array (N,)
+        Masas, gastos másicos, impulsos específicos y ángulos de ataque
+        (rad).
+
+    coeficientes : function
+        Función coeficientes(mach, altur) que devuelve los arrays (N,) de
+        los coeficientes de resistencia y normal de cada lanzador.
+
+    geometria : GeometriaLanzador
+        Geometría de los lanzadores, de la que se toma la superficie de
+        referencia. Por defecto es GEOMETRIA_NOMINAL.
+    '''
+    radio = norm(pos, axis=1)
+    altur = radio - RT
+    pos_un = pos / radio[:, newaxis]
+    vel_nom = norm(vel, axis=1)
+    vel_un = vel / vel_nom[:, newaxis]
+
+    # Estado atmosférico y número de Mach
+    atm = atmosfera_estado(altur)
+    mach = norm(vel - cross(OMEGA_R, pos), axis=1) / atm.sonido
+
+    # Coeficientes aerodinámicos
+    cd_lanzador, cn_lanzador = coeficientes(mach, altur)
+
+    pres_dinamica = .5 * GAMMA * atm.presion * mach**2
+    emp = empuje_conjunto(pos_un, vel_un, vel_nom, altur, gasto, isp, alfa)
+    res = -(pres_dinamica * geometria.sref * cd_lanzador)[:, newaxis] * vel_un
+    nor = ((pres_dinamica * geometria.sref * cn_lanzador)[:, newaxis]
+           * direccion_normal_conjunto(pos_un, vel_un))
+    pes = -(mas * gravity(altur))[:, newaxis] * pos_un
+
+    return FuerzasConjunto(emp, res, nor, pes, mas, mach, cd_lanzador,
+                           cn_lanzador,
+                           norm(nor, axis=1) / norm(pes, axis=1),
+                           pres_dinamica)
 
 
 def energia_mecanica(mas, pos, vel):
@@ -231,6 +508,26 @@ def energia_mecanica(mas, pos, vel):
     return mec
 
 
+class ProgramaAlfa(namedtuple('ProgramaAlfa', ['alfa_encendido',
+                                               'alfa_apagado'])):
+    '''
+    Programa del ángulo de ataque de la primera etapa, que sustituye a la
+    ley fija de ley_alfa() si se incluye en el diccionario de tiempos bajo
+    la clave 'programa_alfa' (ver
+    modulos.tiempo.division_temporal.tiempos_lanzamiento()). El ángulo de
+    ataque crece linealmente desde 0 durante el retardo de encendido de la
+    primera etapa hasta <alfa_encendido> y varía linealmente durante la
+    combustión hasta <alfa_apagado>.
+
+    Atributos
+    ---------
+    alfa_encendido, alfa_apagado : float
+        Ángulo de ataque en el encendido y en el apagado de la primera
+        etapa (deg).
+    '''
+    __slots__ = ()
+
+
 def ley_alfa(t, diccionario_tiempo):
     '''
     Ley de control del ángulo de ataque en función del tiempo. Devuelve el
@@ -240,17 +537,68 @@ def ley_alfa(t, diccionario_tiempo):
         tiempo global.
     diccionario_tiempo : dictionary
         diccionario con tiempos inicial de lanzamiento y tiempos
-        característicos de cada etapa.
+        característicos de cada etapa. Si contiene un programa del ángulo
+        de ataque (clave 'programa_alfa', objeto ProgramaAlfa), se sigue
+        ese programa; si no, el ángulo crece a 2.5/4 deg/s durante el
+        retardo y se mantiene en 2.5 deg durante la combustión.
     '''
     key_inicio = 't_inicial'
     key = 'etapa_1'
     var_inicio = diccionario_tiempo[key_inicio]
     var_key = diccionario_tiempo[key]
+    programa = diccionario_tiempo.get('programa_alfa')
     
-    if var_inicio < t < var_key[0]:
+    if programa is not None:
+        if var_inicio < t < var_key[0]:
+            alfa = (radians(programa.alfa_encendido) * (t - var_inicio)
+                    / (var_key[0] - var_inicio))
+        elif var_key[0] <= t <= var_key[1]:
+            fraccion = (t - var_key[0]) / (var_key[1] - var_key[0])
+            alfa = radians(programa.alfa_encendido + fraccion
+                           * (programa.alfa_apagado
+                              - programa.alfa_encendido))
+        else:
+            alfa = 0
+    elif var_inicio < t < var_key[0]:
         alfa = radians(2.5/4)*(t - var_inicio)
     elif var_key[0] <= t <= (var_key[1] - 0.0):
         alfa = radians(2.5)
     else:
         alfa = 0
     return alfa
+
+
+def ley_alfa_conjunto(t, diccionario_tiempo):
+    '''
+    Versión vectorizada de ley_alfa() para un conjunto de lanzadores.
+    Devuelve un array con el ángulo de ataque (rad) de cada uno.
+
+    t : array
+        Tiempos globales.
+
+    diccionario_tiempo : dictionary
+        Diccionario como el de ley_alfa() en el que los tiempos son arrays
+        con un valor por lanzador. Los ángulos del programa del ángulo de
+        ataque, si lo hay, pueden ser comunes o arrays con un valor por
+        lanzador.
+    '''
+    var_inicio = diccionario_tiempo['t_inicial']
+    var_key = diccionario_tiempo['etapa_1']
+    programa = diccionario_tiempo.get('programa_alfa')
+
+    if programa is not None:
+        # Se evalúan ambos tramos en todos los lanzadores (los retardos
+        # nulos dan una división por cero en el tramo que no se usa).
+        with errstate(divide='ignore', invalid='ignore'):
+            rampa = (radians(programa.alfa_encendido) * (t - var_inicio)
+                     / (var_key[0] - var_inicio))
+            fraccion = (t - var_key[0]) / (var_key[1] - var_key[0])
+        return where((var_inicio < t) & (t < var_key[0]), rampa,
+                     where((var_key[0] <= t) & (t <= var_key[1]),
+                           radians(programa.alfa_encendido + fraccion
+                                   * (programa.alfa_apagado
+                                      - programa.alfa_encendido)), 0.))
+    return where((var_inicio < t) & (t < var_key[0]),
+                 radians(2.5/4)*(t - var_inicio),
+                 where((var_key[0] <= t) & (t <= var_key[1] - 0.0),
+                       radians(2.5), 0.))
@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+"""
+@author: Team REOS
+
+Módulo que contiene el modelo sustituto (superficie de respuesta) del
+lanzamiento: un polinomio en varias variables que aproxima la altitud, la
+velocidad, el ángulo de trayectoria y las pérdidas de velocidad de la
+inyección en función de los parámetros principales de inputs_iniciales.
+
+El polinomio se ajusta por mínimos cuadrados
+(modulos.modulo_aproximacion.aprox_pol_multiple()) a los resultados de un
+diseño de experimentos (hipercubo latino) cuyos lanzamientos se integran
+en paralelo con montecarlo.montecarlo(). Una parte de los lanzamientos no
+se usa en el ajuste y sirve para estimar el error del modelo. El modelo se
+guarda en un archivo .npz y cada consulta cuesta unas decenas de
+microsegundos, de modo que los optimizadores y las herramientas
+interactivas solo necesitan integrar el lanzamiento para confirmar los
+candidatos finales.
+
+Las variables se nombran como las columnas de montecarlo.guardar_tabla():
+el nombre del parámetro de inputs_iniciales y, si es un array, el número
+del elemento (por ejemplo, 'MASAS_4' es la masa de la carga de pago).
+"""
+
+from time import time
+
+import numpy as np
+from numpy import radians
+
+from montecarlo import muestras, montecarlo, NOMINALES, TIPO_RESULTADO
+from integracion import DT, Q_KEPLER
+from modulos.modulo_aproximacion import aprox_pol_multiple, matriz_polinomio
+
+ARCHIVO_MODELO = 'modelo_sustituto.npz'
+SALIDAS = [campo for campo, tipo in TIPO_RESULTADO]
+# Variables del modelo y sus intervalos
+RANGOS = {'MASAS_4': (8., 12.),  # Carga de pago (kg)
+          'RETARDOS_IN_1': (2., 6.),  # s
+          'RETARDOS_IN_3': (370., 400.),  # s
+          'Z0': (10000., 12000.),  # m
+          'V_inicial': (250., 310.),  # m/s
+          'INC': (radians(-2.), radians(2.))}  # rad
+GRADO = 2  # Grado total del polinomio
+NUM_ENSAYOS = 100  # Número de lanzamientos del diseño de experimentos
+FRACCION_VALIDACION = .2  # Fracción de lanzamientos reservados
+
+
+def campo_variable(nombre):
+    '''
+    Devuelve la tupla (campo, indice) de la variable <nombre> en
+    montecarlo.TIPO_MUESTRA; indice es None si el campo es un escalar.
+    '''
+    campo, _, numero = nombre.rpartition('_')
+    if numero.isdigit() and campo in NOMINALES:
+        return campo, int(numero) - 1
+    if nombre not in NOMINALES:
+        raise ValueError('La variable ' + nombre + ' no es un parámetro de '
+                         'montecarlo.TIPO_MUESTRA.')
+    return nombre, None
+
+
+def valor_nominal(nombre):
+    '''
+    Valor nominal (de inputs_iniciales) de la variable <nombre>.
+    '''
+    campo, indice = campo_variable(nombre)
+    if indice is None:
+        return float(NOMINALES[campo])
+    return float(NOMINALES[campo][indice])
+
+
+def diseno_experimentos(num, rangos=RANGOS, semilla=None):
+    '''
+    Genera <num> muestras del lanzamiento (array estructurado de tipo
+    montecarlo.TIPO_MUESTRA) con las variables de <rangos> repartidas en
+    un hipercubo latino sobre sus intervalos y el resto de parámetros en
+    sus valores nominales.
+
+    num : int
+        Número de muestras.
+
+    rangos : dictionary
+        Intervalo (mínimo, máximo) de cada variable. Por defecto es
+        rangos=RANGOS.
+
+    semilla : int
+        Semilla del generador aleatorio. Por defecto es semilla=None.
+    '''
+    generador = np.random.default_rng(semilla)
+    tabla = muestras(num, dispersion={})
+    for nombre, (minimo, maximo) in rangos.items():
+        campo, indice = campo_variable(nombre)
+        # Un punto en cada uno de los num intervalos iguales, en orden
+        # aleatorio
+        fraccion = (generador.permutation(num) + generador.random(num)) / num
+        valores = minimo + fraccion * (maximo - minimo)
+        if indice is None:
+            tabla[campo] = valores
+        else:
+            tabla[campo][:, indice] = valores
+    return tabla
+
+
+def variables_tabla(tabla, variables):
+    '''
+    Matriz (muestras, variables) con los valores de las variables
+    <variables> en las muestras de <tabla> (montecarlo.TIPO_MUESTRA).
+    '''
+    columnas = []
+    for nombre in variables:
+        campo, indice = campo_variable(nombre)
+        columnas.append(tabla[campo] if indice is None
+                        else tabla[campo][:, indice])
+    return np.column_stack(columnas)
+
+
+class ModeloSustituto(object):
+    '''
+    Superficie de respuesta polinómica del estado de inyección.
+
+    Parámetros
+    ----------
+    variables : list
+        Nombres de las variables (ver campo_variable()).
+
+    minimos, maximos : array
+        Intervalo de cada variable. Las variables se normalizan a [-1, 1]
+        en ese intervalo antes de evaluar el polinomio; fuera de él el
+        modelo extrapola.
+
+    grado : int
+        Grado total del polinomio.
+
+    x, y : array
+        Datos del diseño de experimentos: variables (muestras, variables)
+        y salidas (muestras, SALIDAS) de los lanzamientos que llegan a la
+        inyección.
+
+    validacion : array de bool
+        Muestras reservadas para estimar el error, que no se usan en el
+        ajuste.
+
+    Atributos
+    ---------
+    coeficientes, exponentes : array
+        Coeficientes y exponentes de los monomios (ver
+        modulos.modulo_aproximacion.aprox_pol_multiple()).
+
+    errores : dictionary
+        Error de cada salida en las muestras reservadas: diccionario con el
+        error cuadrático medio ('rms'), el error máximo ('maximo') y el
+        coeficiente de determinación ('r2', 1 - SSE/SST).
+    '''
+    def __init__(self, variables, minimos, maximos, grado, x, y, validacion):
+        self.variables = list(variables)
+        self.minimos = np.asarray(minimos, dtype=float)
+        self.maximos = np.asarray(maximos, dtype=float)
+        self.grado = grado
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        self.validacion = np.asarray(validacion, dtype=bool)
+        self.coeficientes, self.exponentes = aprox_pol_multiple(
+            self.normalizar(self.x[~self.validacion]),
+            self.y[~self.validacion], grado)
+        self.errores = {}
+        if self.validacion.any():
+            reales = self.y[self.validacion]
+            aproximados = self.evaluar(self.x[self.validacion])
+            for k, salida in enumerate(SALIDAS):
+                residuo = aproximados[:, k] - reales[:, k]
+                # Fuera de la muestra del ajuste, R2 = 1 - SSE/SST (puede
+                # ser negativo si el modelo es peor que la media)
+                dispersion = reales[:, k] - reales[:, k].mean()
+                self.errores[salida] = {
+                    'rms': float(np.sqrt(np.mean(residuo**2))),
+                    'maximo': float(np.max(np.abs(residuo))),
+                    'r2': float(1 - np.sum(residuo**2)
+                                / np.sum(dispersion**2))}
+
+    def normalizar(self, x):
+        '''Variables normalizadas a [-1, 1] en sus intervalos.'''
+        return 2 * (x - self.minimos) / (self.maximos - self.minimos) - 1
+
+    def evaluar(self, x):
+        '''
+        Salidas del modelo (array (puntos, SALIDAS)) en los puntos x, un
+        array de forma (puntos, variables) o (variables,) con las variables
+        en el orden de self.variables. Si x es un único punto, se devuelve
+        un array de forma (SALIDAS,).
+        '''
+        x = np.asarray(x, dtype=float)
+        salidas = matriz_polinomio(self.normalizar(np.atleast_2d(x)),
+                                   self.exponentes) @ self.coeficientes
+        return salidas[0] if x.ndim == 1 else salidas
+
+    def consultar(self, **valores):
+        '''
+        Salidas del modelo en un punto dado por los valores de las
+        variables como argumentos (por ejemplo, consultar(MASAS_4=11.)).
+        Las variables que no se indican toman su valor nominal. Devuelve un
+        diccionario {salida: valor}.
+        '''
+        desconocidas = set(valores) - set(self.variables)
+        if desconocidas:
+            raise ValueError('Variables desconocidas: '
+                             + ', '.join(sorted(desconocidas)) + '.')
+        x = [valores.get(nombre, valor_nominal(nombre))
+             for nombre in self.variables]
+        return dict(zip(SALIDAS, self.evaluar(x).tolist()))
+
+    def informe(self):
+        '''
+        Devuelve un texto con el número de ensayos y el error de cada
+        salida en las muestras reservadas.
+        '''
+        lineas = ['Modelo sustituto de grado {0} en {1} variables: {2} '
+                  'ensayos de ajuste, {3} de validación'
+                  .format(self.grado, len(self.variables),
+                          int((~self.validacion).sum()),
+                          int(self.validacion.sum()))]
+        for salida, error in self.errores.items():
+            lineas.append('{0}:\trms {1:.4g}\tmáximo {2:.4g}\tR2 {3:.6f}'
+                          .format(salida, error['rms'], error['maximo'],
+                                  error['r2']))
+        return '\n'.join(lineas)
+
+    def guardar(self, nombre=ARCHIVO_MODELO):
+        '''
+        Guarda el modelo (con los datos del diseño de experimentos) en el
+        archivo .npz <nombre>.
+        '''
+        np.savez(nombre, variables=np.array(self.variables),
+                 minimos=self.minimos, maximos=self.maximos,
+                 grado=self.grado, x=self.x, y=self.y,
+                 validacion=self.validacion)
+
+
+def cargar_modelo(nombre=ARCHIVO_MODELO):
+    '''
+    Carga un modelo guardado con ModeloSustituto.guardar() y devuelve un
+    objeto ModeloSustituto (el ajuste se repite a partir de los datos
+    guardados, sin integrar ningún lanzamiento).
+    '''
+    with np.load(nombre) as contenido:
+        return ModeloSustituto([str(v) for v in contenido['variables']],
+                               contenido['minimos'], contenido['maximos'],
+                               int(contenido['grado']), contenido['x'],
+                               contenido['y'], contenido['validacion'])
+
+
+def entrenar(num=NUM_ENSAYOS, rangos=RANGOS, grado=GRADO,
+             validacion=FRACCION_VALIDACION, semilla=None, procesos=None,
+             step_size=DT, rtol=None, kepler=Q_KEPLER):
+    '''
+    Integra los lanzamientos de un diseño de experimentos y ajusta con
+    ellos un modelo sustituto. Devuelve un objeto ModeloSustituto.
+
+    num : int
+        Número de lanzamientos. Por defecto es num=NUM_ENSAYOS.
+
+    rangos : dictionary
+        Variables del modelo y sus intervalos (ver diseno_experimentos()).
+        Por defecto es rangos=RANGOS.
+
+    grado : int
+        Grado total del polinomio. Por defecto es grado=GRADO.
+
+    validacion : float
+        Fracción de los lanzamientos que se reservan para estimar el
+        error. Por defecto es validacion=FRACCION_VALIDACION.
+
+    semilla : int
+        Semilla del diseño de experimentos y de la elección de los
+        lanzamientos reservados. Por defecto es semilla=None.
+
+    procesos : int
+        Número de procesos (ver montecarlo.montecarlo()).
+
+    step_size, rtol, kepler : float
+        Parámetros de la integración (ver montecarlo.caso()).
+    '''
+    generador = np.random.default_rng(semilla)
+    tabla = diseno_experimentos(num, rangos, generador)
+    resultados = montecarlo(tabla, procesos=procesos, step_size=step_size,
+                            rtol=rtol, kepler=kepler)
+    y = np.column_stack([resultados[salida] for salida in SALIDAS])
+    # Solo se ajustan los lanzamientos que llegan a la inyección
+    validos = ~np.isnan(y).any(axis=1)
+    x = variables_tabla(tabla, rangos)[validos]
+    y = y[validos]
+    reservados = np.zeros(len(y), dtype=bool)
+    reservados[generador.permutation(len(y))[:round(validacion
+                                                    * len(y))]] = True
+    minimos, maximos = np.array(list(rangos.values())).T
+    return ModeloSustituto(list(rangos), minimos, maximos, grado, x, y,
+                           reservados)
+
+
+if __name__ == '__main__':
+    TIME = time()
+    MODELO = entrenar(semilla=0)
+    MODELO.guardar()
+    print(MODELO.informe())
+    print('\nTiempo de ejecución: ' + format(time() - TIME, '.4f') + ' s')
@@ -5,123 +5,67 @@
 En este módulo se incluye una clase que define los coeficientes de fuerzas de
 un lanzador (resistencia, normal, momento).
 
-Para ello previamente se realizan unos cálculos geométricos necesarios y se
-definen ciertas funciones de apoyo, además del de intervalo de régimen
-transónico.
+Las magnitudes geométricas necesarias se toman de la geometría del lanzador
+(registro GeometriaLanzador de geometria_misil.py, por defecto
+GEOMETRIA_NOMINAL), y se definen ciertas funciones de apoyo, además del
+intervalo de régimen transónico.
 
 Para corregir el régimen transónico se aproximan polinómicamente las funciones
 globales:
-    - cntotal()
-    - cdtotal()
-    - cmtotal()
+    - cn_total()
+    - cd_total()
+    - cm_total()
+Los coeficientes de estas aproximaciones se guardan en una caché
+(PUENTES_TRANSONICOS) para no volver a calcularlos en cada llamada. Las
+claves no incluyen las variables continuas de las que los coeficientes
+dependen linealmente: el término inducido de cd (alfa y delta) se
+aproxima aparte y cm se guarda en dos posiciones fijas del centro de
+gravedad.
+
+El estado del flujo (registro EstadoFlujo: velocidad, densidad, viscosidad
+y Reynolds por unidad de longitud) se calcula una sola vez en cd_total() y
+se pasa a los coeficientes de fricción y de onda.
+
+La configuración del lanzador (etapa, ángulos y elementos presentes) se
+describe con el registro inmutable ConfiguracionVuelo, que incluye su
+geometría, de modo que en un mismo proceso pueden evaluarse lanzadores con
+geometrías distintas. Las funciones
+cd_configuracion(), cn_configuracion() y cm_configuracion() calculan los
+coeficientes de una configuración sin modificar ningún objeto, por lo que
+pueden usarse a la vez desde varios hilos o lanzadores.
+
+Al final del módulo se incluyen las versiones vectorizadas de los
+coeficientes totales (cd_vectorizado(), cn_vectorizado() y
+cm_vectorizado()), que admiten arrays de Mach, altitud, ángulo de ataque y
+configuración y reproducen los métodos de CoeficienteFuerza sin recorrer
+los puntos uno a uno.
 """
 
-from math import log10, pi, degrees, atan, sqrt, cos, radians
-from numpy import size, array, ndarray, dot
+from collections import OrderedDict, namedtuple
+from threading import Lock
+from math import log10, pi, atan, sqrt, cos, radians
+from numpy import size, array, dot
+import numpy as np
 
 from inputs_iniciales import MASAS, GASTOS, N_ETAPAS
 from modulos.modulo_aproximacion import aprox_pol
-from modulos.atmosfera.modelo_msise00 import (GAMMA, density, temperature,
-                                              R_AIR, viscosity)
-from modulos.aerodinamica.geometria_misil import (DIAMETRO_M, LONGITUD_CONO,
-                                                  LONGITUD_MISIL, TIPO_NARIZ,
-                                                  DIAMETRO_S)
-from modulos.aerodinamica.geometria_misil import (NUM_ALETAS, FACTOR_ALETA,
-                                                  ESPESOR_ALETA, CMEDIA_ALETA,
-                                                  CRAIZ_ALETA,
-                                                  ENVERGADURA_ALETAS)
-from modulos.aerodinamica.geometria_misil import (ESPESOR_ALA, FACTOR_ALA,
-                                                  CRAIZ_ALA, X_ALA,
-                                                  ENVERGADURA_ALA)
+from modulos.atmosfera.modelo_msise00 import GAMMA, atmosfera_estado
+from modulos.aerodinamica.geometria_misil import GEOMETRIA_NOMINAL
 from errores import NoseError
 import warnings
 
 
 # CARACTERÍSTICAS GEOMÉTRICAS DEL MISIL
 # -------------------------------------
-
-# Ángulo del cuerpo(deg).
-ANGULO_NARIZ = [degrees(atan(.5 * DIAMETRO_M / LONGITUD_CONO)),
-                2*degrees(atan(.5 * DIAMETRO_M / LONGITUD_CONO))]
-
-# Superficie exterior del cono (m2)
-SUP_CONO = pi * DIAMETRO_M / 2 * sqrt(LONGITUD_CONO**2 + DIAMETRO_M**2 / 4)
-
-# Superficie de referencia del misil (m2)
-SREF_MISIL = pi * DIAMETRO_M**2 / 4
-
-# Superficie de la base (m2)
-SBASE = SREF_MISIL  # No tiene porque ser igual a la de referencia.
-
-# Superficie del cilindro en cada etapa (m2)
-SUP_CIL = []
-for s in LONGITUD_MISIL:
-    if s == LONGITUD_MISIL[-1]:
-        break
-    SUP_CIL.append(pi*DIAMETRO_M*(s - LONGITUD_CONO))
-
-# Superficie salida de gases del cilindro en cada etapa (m2)
-SGASES = []
-for i in range(size(DIAMETRO_S)):
-    sgases_aux = pi * (DIAMETRO_S[i])**2 / 4
-    SGASES.append(sgases_aux)
-
-# Superficie total de las aletas (m2)
-SW_ALETA = ENVERGADURA_ALETAS*CMEDIA_ALETA/2
-SWTOTAL_ALETAS = SW_ALETA * NUM_ALETAS 
-
-# Superficie total del ala (m2)
-SW_ALA= CRAIZ_ALA*ENVERGADURA_ALA/2 
-
-FLECHA_ALETA = 0  # Se suponen aletas rectangulares
-FLECHA_ALA = atan(CRAIZ_ALA/ENVERGADURA_ALA)  # rad
-ESPESOR_MEDIO_ALA = ESPESOR_ALA/CRAIZ_ALA
-ESPESOR_MEDIO_ALETA = ESPESOR_ALETA/CMEDIA_ALETA
-A_ALA = 2*ENVERGADURA_ALA/CRAIZ_ALA
-A_ALETAS = ENVERGADURA_ALETAS/CMEDIA_ALETA
+# Las magnitudes que dependen de la geometría (superficies, alargamientos,
+# factores de interferencia, centros de presión...) se calculan en
+# GeometriaLanzador (geometria_misil.py); cada configuración lleva la suya.
 
 # Factores de forma para el cono y el cilindro obtenidos de los apuntes UPM
 # Se utiilzan para los coeficientes de fricción
 FF_CONO = 4/sqrt(3)
 FF_CILINDRO = 1.25
 
-# Parámetros para el cálculo de del coeficiente normal
-Kwb = 1+DIAMETRO_M/(ENVERGADURA_ALETAS+DIAMETRO_M)
-Kbw = ((DIAMETRO_M/(DIAMETRO_M+ENVERGADURA_ALETAS))*
-       (1+DIAMETRO_M/(ENVERGADURA_ALETAS+DIAMETRO_M)))
-kbm = DIAMETRO_M/(ENVERGADURA_ALETAS+DIAMETRO_M)
-kmb = 1
-
-# Centros de presión de cada parte del lanzador. Como referencia se toma la
-# proa del misil, es decir, se miden las distancias desde la punta del lanzador
-xcp_cono=2/3*LONGITUD_CONO
-xcp_cil = []
-for xlan in LONGITUD_MISIL:
-    if xlan == LONGITUD_MISIL[-1]:
-        break
-    xcp_cilindro_aux=(xlan+LONGITUD_CONO)/2
-    xcp_cil.append(xcp_cilindro_aux)
-xcp_aletas=LONGITUD_MISIL[0]-CMEDIA_ALETA/2
-xcp_ala=X_ALA-CRAIZ_ALA/2
-
-# Distancias de la punta del cono al centro de gravedad de cada etapa por
-# separado: payload, etapa 1, etapa 2, ..., etapa n.
-MAT = ndarray(shape=(N_ETAPAS + 1,N_ETAPAS + 1), dtype=float)
-L_ETAPAS = []
-for i in range(N_ETAPAS + 1):
-    for j in range(N_ETAPAS + 1):
-        if i == j:
-            MAT[i,j] = 1/2
-        elif i < j:
-            MAT[i,j] = 1
-        else:
-            MAT[i,j] = 0
-    if i != N_ETAPAS:
-        L_ETAPAS.append(LONGITUD_MISIL[i] - LONGITUD_MISIL[i + 1])
-    else:
-        L_ETAPAS.append(LONGITUD_MISIL[i])
-X_ETAPAS = dot(MAT, L_ETAPAS)
-
 # INTERVALO DE RÉGIMEN TRANSÓNICO
 # -------------------------------
 inicio_transonico = 0.85
@@ -130,10 +74,84 @@ def condicion_transonico(mach):
     a = (inicio_transonico < mach < fin_transonico)
     return a
 
+# Las aproximaciones de cd se calculan en altitudes múltiplo de este paso (m)
+PASO_ALT_TRANSONICO = 50.
+MAX_PUENTES = 512  # Número máximo de aproximaciones guardadas
+
+
+class CachePuentes(object):
+    '''
+    Caché de los coeficientes de las aproximaciones polinómicas del régimen
+    transónico. Cada aproximación depende de la configuración del lanzador
+    (ver CoeficienteFuerza.configuracion()) y, en su caso, de la altitud o
+    de la posición del centro de gravedad, que forman la clave. Las
+    consultas están protegidas con un cerrojo, por lo que la caché puede
+    compartirse entre hilos; las aproximaciones se calculan fuera de él.
+
+    Parámetros
+    ----------
+    max_claves : int
+        Número máximo de claves que se conservan; se descartan las usadas
+        hace más tiempo. Por defecto es max_claves=MAX_PUENTES.
+
+    Atributos
+    ---------
+    aciertos, fallos : int
+        Número de consultas resueltas con la caché y calculadas.
+    '''
+    def __init__(self, max_claves=MAX_PUENTES):
+        self.max_claves = max_claves
+        self.entradas = OrderedDict()
+        self.aciertos = 0
+        self.fallos = 0
+        self._cerrojo = Lock()
+
+    def obtener(self, clave, calcular):
+        '''
+        Devuelve los coeficientes de la clave <clave>. Si no están
+        guardados, se obtienen con la función calcular() y se guardan.
+        '''
+        with self._cerrojo:
+            coef = self.entradas.get(clave)
+            if coef is not None:
+                self.aciertos += 1
+                self.entradas.move_to_end(clave)
+                return coef
+            self.fallos += 1
+        coef = calcular()
+        with self._cerrojo:
+            self.entradas[clave] = coef
+            if len(self.entradas) > self.max_claves:
+                self.entradas.popitem(last=False)
+        return coef
+
+    def vaciar(self):
+        '''
+        Elimina todas las aproximaciones guardadas.
+        '''
+        with self._cerrojo:
+            self.entradas.clear()
+            self.aciertos = 0
+            self.fallos = 0
+
+
+PUENTES_TRANSONICOS = CachePuentes()
+
+
+def evaluar_puente(coef, mach):
+    '''
+    Evalúa en <mach> el polinomio de coeficientes <coef> (de menor a mayor
+    grado).
+    '''
+    res = 0
+    for i, ci in enumerate(coef):
+        res = res + ci*mach**i
+    return res
+
 # FUNCIONES DE APOYO PARA EL CÁLCULO DE COEFICIENTES
 # --------------------------------------------------
 
-def posicion_cg(diccionario_tiempo, t):
+def posicion_cg(diccionario_tiempo, t, geometria=GEOMETRIA_NOMINAL):
     '''
     Calculo de la posición del centro de gravedad en función de:
         - t : float
@@ -141,6 +159,8 @@ def posicion_cg(diccionario_tiempo, t):
         - diccionario_tiempo : dictionary
               diccionario con tiempo inicial de lanzamiento y tiempos
               característicos de cada etapa.
+        - geometria : GeometriaLanzador
+              geometría del lanzador. Por defecto es GEOMETRIA_NOMINAL.
     '''
     
     
@@ -173,7 +193,7 @@ def posicion_cg(diccionario_tiempo, t):
     pesos_etapas.append(w_p)
     pesos_etapas = array(pesos_etapas)
     sum_w = sum(pesos_etapas)
-    x_cdg_p = dot(pesos_etapas, X_ETAPAS)/sum_w
+    x_cdg_p = dot(pesos_etapas, geometria.x_etapas)/sum_w
     return x_cdg_p
 
 
@@ -227,6 +247,79 @@ def f_comp(mach):
         return sqrt(mach**2 - 1)
   
 
+# ESTADO DEL FLUJO
+# ----------------
+
+class EstadoFlujo(namedtuple('EstadoFlujo',
+                             ['velocidad', 'densidad', 'viscosidad',
+                              'reynolds_unitario'])):
+    '''
+    Estado del flujo incidente del que dependen los coeficientes de
+    fricción, que se obtiene con la función estado_flujo().
+
+    Atributos
+    ---------
+    velocidad : float o array
+        Velocidad respecto al aire (m/s).
+
+    densidad : float o array
+        Densidad (kg/m3).
+
+    viscosidad : float o array
+        Viscosidad dinámica (Pa s).
+
+    reynolds_unitario : float o array
+        Número de Reynolds por unidad de longitud (1/m).
+    '''
+    __slots__ = ()
+
+
+def estado_flujo(mach, alt):
+    '''
+    Estado del flujo (registro EstadoFlujo) para el número de mach <mach> y
+    la altitud <alt> (m), con una única evaluación de la atmósfera. Si mach
+    y alt son arrays, sus atributos son arrays.
+    '''
+    atm = atmosfera_estado(alt)
+    vel = mach*atm.sonido  # velocidad respecto al aire
+    return EstadoFlujo(vel, atm.densidad, atm.viscosidad,
+                       atm.densidad*vel/atm.viscosidad)
+
+
+# CONFIGURACIÓN DEL LANZADOR
+# --------------------------
+
+class ConfiguracionVuelo(namedtuple('ConfiguracionVuelo',
+                                    ['etapa', 'delta', 'alpha', 'propulsion',
+                                     'aletas', 'ala', 'geometria'])):
+    '''
+    Configuración del lanzador de la que dependen sus coeficientes de
+    fuerza. Es inmutable: para cambiar un atributo se crea una configuración
+    nueva con _replace().
+
+    Atributos
+    ---------
+    etapa : int
+        Etapa del lanzador.
+
+    delta, alpha : float
+        Ángulos de deflexión de mando y de ataque (rad).
+
+    propulsion, aletas, ala : bool
+        Indican si hay propulsión y si existen las aletas y el ala.
+
+    geometria : GeometriaLanzador
+        Geometría del lanzador (geometria_misil.py). Por defecto es
+        GEOMETRIA_NOMINAL.
+    '''
+    __slots__ = ()
+
+    def __new__(cls, etapa=1, delta=0, alpha=0, propulsion=False,
+                aletas=False, ala=False, geometria=GEOMETRIA_NOMINAL):
+        return super().__new__(cls, etapa, delta, alpha, propulsion, aletas,
+                               ala, geometria)
+
+
 # CLASE QUE DEFINE LOS COEFICIENTES DE FUERZA
 # -------------------------------------------
 
@@ -248,6 +341,10 @@ class CoeficienteFuerza(object):
            
     aletas, ala, prop : boolean
            Indican si existen o no las aletas, ala y la propulsión.
+
+    geometria : GeometriaLanzador
+           Geometría del lanzador (geometria_misil.py). Por defecto es la
+           del lanzador nominal, GEOMETRIA_NOMINAL.
     
     Atributos
     ---------
@@ -262,26 +359,34 @@ class CoeficienteFuerza(object):
             
     _aletas, _ala, _prop : bool
             Indican si existen o no las aletas, el ala y propulsión.
-            
-    cdtotal : float
-            Valor del coeficiente de resistencia total.
-            
-    cntotal : float
-            Valor del coeficiente normal total.
-            
-    cmtotal : float
-            Valor del coeficiente de momento total.
+
+    _geometria : GeometriaLanzador
+            Geometría del lanzador.
+
+    Los métodos que calculan los coeficientes no modifican el objeto.
     '''
     def __init__(self, etapa=1, delta=0, alpha=0, propulsion=False,
-                 aletas=False, ala=False):
+                 aletas=False, ala=False, geometria=GEOMETRIA_NOMINAL):
         self._etapa = etapa
         self._deflexion_mando = delta
         self._angulo_ataque = alpha
         self._prop = propulsion
         self._aletas = aletas
         self._ala = ala
+        self._geometria = geometria
 
         return None  # __init__ retorna None por defecto, no debe devolver otra cosa.
+
+
+    def configuracion(self):
+        '''
+        Registro ConfiguracionVuelo con los atributos que definen los
+        coeficientes del lanzador: etapa, deflexión de mando, ángulo de
+        ataque, propulsión, aletas, ala y geometría.
+        '''
+        return ConfiguracionVuelo(self._etapa, self._deflexion_mando,
+                                  self._angulo_ataque, self._prop,
+                                  self._aletas, self._ala, self._geometria)
     
     
     # MÉTODOS QUE PERMITEN LA VARIACIÓN DE ATRIBUTOS
@@ -293,11 +398,12 @@ class CoeficienteFuerza(object):
         Asigna un valor al atributo '_etapa'. Éste ha de ser como máximo el
         número de etapas que haya y como mínimo 1.
         '''
-        if etapa > size(LONGITUD_MISIL):
-            if size(LONGITUD_MISIL) == 1:
+        geo = self._geometria
+        if etapa > size(geo.longitud_misil):
+            if size(geo.longitud_misil) == 1:
                 raise ValueError('El número de etapa ha de ser 1')
             raise ValueError('El número de la etapa ha de estar entre 1 y ' +
-                             str(size(LONGITUD_MISIL)) + '.')
+                             str(size(geo.longitud_misil)) + '.')
         if etapa < 1:
             raise ValueError('La etapa del lanzador no puede ser menor que 1.')
 
@@ -376,56 +482,64 @@ class CoeficienteFuerza(object):
             - n_etapa: Indica el numero de la etapa en la que estamos, pues es
                        necesario para la superficie de salida de gases
         '''
+        geo = self._geometria
         if self._prop == False:
             if mach < 0.8:
                 Cdb_prima = 0.14026
-                Cdb = Cdb_prima*SBASE/SREF_MISIL
+                Cdb = Cdb_prima*geo.sbase/geo.sref
             elif 0.8 <= mach < 1:
                 Cdb_prima = (3.2751*mach**3 - 8.1789*mach**2 +
                              6.8665*mach - 1.7954)
-                Cdb = Cdb_prima*SBASE/SREF_MISIL
+                Cdb = Cdb_prima*geo.sbase/geo.sref
             elif 1 <= mach < 1.095:
                 Cdb_prima = (-150.3*mach**3 + 466.52*mach**2 -
                              481.64*mach + 165.59)
-                Cdb = Cdb_prima*SBASE/SREF_MISIL
+                Cdb = Cdb_prima*geo.sbase/geo.sref
             elif 1.095 <= mach <= 1.5:
                 Cdb_prima = 0.2226*mach**2 - 0.7103*mach + 0.7391
-                Cdb = Cdb_prima*SBASE/SREF_MISIL
+                Cdb = Cdb_prima*geo.sbase/geo.sref
             elif mach > 1.5:
                 Cdb_prima = 0.0076*mach**2 - 0.0854*mach + 0.2846
-                Cdb = Cdb_prima*SBASE/SREF_MISIL
+                Cdb = Cdb_prima*geo.sbase/geo.sref
         else:
+            # Superficie de la base sin la salida de gases
+            s_base = geo.sbase - geo.sgases[self._etapa - 1]
             if mach < 0.8:
                 Cdb_prima = 0.14026
-                Cdb = Cdb_prima*(SBASE-SGASES[self._etapa - 1])/SREF_MISIL
+                Cdb = Cdb_prima*s_base/geo.sref
             elif 0.8 <= mach < 1:
                 Cdb_prima = (3.2751*mach**3 - 8.1789*mach**2 +
                              6.8665*mach - 1.7954)
-                Cdb = Cdb_prima*(SBASE-SGASES[self._etapa - 1])/SREF_MISIL
+                Cdb = Cdb_prima*s_base/geo.sref
             elif 1 <= mach < 1.095:
                 Cdb_prima = (-150.3*mach**3 + 466.52*mach**2 -
                              481.64*mach + 165.59)
-                Cdb = Cdb_prima*(SBASE-SGASES[self._etapa - 1])/SREF_MISIL
+                Cdb = Cdb_prima*s_base/geo.sref
             elif 1.095 <= mach <= 1.5:
                 Cdb_prima = 0.2226*mach**2 - 0.7103*mach + 0.7391
-                Cdb = Cdb_prima*(SBASE-SGASES[self._etapa - 1])/SREF_MISIL
+                Cdb = Cdb_prima*s_base/geo.sref
             elif mach > 1.5:
                 Cdb_prima = 0.0076*mach**2 - 0.0854*mach + 0.2846
-                Cdb= Cdb_prima*(SBASE-SGASES[self._etapa - 1])/SREF_MISIL
+                Cdb= Cdb_prima*s_base/geo.sref
     
         return Cdb
     
 
-    def cf_cono(self, mach, alt):
+    def cf_cono(self, mach, alt, flujo=None):
         '''
         Coeficiente de fricción del cono.
         
         Para una primera aproximación solo se tiene en cuenta que el flujo
         alrededor del cono es laminar, para ello se impone una condición en
         el Reynolds que es irreal: es laminar para Re < 1e10.
+
+        Si se da el estado del flujo <flujo> (registro EstadoFlujo), no se
+        evalúa la atmósfera.
         '''
-        vel = mach*sqrt(GAMMA * R_AIR * temperature(alt))  # velocidad respecto al aire
-        re_cono = density(alt)*vel*LONGITUD_CONO/viscosity(alt)
+        geo = self._geometria
+        if flujo is None:
+            flujo = estado_flujo(mach, alt)
+        re_cono = flujo.reynolds_unitario*geo.longitud_cono
         # LAMINAR
         if re_cono < 1e10:
             # CÁLCULO COEFICIENTE DE FRICCIÓN LOCAL INCOMPRESIBLE
@@ -438,10 +552,10 @@ class CoeficienteFuerza(object):
             cfi_cono = .288 / log10(re_cono)**2.45 * FF_CONO
             # CÁLCULO COEFICIENTE DE FRICCIÓN TOTAL
             cfm_cono = cfi_cono / (1 + (GAMMA - 1) / 2 * mach**2)**.467
-        return cfm_cono * SUP_CONO / SREF_MISIL
+        return cfm_cono * geo.sup_cono / geo.sref
 
 
-    def cf_cil(self, mach, alt):
+    def cf_cil(self, mach, alt, flujo=None):
         '''
         Coeficiente de fricción del cilindro.
         
@@ -453,11 +567,15 @@ class CoeficienteFuerza(object):
                   número de mach.
             - alt : float
                   altitud del lanzador (m).
+            - flujo : EstadoFlujo
+                  estado del flujo. Si no se da, se calcula con
+                  estado_flujo().
         '''
-        vel = mach*sqrt(GAMMA * R_AIR * temperature(alt))  # velocidad respecto al aire
-        re_cil = (density(alt)*vel*
-                  ((LONGITUD_MISIL[self._etapa - 1] - LONGITUD_CONO)/
-                   viscosity(alt)))
+        geo = self._geometria
+        if flujo is None:
+            flujo = estado_flujo(mach, alt)
+        re_cil = (flujo.reynolds_unitario
+                  *(geo.longitud_misil[self._etapa - 1] - geo.longitud_cono))
         # LAMINAR
         if re_cil < 1e5:
             # CÁLCULO COEFICIENTE DE FRICCIÓN LOCAL INCOMPRESIBLE
@@ -470,19 +588,24 @@ class CoeficienteFuerza(object):
             cfi_cil = .288 / log10(re_cil)**2.45 * FF_CILINDRO
             # CÁLCULO COEFICIENTE DE FRICCIÓN TOTAL
             cfm_cil = cfi_cil / (1 + (GAMMA - 1) / 2 * mach**2)**.467
-        return cfm_cil * SUP_CIL[self._etapa - 1] / SREF_MISIL    
+        return cfm_cil * geo.sup_cil[self._etapa - 1] / geo.sref    
     
     
-    def cf_aletas(self, mach, alt):
+    def cf_aletas(self, mach, alt, flujo=None):
         '''
         Coeficiente de fricción de las aletas. En función de:
             - mach : float
                   número de mach.
             - alt : float
                   altitud del lanzador (m).
+            - flujo : EstadoFlujo
+                  estado del flujo. Si no se da, se calcula con
+                  estado_flujo().
         '''
-        vel = mach*sqrt(GAMMA * R_AIR * temperature(alt))  # velocidad respecto al aire
-        re_aleta = density(alt)*vel*CRAIZ_ALETA/viscosity(alt)
+        geo = self._geometria
+        if flujo is None:
+            flujo = estado_flujo(mach, alt)
+        re_aleta = flujo.reynolds_unitario*geo.craiz_aleta
         # LAMINAR.
         if re_aleta < 1e5:
             # CÁLCULO COEFICIENTE DE FRICCIÓN LOCAL INCOMPRESIBLE.
@@ -501,19 +624,24 @@ class CoeficienteFuerza(object):
             # CÁLCULO COEFICIENTE DE FRICCIÓN MEDIO.
             cfmaletas = cf1aletas *(-0.0002*mach**4 + 0.005*mach**3 -
                                     0.0387*mach**2 + 0.0203*mach + 0.9933)
-        return cfmaletas * SWTOTAL_ALETAS / SREF_MISIL
+        return cfmaletas * geo.swtotal_aletas / geo.sref
 
 
-    def cf_ala(self, mach, alt):
+    def cf_ala(self, mach, alt, flujo=None):
         '''
         Coeficiente de fricción del ala. En función de:
             - mach : float
                   número de mach.
             - alt : float
                   altitud del lanzador (m).
+            - flujo : EstadoFlujo
+                  estado del flujo. Si no se da, se calcula con
+                  estado_flujo().
         '''
-        vel = mach*sqrt(GAMMA * R_AIR * temperature(alt))  # velocidad respecto al aire
-        re_ala = density(alt)*vel*CRAIZ_ALA/viscosity(alt)
+        geo = self._geometria
+        if flujo is None:
+            flujo = estado_flujo(mach, alt)
+        re_ala = flujo.reynolds_unitario*geo.craiz_ala
         # LAMINAR.
         if re_ala < 1e5:
             # CÁLCULO COEFICIENTE DE FRICCIÓN LOCAL INCOMPRESIBLE.
@@ -532,7 +660,7 @@ class CoeficienteFuerza(object):
             # CÁLCULO COEFICIENTE DE FRICCIÓN MEDIO.
             cfmala = cf1ala *(-0.0002*mach**4 + 0.005*mach**3 - 0.0387*mach**2 +
                               0.0203*mach + 0.9933)
-        return cfmala * SW_ALA / SREF_MISIL
+        return cfmala * geo.sw_ala / geo.sref
     
 
     def cw_misil(self, mach, alt, tipo=0):
@@ -549,12 +677,14 @@ class CoeficienteFuerza(object):
             - tipo : int
                      tipo de nariz, 0-cono, 1-ojiva. Por defecto es cono.
         '''
-        ratio = LONGITUD_CONO / DIAMETRO_M
+        geo = self._geometria
+        ratio = geo.longitud_cono / geo.diametro
         
         if tipo == 0:
             if mach >= 1:
             # RÉGIMEN SUPERSÓNICO.
-                return (.083 + .096/mach**2)*(ANGULO_NARIZ[tipo]/10)**1.69
+                return ((.083 + .096/mach**2)
+                        *(geo.angulo_nariz[tipo]/10)**1.69)
             # RÉGIMEN SUBSÓNICO: Fórmula semiempírica - Resistencia de presión
             return 0
         
@@ -562,7 +692,8 @@ class CoeficienteFuerza(object):
             # Se le aplica una corrección a la resistencia debida al cono.
             if mach >= 1:
             # RÉGIMEN SUPERSÓNICO.
-                cd_cono = (.083 + .096/mach**2)*(ANGULO_NARIZ[tipo]/10)**1.69
+                cd_cono = ((.083 + .096/mach**2)
+                           *(geo.angulo_nariz[tipo]/10)**1.69)
                 cd_correccion = (1 - (392*ratio**2 - 32)/(28*(mach + 18)*ratio**2))
                 return cd_cono*cd_correccion
             # RÉGIMEN SUBSÓNICO: Fórmula semiempírica - Resistencia de presión
@@ -572,7 +703,7 @@ class CoeficienteFuerza(object):
             raise NoseError(tipo)
 
 
-    def cw_aletas(self, mach, alt):
+    def cw_aletas(self, mach, alt, flujo=None):
         '''
         Coeficiente de resistencia de onda de las aletas.
         Coefiente m: posición del espesor máximo.
@@ -582,7 +713,11 @@ class CoeficienteFuerza(object):
                      número de mach
             - alt : float
                      altitud de vuelo (m).
+            - flujo : EstadoFlujo
+                     estado del flujo, que se pasa al coeficiente de
+                     fricción en régimen subsónico.
         '''
+        geo = self._geometria
         m = 0.5
         if m >= 3:
             parametro_L = 1.2
@@ -591,20 +726,20 @@ class CoeficienteFuerza(object):
     
         # RÉGIMEN SUBSÓNICO.
         if mach < 1:
-            cd_w_aleta = ((parametro_L*ESPESOR_MEDIO_ALETA +
-                           100*ESPESOR_MEDIO_ALETA**4)*
-                          ((2*self.cf_aletas(mach, alt))*
-                           factor_Q(mach, FLECHA_ALETA)))
+            cd_w_aleta = ((parametro_L*geo.espesor_medio_aleta +
+                           100*geo.espesor_medio_aleta**4)*
+                          ((2*self.cf_aletas(mach, alt, flujo))*
+                           factor_Q(mach, geo.flecha_aleta)))
             
-            return cd_w_aleta*SWTOTAL_ALETAS/SREF_MISIL
+            return cd_w_aleta*geo.swtotal_aletas/geo.sref
         # RÉGIMEN SUPERSÓNICO
         else:
-            cdw = (4*FACTOR_ALETA*
-                   atan(ESPESOR_MEDIO_ALETA)**2/(sqrt(mach**2 - 1)))
+            cdw = (4*geo.factor_aleta*
+                   atan(geo.espesor_medio_aleta)**2/(sqrt(mach**2 - 1)))
             return cdw
     
 
-    def cw_ala(self, mach, alt):
+    def cw_ala(self, mach, alt, flujo=None):
         '''
         Coeficiente de resistencia de onda del ala.
         Coefiente m: posición del espesor máximo.
@@ -613,7 +748,11 @@ class CoeficienteFuerza(object):
                      número de mach
             - alt : float
                      altitud de vuelo (m).
+            - flujo : EstadoFlujo
+                     estado del flujo, que se pasa al coeficiente de
+                     fricción en régimen subsónico.
         '''
+        geo = self._geometria
         m = 0.5
         if m >= 3:
             parametro_L = 1.2
@@ -623,21 +762,22 @@ class CoeficienteFuerza(object):
         # SUBSÓNICO
         if mach < 1:
             cd_w_ala = (parametro_L*
-                        (ESPESOR_MEDIO_ALA + 100*ESPESOR_MEDIO_ALA**4)*
-                        (2/SREF_MISIL*self.cf_ala(mach, alt))*
-                        ENVERGADURA_ALA*CRAIZ_ALA/2*factor_Q(mach, FLECHA_ALA))
+                        (geo.espesor_medio_ala
+                         + 100*geo.espesor_medio_ala**4)*
+                        (2/geo.sref*self.cf_ala(mach, alt, flujo))*
+                        geo.envergadura_ala*geo.craiz_ala/2*
+                        factor_Q(mach, geo.flecha_ala))
         # SUPERSÓNICO
         else:
-            cd_w_ala = (FACTOR_ALA*4*atan(ESPESOR_MEDIO_ALA)**2/
+            cd_w_ala = (geo.factor_ala*4*atan(geo.espesor_medio_ala)**2/
                         (sqrt(mach**2-1)))
             
-        return (cd_w_ala * SW_ALA/SREF_MISIL)
+        return (cd_w_ala * geo.sw_ala/geo.sref)
     
     
     def cd_total(self, mach, alt):
         '''
         Coeficiente de resistencia total del misil.
-        Además crea el atributo cdtotal.
         
         Definido por:
             - mach : float
@@ -645,30 +785,33 @@ class CoeficienteFuerza(object):
             - alt : float
                      altitud de vuelo (m).
         '''
+        geo = self._geometria
         # CASO TRANSÓNICO
         ev = condicion_transonico(mach)  # Evaluación de régimen transónico
         if ev:
-            self.cdtotal = self.cd_transonico(mach, alt)
-            return self.cdtotal
+            return self.cd_transonico(mach, alt)
         
         # CÁLCULO DEL COEFICIENTE DE RESISTENCIA BASE.
         cd_base_misil = self.cb_misil(mach)
         
+        # ESTADO DEL FLUJO, COMÚN A LOS COEFICIENTES DE FRICCIÓN Y DE ONDA.
+        flujo = estado_flujo(mach, alt)
+
         # CÁLCULO DEL COEFICIENTE DE FRICCIÓN
-        CD_F = [self.cf_cono(mach, alt), self.cf_cil(mach, alt)]
+        CD_F = [self.cf_cono(mach, alt, flujo), self.cf_cil(mach, alt, flujo)]
         if self._aletas:
-            CD_F.append(self.cf_aletas(mach, alt))
+            CD_F.append(self.cf_aletas(mach, alt, flujo))
         if self._ala:
-            CD_F.append(self.cf_ala(mach, alt))
+            CD_F.append(self.cf_ala(mach, alt, flujo))
         
         cd_friccion = sum(CD_F)
         
         # CÁLCULO DEL COEFICIENTES DE ONDA.
-        CD_W = [self.cw_misil(mach, alt, tipo=TIPO_NARIZ)]
+        CD_W = [self.cw_misil(mach, alt, tipo=geo.tipo_nariz)]
         if self._aletas:
-            CD_W.append(self.cw_aletas(mach, alt))
+            CD_W.append(self.cw_aletas(mach, alt, flujo))
         if self._ala:
-            CD_W.append(self.cw_ala(mach, alt))
+            CD_W.append(self.cw_ala(mach, alt, flujo))
 
         cd_onda = sum(CD_W)
         
@@ -682,12 +825,10 @@ class CoeficienteFuerza(object):
             cndel = self.cndelta_aletas(mach)
         cdi = cnal*self._angulo_ataque**2 + cndel*self._deflexion_mando**2
         
-        self.cdtotal = cd0 + cdi
-        
         if self._etapa > 2:
-            self.cdtotal = 2.52 # Cd del satélite (atmósfera a muy baja densidad)
+            return 2.52 # Cd del satélite (atmósfera a muy baja densidad)
         
-        return self.cdtotal
+        return cd0 + cdi
     
     
     def cd_transonico(self, mach, alt):
@@ -698,20 +839,54 @@ class CoeficienteFuerza(object):
         de fin de régimen, a continuación se dan 2 valores (tomados por prueba
         y error) para realizar una aproximación polinómica de grado 3.
         Estos 2 puntos y valores se han tomado mediante prueba y error.
+
+        Los coeficientes dependen linealmente de cd_1 y cd_2, por lo que la
+        aproximación se divide en la de la resistencia parásita (alfa =
+        delta = 0) y la de la inducida. La primera se calcula en las
+        altitudes múltiplo de PASO_ALT_TRANSONICO, se guarda en
+        PUENTES_TRANSONICOS y sus coeficientes se interpolan linealmente en
+        altitud. La inducida no depende de la altitud y se obtiene en cada
+        llamada a partir de sus valores en los extremos del régimen, como en
+        tabla_aerodinamica.py.
         '''
-        mach_1 = (0.3 + 0.7*inicio_transonico)
-        mach_2 = (0.5 + 0.5*fin_transonico)
-        mach_list = [inicio_transonico, mach_1, mach_2, fin_transonico]
-        cd_1 = self.cd_total(inicio_transonico, alt)
-        cd_2 = self.cd_total(fin_transonico, alt)
-        cd_list = [cd_1, (cd_1 + 0.04), (cd_2 - 0.05), cd_2]
-        coef = aprox_pol(mach_list, cd_list, 3)
-        
-        res = 0
-        for i, ci in enumerate(coef):
-            res = res + ci*mach**i
-        
-        return res
+        parasita = self.configuracion()._replace(delta=0, alpha=0)
+
+        def puente(alt_puente):
+            def calcular():
+                mach_1 = (0.3 + 0.7*inicio_transonico)
+                mach_2 = (0.5 + 0.5*fin_transonico)
+                mach_list = [inicio_transonico, mach_1, mach_2,
+                             fin_transonico]
+                coeficientes = CoeficienteFuerza(*parasita)
+                cd_1 = coeficientes.cd_total(inicio_transonico, alt_puente)
+                cd_2 = coeficientes.cd_total(fin_transonico, alt_puente)
+                cd_list = [cd_1, (cd_1 + 0.04), (cd_2 - 0.05), cd_2]
+                return tuple(aprox_pol(mach_list, cd_list, 3))
+
+            return PUENTES_TRANSONICOS.obtener(
+                ('cd',) + parasita + (alt_puente,), calcular)
+
+        indice, peso = divmod(alt/PASO_ALT_TRANSONICO, 1)
+        coef_0 = puente(PASO_ALT_TRANSONICO*indice)
+        if peso == 0:
+            cd0 = evaluar_puente(coef_0, mach)
+        else:
+            coef_1 = puente(PASO_ALT_TRANSONICO*(indice + 1))
+            cd0 = evaluar_puente([c_0 + peso*(c_1 - c_0)
+                                  for c_0, c_1 in zip(coef_0, coef_1)], mach)
+
+        if self._etapa > 2 or (self._angulo_ataque == 0
+                               and self._deflexion_mando == 0):
+            return cd0
+        cdi = []
+        for mach_extremo in (inicio_transonico, fin_transonico):
+            cndel = 0
+            if self._aletas:
+                cndel = self.cndelta_aletas(mach_extremo)
+            cdi.append(self.cnalpha(mach_extremo)*self._angulo_ataque**2
+                       + cndel*self._deflexion_mando**2)
+        return (cd0 + cdi[0]*evaluar_puente(PUENTE_INICIO_CD, mach)
+                + cdi[1]*evaluar_puente(PUENTE_FIN_CD, mach))
 
 
     # MÉTODOS QUE CALCULAN LOS COEFICIENTES NORMALES DE ALPHA Y DELTA
@@ -733,26 +908,31 @@ class CoeficienteFuerza(object):
             - lon : float
                     longitud del cilindro que depende de cada etapa (m)
         '''
-        longitud_cil = LONGITUD_MISIL[self._etapa - 1] - LONGITUD_MISIL[-1]
-        return 1.1*self._angulo_ataque*2*longitud_cil/(pi*DIAMETRO_M/2)
+        geo = self._geometria
+        longitud_cil = (geo.longitud_misil[self._etapa - 1]
+                        - geo.longitud_misil[-1])
+        return 1.1*self._angulo_ataque*2*longitud_cil/(pi*geo.diametro/2)
     
     
     def cnalpha_ala(self, mach):
         '''
         Coeficiente normal de alfa del ala en función del mach.
         '''
-        cni_ala = 4/f_comp(mach)*(1-1/(2*A_ALA*f_comp(mach)))
-        return (cni_ala*(Kwb+Kbw)*SW_ALA/SREF_MISIL)
+        geo = self._geometria
+        cni_ala = 4/f_comp(mach)*(1-1/(2*geo.a_ala*f_comp(mach)))
+        return (cni_ala*(geo.kwb+geo.kbw)*geo.sw_ala/geo.sref)
     
     
     def cnalpha_aletas(self, mach):
         '''
         Coeficiente normal de alfa de las aletas dependiente del mach.
         '''
+        geo = self._geometria
         F_deflexion = 0.6  # Factor de deflexión de la estela.
         
-        cni_aletas = 4/f_comp(mach)*(1-1/(2*A_ALETAS*f_comp(mach)))
-        return (cni_aletas*(kbm+kmb)*F_deflexion*(2*SW_ALETA)/SREF_MISIL)
+        cni_aletas = 4/f_comp(mach)*(1-1/(2*geo.a_aletas*f_comp(mach)))
+        return (cni_aletas*(geo.kbm+geo.kmb)*F_deflexion*(2*geo.sw_aleta)/
+                geo.sref)
     
     
     def cnalpha(self, mach):
@@ -776,9 +956,10 @@ class CoeficienteFuerza(object):
         Se diferencia de cnalpha_aletas() en que no se tiene en cuenta el
         factor de deflexión.
         '''
+        geo = self._geometria
         if self._aletas:
-            cni_mando = 4/f_comp(mach)*(1-1/(2*A_ALETAS*f_comp(mach)))
-            cndelta = cni_mando*(Kwb+Kbw)*2*SW_ALETA/SREF_MISIL
+            cni_mando = 4/f_comp(mach)*(1-1/(2*geo.a_aletas*f_comp(mach)))
+            cndelta = cni_mando*(geo.kwb+geo.kbw)*2*geo.sw_aleta/geo.sref
             return cndelta
         else:
             return 0
@@ -787,18 +968,15 @@ class CoeficienteFuerza(object):
     def cn_total(self, mach):
         '''
         Cálculo del coeficiente normal total en función del mach.
-        Además crea el atributo cntotal.
         '''
         # CASO TRANSÓNICO
         ev = condicion_transonico(mach)
         if ev:
-            self.cntotal = self.cn_transonico(mach)
-            return self.cntotal
+            return self.cn_transonico(mach)
         
         # CASO NO TRANSÓNICO
-        self.cntotal = (self.cnalpha(mach)*self._angulo_ataque +
-                        self.cndelta_aletas(mach)*self._deflexion_mando)
-        return self.cntotal
+        return (self.cnalpha(mach)*self._angulo_ataque +
+                self.cndelta_aletas(mach)*self._deflexion_mando)
     
     
     def cn_transonico(self, mach):
@@ -809,17 +987,16 @@ class CoeficienteFuerza(object):
         para realizar una aproximación polinómica de grado 2. 
         Este valor se ha tomado por prueba y error.
         '''
-        mach_list = [inicio_transonico, 1, fin_transonico]
-        cn_1 = self.cn_total(inicio_transonico)
-        cn_2 = self.cn_total(fin_transonico)
-        cn_list = [cn_1, cn_1*0.95, cn_2]
-        coef = aprox_pol(mach_list, cn_list, 2)
-        
-        res = 0
-        for i, ci in enumerate(coef):
-            res = res + ci*mach**i
-        
-        return res
+        def calcular():
+            mach_list = [inicio_transonico, 1, fin_transonico]
+            cn_1 = self.cn_total(inicio_transonico)
+            cn_2 = self.cn_total(fin_transonico)
+            cn_list = [cn_1, cn_1*0.95, cn_2]
+            return tuple(aprox_pol(mach_list, cn_list, 2))
+
+        coef = PUENTES_TRANSONICOS.obtener(('cn',) + self.configuracion(),
+                                           calcular)
+        return evaluar_puente(coef, mach)
 
 
     # MÉTODO QUE CALCULA EL COEFICIENTE DE MOMENTO DE ALFA Y DELTA.
@@ -831,19 +1008,20 @@ class CoeficienteFuerza(object):
         posición del centro del gravedad, para lo cual se usará la función 
         posicion_cg() que depende del instante de tiempo.
         '''
-        lon_lanz = LONGITUD_MISIL[self._etapa - 1]
-        d_cono = x_cdg - xcp_cono
-        d_cil = x_cdg - xcp_cil[self._etapa - 1]
+        geo = self._geometria
+        lon_lanz = geo.longitud_misil[self._etapa - 1]
+        d_cono = x_cdg - geo.xcp_cono
+        d_cil = x_cdg - geo.xcp_cil[self._etapa - 1]
         cm_alpha_cono = self.cnalpha_cono()*d_cono
         cm_alpha_cil = self.cnalpha_cil()*d_cil
         cm_alpha_total = cm_alpha_cono + cm_alpha_cil
         
         if self._aletas:
-            d_aletas = x_cdg - xcp_aletas
+            d_aletas = x_cdg - geo.xcp_aletas
             cm_alpha_total = (cm_alpha_total + 
                               self.cnalpha_aletas(mach)*d_aletas)
         if self._ala:
-            d_ala = x_cdg - xcp_ala
+            d_ala = x_cdg - geo.xcp_ala
             cm_alpha_total = cm_alpha_total + self.cnalpha_ala(mach)*d_ala
         
         return cm_alpha_total/lon_lanz
@@ -855,9 +1033,10 @@ class CoeficienteFuerza(object):
         posición del centro de gravedad para cierto instante.
         Devuelve 0 para el caso en el que no haya aletas.
         '''
+        geo = self._geometria
         if self._aletas:
-            lon_lanz = LONGITUD_MISIL[self._etapa - 1]
-            d_aletas = x_cdg - xcp_aletas
+            lon_lanz = geo.longitud_misil[self._etapa - 1]
+            d_aletas = x_cdg - geo.xcp_aletas
             return self.cndelta_aletas(mach)*d_aletas/lon_lanz
         else:    
             return 0
@@ -867,18 +1046,15 @@ class CoeficienteFuerza(object):
         '''
         Calcula el coeficiente de momentos total en función de los coef. de
         alfa y delta, así como del ángulo de ataque y de deflexión.
-        Además crea el atributo cmtotal.
         '''
         # CASO TRANSÓNICO
         ev = condicion_transonico(mach)
         if ev:
-            self.cmtotal = self.cm_transonico(mach, x_cdg)
-            return self.cmtotal
+            return self.cm_transonico(mach, x_cdg)
         
         # CASO NO TRANSÓNICO
-        self.cmtotal = (self.cmalpha(mach, x_cdg)*self._angulo_ataque +
-                         self.cmdelta(mach, x_cdg)*self._deflexion_mando)
-        return self.cmtotal
+        return (self.cmalpha(mach, x_cdg)*self._angulo_ataque +
+                self.cmdelta(mach, x_cdg)*self._deflexion_mando)
     
     
     def cm_transonico(self, mach, x_cdg):
@@ -889,15 +1065,433 @@ class CoeficienteFuerza(object):
         del valor que éste toma para M = inicio_transonico para realizar una
         aproximación polinómica de grado 2.
         Este valor se ha tomado por prueba y error.
+
+        cm depende linealmente de la posición del centro de gravedad, por lo
+        que las aproximaciones se guardan en x_cdg = 0 y x_cdg = 1 y se
+        interpolan.
         '''
-        mach_list = [inicio_transonico, 1, fin_transonico]
-        cm_1 = self.cm_total(inicio_transonico, x_cdg)
-        cm_2 = self.cm_total(fin_transonico, x_cdg)
-        cm_list = [cm_1, cm_1*0.95, cm_2]
-        coef = aprox_pol(mach_list, cm_list, 2)
-        
-        res = 0
-        for i, ci in enumerate(coef):
-            res = res + ci*mach**i
-        
-        return res
+        def puente(x_puente):
+            def calcular():
+                mach_list = [inicio_transonico, 1, fin_transonico]
+                cm_1 = self.cm_total(inicio_transonico, x_puente)
+                cm_2 = self.cm_total(fin_transonico, x_puente)
+                cm_list = [cm_1, cm_1*0.95, cm_2]
+                return tuple(aprox_pol(mach_list, cm_list, 2))
+
+            return PUENTES_TRANSONICOS.obtener(
+                ('cm',) + self.configuracion() + (x_puente,), calcular)
+
+        cm_0 = evaluar_puente(puente(0.), mach)
+        return cm_0 + x_cdg*(evaluar_puente(puente(1.), mach) - cm_0)
+
+
+    # VERSIONES VECTORIZADAS DE LOS COEFICIENTES TOTALES
+    # --------------------------------------------------
+
+    def cd_total_vectorizado(self, mach, alt, alpha=None):
+        '''
+        Versión vectorizada de cd_total() con la configuración del objeto.
+        <mach>, <alt> y, opcionalmente, <alpha> (rad) pueden ser arrays; si
+        alpha es None se usa el ángulo de ataque del objeto.
+        '''
+        config = list(self.configuracion())
+        if alpha is not None:
+            config[2] = alpha
+        return cd_vectorizado(mach, alt, *config)
+
+
+    def cn_total_vectorizado(self, mach, alpha=None):
+        '''
+        Versión vectorizada de cn_total() con la configuración del objeto.
+        '''
+        config = list(self.configuracion())
+        if alpha is not None:
+            config[2] = alpha
+        return cn_vectorizado(mach, *config)
+
+
+    def cm_total_vectorizado(self, mach, x_cdg, alpha=None):
+        '''
+        Versión vectorizada de cm_total() con la configuración del objeto.
+        '''
+        config = list(self.configuracion())
+        if alpha is not None:
+            config[2] = alpha
+        return cm_vectorizado(mach, x_cdg, *config)
+
+
+# EVALUACIÓN SIN ESTADO
+# ---------------------
+# Cada llamada evalúa el modelo sobre un objeto CoeficienteFuerza propio que
+# no sale de la función y que ningún cálculo modifica (crearlo cuesta menos
+# de 1 us, frente a unos 30 us de los coeficientes). El único estado común
+# es la caché PUENTES_TRANSONICOS. TablaAerodinamica (tabla_aerodinamica.py)
+# ofrece los mismos cálculos con la firma cd(configuracion, mach, alt).
+
+def cd_configuracion(configuracion, mach, alt):
+    '''
+    Coeficiente de resistencia total (ver CoeficienteFuerza.cd_total()) de
+    la configuración <configuracion> (ConfiguracionVuelo) en el Mach <mach>
+    y la altitud <alt> (m).
+    '''
+    return CoeficienteFuerza(*configuracion).cd_total(mach, alt)
+
+
+def cn_configuracion(configuracion, mach):
+    '''
+    Coeficiente normal total (ver CoeficienteFuerza.cn_total()) de la
+    configuración <configuracion> en el Mach <mach>.
+    '''
+    return CoeficienteFuerza(*configuracion).cn_total(mach)
+
+
+def cm_configuracion(configuracion, mach, x_cdg):
+    '''
+    Coeficiente de momentos total (ver CoeficienteFuerza.cm_total()) de la
+    configuración <configuracion> en el Mach <mach> con el centro de
+    gravedad en <x_cdg>.
+    '''
+    return CoeficienteFuerza(*configuracion).cm_total(mach, x_cdg)
+
+
+def coeficientes_configuracion(configuracion, mach, alt):
+    '''
+    Coeficientes de resistencia y normal de la configuración
+    <configuracion> en el Mach <mach> y la altitud <alt> (m), con un único
+    objeto CoeficienteFuerza. Devuelve la tupla (cd, cn).
+    '''
+    coeficientes = CoeficienteFuerza(*configuracion)
+    return coeficientes.cd_total(mach, alt), coeficientes.cn_total(mach)
+
+
+# VERSIONES VECTORIZADAS
+# ----------------------
+# Cada función reproduce el método de CoeficienteFuerza del mismo nombre
+# para arrays de Mach (y de altitud). Los regímenes se seleccionan con
+# máscaras: se evalúan todas las ramas en todos los puntos y se elige la que
+# corresponde a cada uno, por lo que se ignoran los avisos de NumPy de las
+# ramas descartadas (por ejemplo, f_comp = 0 en Mach 1).
+
+# Las aproximaciones transónicas son lineales en los valores que se
+# aproximan, por lo que sus coeficientes se obtienen multiplicando por
+# estas matrices el array de valores (uno por columna).
+MATRIZ_PUENTE_CD = aprox_pol([inicio_transonico, 0.3 + 0.7*inicio_transonico,
+                              0.5 + 0.5*fin_transonico, fin_transonico],
+                             np.eye(4), 3)
+MATRIZ_PUENTE_CN = aprox_pol([inicio_transonico, 1, fin_transonico],
+                             np.eye(3), 2)
+# Aproximaciones de cd con valor unidad en uno de los extremos del régimen
+# transónico y nulo en el otro, sin los incrementos de los puntos
+# intermedios: con ellas CoeficienteFuerza.cd_transonico() añade la
+# resistencia inducida.
+PUENTE_INICIO_CD = tuple((MATRIZ_PUENTE_CD @ [1, 1, 0, 0]).tolist())
+PUENTE_FIN_CD = tuple((MATRIZ_PUENTE_CD @ [0, 0, 1, 1]).tolist())
+
+
+def extremos_transonico(funcion, geometria, *config):
+    '''
+    Evalúa funcion(geometria, mach, *config) (cd_no_transonico(),
+    cn_no_transonico() o cm_no_transonico() sin el Mach) en los extremos del
+    régimen transónico con una única llamada. Devuelve los dos arrays de
+    valores.
+    '''
+    num = len(config[0])
+    valores = funcion(geometria,
+                      np.repeat([inicio_transonico, fin_transonico], num),
+                      *[np.tile(valor, 2) for valor in config])
+    return valores[:num], valores[num:]
+
+
+def nodos_factor_Q(flecha):
+    '''
+    Nodos (Mach, valor) de las rectas de factor_Q() para el ángulo de
+    flecha <flecha> (rad). El último nodo, en Mach 1, prolonga la última
+    recta como hace factor_Q() entre Mach 0.9 y 1.
+    '''
+    mach_int = [0.25, 0.6, 0.8, 0.9]
+    y = [factor_Q(mach, flecha) for mach in mach_int]
+    return mach_int + [1.], y + [y[3] + (y[3] - y[2])]
+
+
+def f_comp_vectorizado(mach):
+    '''
+    Versión vectorizada de f_comp().
+    '''
+    return np.sqrt(np.abs(1 - mach**2))
+
+
+# Coeficientes (de mayor a menor grado) de la resistencia de base en cada
+# régimen de cb_misil(): M < 0.8, 0.8 <= M < 1, 1 <= M < 1.095,
+# 1.095 <= M <= 1.5 y M > 1.5.
+COEF_BASE = array([[0, 0, 0, 0.14026],
+                   [3.2751, -8.1789, 6.8665, -1.7954],
+                   [-150.3, 466.52, -481.64, 165.59],
+                   [0, 0.2226, -0.7103, 0.7391],
+                   [0, 0.0076, -0.0854, 0.2846]])
+
+
+def cb_vectorizado(geometria, mach, etapa, propulsion):
+    '''
+    Versión vectorizada de CoeficienteFuerza.cb_misil() para la geometría
+    <geometria>.
+    '''
+    regimen = np.searchsorted([0.8, 1, 1.095], mach, side='right')
+    coef = COEF_BASE[np.where(mach > 1.5, 4, regimen)]
+    cdb_prima = ((coef[..., 0]*mach + coef[..., 1])*mach
+                 + coef[..., 2])*mach + coef[..., 3]
+    sgases = np.where(propulsion, np.asarray(geometria.sgases)[etapa - 1], 0)
+    return cdb_prima*(geometria.sbase - sgases)/geometria.sref
+
+
+def cf_cuerpo_vectorizado(mach, reynolds, limite_laminar, factor_forma):
+    '''
+    Coeficiente de fricción medio de un cuerpo (cono o cilindro) a partir de
+    su número de Reynolds <reynolds>, como en CoeficienteFuerza.cf_cono() y
+    CoeficienteFuerza.cf_cil(). El flujo es laminar para Reynolds menores
+    que <limite_laminar>.
+    '''
+    laminar = (.664 * reynolds**(-1 / 2) * factor_forma
+               / (1 + .17 * mach**2)**.1295)
+    turbulento = (.288 / np.log10(reynolds)**2.45 * factor_forma
+                  / (1 + (GAMMA - 1) / 2 * mach**2)**.467)
+    return np.where(reynolds < limite_laminar, laminar, turbulento)
+
+
+def cf_superficie_vectorizado(mach, reynolds):
+    '''
+    Coeficiente de fricción medio de una superficie sustentadora (aletas o
+    ala) a partir de su número de Reynolds <reynolds>, como en
+    CoeficienteFuerza.cf_aletas() y CoeficienteFuerza.cf_ala().
+    '''
+    laminar = (2 * (.664 / reynolds**.5)
+               * (0.0001*mach**3 - 0.0031*mach**2 - 0.0011*mach + 1.0021))
+    turbulento = (1.25 * (.288 * np.log10(reynolds)**(-2.45))
+                  * (-0.0002*mach**4 + 0.005*mach**3 - 0.0387*mach**2
+                     + 0.0203*mach + 0.9933))
+    return np.where(reynolds < 1e5, laminar, turbulento)
+
+
+def cw_misil_vectorizado(geometria, mach):
+    '''
+    Versión vectorizada de CoeficienteFuerza.cw_misil() con el tipo de
+    nariz de la geometría <geometria>.
+    '''
+    tipo = geometria.tipo_nariz
+    if tipo not in (0, 1):
+        raise NoseError(tipo)
+    cd_onda = (.083 + .096/mach**2)*(geometria.angulo_nariz[tipo]/10)**1.69
+    if tipo == 1:
+        ratio = geometria.longitud_cono / geometria.diametro
+        cd_onda = cd_onda*(1 - (392*ratio**2 - 32)/
+                           (28*(mach + 18)*ratio**2))
+    return np.where(mach >= 1, cd_onda, 0)
+
+
+def cnalpha_vectorizado(geometria, mach, etapa, alpha, aletas, ala):
+    '''
+    Versión vectorizada de CoeficienteFuerza.cnalpha(). Devuelve también
+    los coeficientes normales de alfa del cilindro, del ala y de las aletas
+    (estos dos nulos si no existen), que utiliza cm_vectorizado().
+    '''
+    geo = geometria
+    longitud_cil = (np.asarray(geo.longitud_misil)[etapa - 1]
+                    - geo.longitud_misil[-1])
+    cn_cil = 1.1*alpha*2*longitud_cil/(pi*geo.diametro/2)
+    compresibilidad = f_comp_vectorizado(mach)
+    cn_ala = np.where(ala, (4/compresibilidad
+                            *(1 - 1/(2*geo.a_ala*compresibilidad))
+                            *(geo.kwb + geo.kbw)*geo.sw_ala/geo.sref), 0)
+    cn_aletas = np.where(aletas, (4/compresibilidad
+                                  *(1 - 1/(2*geo.a_aletas*compresibilidad))
+                                  *(geo.kbm + geo.kmb)*0.6*(2*geo.sw_aleta)
+                                  /geo.sref), 0)
+    return 2 + cn_cil + cn_ala + cn_aletas, cn_cil, cn_ala, cn_aletas
+
+
+def cndelta_vectorizado(geometria, mach, aletas):
+    '''
+    Versión vectorizada de CoeficienteFuerza.cndelta_aletas().
+    '''
+    geo = geometria
+    compresibilidad = f_comp_vectorizado(mach)
+    return np.where(aletas, (4/compresibilidad
+                             *(1 - 1/(2*geo.a_aletas*compresibilidad))
+                             *(geo.kwb + geo.kbw)*2*geo.sw_aleta/geo.sref), 0)
+
+
+def configuracion_vectorizada(*valores):
+    '''
+    Convierte a arrays de la misma forma los argumentos de las funciones
+    vectorizadas: Mach y altitud o posición del centro de gravedad, etapa,
+    deflexión, ángulo de ataque, propulsión, aletas y ala.
+    '''
+    mach, variable, etapa, delta, alpha, propulsion, aletas, ala = valores
+    return np.broadcast_arrays(np.asarray(mach, dtype=float),
+                               np.asarray(variable, dtype=float),
+                               np.asarray(etapa, dtype=int),
+                               np.asarray(delta, dtype=float),
+                               np.asarray(alpha, dtype=float),
+                               np.asarray(propulsion, dtype=bool),
+                               np.asarray(aletas, dtype=bool),
+                               np.asarray(ala, dtype=bool))
+
+
+def cd_no_transonico(geometria, mach, alt, etapa, delta, alpha, propulsion,
+                     aletas, ala):
+    '''
+    Coeficiente de resistencia total sin la corrección transónica de la
+    geometría <geometria>, con arrays de la misma forma (ver
+    configuracion_vectorizada()).
+    '''
+    geo = geometria
+    re_unitario = estado_flujo(mach, alt).reynolds_unitario
+
+    # Resistencia de base, de fricción y de onda
+    cd_base_misil = cb_vectorizado(geo, mach, etapa, propulsion)
+    cf_cono = (cf_cuerpo_vectorizado(mach, re_unitario*geo.longitud_cono,
+                                     1e10, FF_CONO) * geo.sup_cono / geo.sref)
+    cf_cil = (cf_cuerpo_vectorizado(
+        mach, re_unitario*(np.asarray(geo.longitud_misil)[etapa - 1]
+                           - geo.longitud_cono), 1e5,
+        FF_CILINDRO) * np.asarray(geo.sup_cil)[etapa - 1] / geo.sref)
+    cf_aletas = (cf_superficie_vectorizado(mach, re_unitario*geo.craiz_aleta)
+                 * geo.swtotal_aletas / geo.sref)
+    cf_ala = (cf_superficie_vectorizado(mach, re_unitario*geo.craiz_ala)
+              * geo.sw_ala / geo.sref)
+    cd_friccion = (cf_cono + cf_cil + np.where(aletas, cf_aletas, 0)
+                   + np.where(ala, cf_ala, 0))
+
+    subsonico = mach < 1
+    cw_aletas = np.where(
+        subsonico,
+        ((2*geo.espesor_medio_aleta + 100*geo.espesor_medio_aleta**4)
+         *((2*cf_aletas)*np.interp(mach,
+                                   *nodos_factor_Q(geo.flecha_aleta)))
+         *geo.swtotal_aletas/geo.sref),
+        4*geo.factor_aleta*atan(geo.espesor_medio_aleta)**2
+        /np.sqrt(mach**2 - 1))
+    cw_ala = np.where(
+        subsonico,
+        (2*(geo.espesor_medio_ala + 100*geo.espesor_medio_ala**4)
+         *(2/geo.sref*cf_ala)*geo.envergadura_ala*geo.craiz_ala/2
+         *np.interp(mach, *nodos_factor_Q(geo.flecha_ala))),
+        geo.factor_ala*4*atan(geo.espesor_medio_ala)**2/np.sqrt(mach**2 - 1)
+        ) * geo.sw_ala/geo.sref
+    cd_onda = (cw_misil_vectorizado(geo, mach)
+               + np.where(aletas, cw_aletas, 0) + np.where(ala, cw_ala, 0))
+
+    # Resistencia inducida
+    cnal = cnalpha_vectorizado(geo, mach, etapa, alpha, aletas, ala)[0]
+    cdi = cnal*alpha**2 + cndelta_vectorizado(geo, mach, aletas)*delta**2
+
+    cd = cd_base_misil + cd_friccion + cd_onda + cdi
+    return np.where(etapa > 2, 2.52, cd)  # Cd del satélite
+
+
+def cn_no_transonico(geometria, mach, etapa, delta, alpha, aletas, ala):
+    '''
+    Coeficiente normal total sin la corrección transónica.
+    '''
+    return (cnalpha_vectorizado(geometria, mach, etapa, alpha, aletas,
+                                ala)[0]*alpha
+            + cndelta_vectorizado(geometria, mach, aletas)*delta)
+
+
+def cm_no_transonico(geometria, mach, x_cdg, etapa, delta, alpha, aletas,
+                     ala):
+    '''
+    Coeficiente de momentos total sin la corrección transónica.
+    '''
+    geo = geometria
+    lon_lanz = np.asarray(geo.longitud_misil)[etapa - 1]
+    _, cn_cil, cn_ala, cn_aletas = cnalpha_vectorizado(geo, mach, etapa,
+                                                       alpha, aletas, ala)
+    cm_alpha = (2*(x_cdg - geo.xcp_cono)
+                + cn_cil*(x_cdg - np.asarray(geo.xcp_cil)[etapa - 1])
+                + cn_aletas*(x_cdg - geo.xcp_aletas)
+                + cn_ala*(x_cdg - geo.xcp_ala))
+    cm_delta = cndelta_vectorizado(geo, mach, aletas)*(x_cdg - geo.xcp_aletas)
+    return cm_alpha/lon_lanz*alpha + cm_delta/lon_lanz*delta
+
+
+def cd_vectorizado(mach, alt, etapa=1, delta=0, alpha=0, propulsion=False,
+                   aletas=False, ala=False, geometria=GEOMETRIA_NOMINAL):
+    '''
+    Versión vectorizada de CoeficienteFuerza.cd_total(). Todos los
+    argumentos salvo la geometría pueden ser arrays (de formas
+    compatibles), de modo que cada punto puede tener su propia
+    configuración. Los argumentos de configuración siguen el orden de
+    CoeficienteFuerza.configuracion().
+
+    En el régimen transónico se emplean las mismas aproximaciones que en
+    CoeficienteFuerza.cd_transonico(), interpoladas linealmente entre las
+    altitudes múltiplo de PASO_ALT_TRANSONICO, pero no se guardan en
+    PUENTES_TRANSONICOS.
+    '''
+    valores = configuracion_vectorizada(mach, alt, etapa, delta, alpha,
+                                        propulsion, aletas, ala)
+    mach, alt = valores[:2]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cd = cd_no_transonico(geometria, *valores)
+        transonico = (inicio_transonico < mach) & (mach < fin_transonico)
+        if transonico.any():
+            config = [valor[transonico] for valor in valores[2:]]
+            indice, peso = divmod(alt[transonico]/PASO_ALT_TRANSONICO, 1)
+            # Como en cd_transonico(), la segunda aproximación solo se
+            # evalúa si la altitud no es múltiplo del paso.
+            alt_puente = PASO_ALT_TRANSONICO*np.concatenate(
+                (indice, np.where(peso > 0, indice + 1, indice)))
+            cd_1, cd_2 = extremos_transonico(
+                cd_no_transonico, geometria, alt_puente,
+                *[np.tile(valor, 2) for valor in config])
+            num = len(peso)
+            cd_1 = cd_1[:num] + peso*(cd_1[num:] - cd_1[:num])
+            cd_2 = cd_2[:num] + peso*(cd_2[num:] - cd_2[:num])
+            coef = MATRIZ_PUENTE_CD @ [cd_1, cd_1 + 0.04, cd_2 - 0.05, cd_2]
+            cd[transonico] = evaluar_puente(coef, mach[transonico])
+    return cd
+
+
+def cn_vectorizado(mach, etapa=1, delta=0, alpha=0, propulsion=False,
+                   aletas=False, ala=False, geometria=GEOMETRIA_NOMINAL):
+    '''
+    Versión vectorizada de CoeficienteFuerza.cn_total(). La propulsión no
+    interviene; se admite para conservar el orden de
+    CoeficienteFuerza.configuracion().
+    '''
+    mach, _, etapa, delta, alpha, _, aletas, ala = configuracion_vectorizada(
+        mach, 0, etapa, delta, alpha, propulsion, aletas, ala)
+    config = (etapa, delta, alpha, aletas, ala)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cn = cn_no_transonico(geometria, mach, *config)
+        transonico = (inicio_transonico < mach) & (mach < fin_transonico)
+        if transonico.any():
+            cn_1, cn_2 = extremos_transonico(
+                cn_no_transonico, geometria,
+                *[valor[transonico] for valor in config])
+            coef = MATRIZ_PUENTE_CN @ [cn_1, cn_1*0.95, cn_2]
+            cn[transonico] = evaluar_puente(coef, mach[transonico])
+    return cn
+
+
+def cm_vectorizado(mach, x_cdg, etapa=1, delta=0, alpha=0, propulsion=False,
+                   aletas=False, ala=False, geometria=GEOMETRIA_NOMINAL):
+    '''
+    Versión vectorizada de CoeficienteFuerza.cm_total(). La propulsión no
+    interviene; se admite para conservar el orden de
+    CoeficienteFuerza.configuracion().
+    '''
+    mach, x_cdg, etapa, delta, alpha, _, aletas, ala = (
+        configuracion_vectorizada(mach, x_cdg, etapa, delta, alpha,
+                                  propulsion, aletas, ala))
+    config = (x_cdg, etapa, delta, alpha, aletas, ala)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cm = cm_no_transonico(geometria, mach, *config)
+        transonico = (inicio_transonico < mach) & (mach < fin_transonico)
+        if transonico.any():
+            cm_1, cm_2 = extremos_transonico(
+                cm_no_transonico, geometria,
+                *[valor[transonico] for valor in config])
+            coef = MATRIZ_PUENTE_CN @ [cm_1, cm_1*0.95, cm_2]
+            cm[transonico] = evaluar_puente(coef, mach[transonico])
+    return cm
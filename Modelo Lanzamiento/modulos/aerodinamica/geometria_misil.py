@@ -3,8 +3,17 @@
 Created on Wed Sep 26 09:45:53 2018
 
 @author: Team REOS
+
+Parámetros geométricos del lanzador nominal y registro GeometriaLanzador,
+que contiene esos parámetros y las magnitudes que se derivan de ellos
+(superficies, alargamientos, factores de interferencia, centros de presión
+y posiciones de las etapas). Cada geometría es un objeto inmutable, de modo
+que pueden evaluarse varios lanzadores distintos en el mismo proceso.
 """
 
+from collections import namedtuple
+from math import pi, atan, degrees, sqrt
+
 # GEOMETRÍA DEL LANZADOR
 # ----------------------
 
@@ -32,4 +41,186 @@ ESPESOR_ALA= 0.035 # Espesor del ala (m)
 FACTOR_ALA= 1 # Depende del tipo de perfil del ala (apuntes misiles UPM)
 CRAIZ_ALA= 1.4 # Cuerda en la raiz del ala del lanzador (m)
 ENVERGADURA_ALA= 2.2 # Envergadura del ala del lanzador (m)
-X_ALA= 4 # Posición del borde de salida del ala desde la proa del lanzador
\ No newline at end of file
+X_ALA= 4 # Posición del borde de salida del ala desde la proa del lanzador
+
+
+# MAGNITUDES DERIVADAS DE LA GEOMETRÍA
+# ------------------------------------
+
+PARAMETROS_GEOMETRIA = ['diametro', 'diametro_salida', 'longitud_cono',
+                        'longitud_misil', 'tipo_nariz', 'espesor_aleta',
+                        'cmedia_aleta', 'craiz_aleta', 'num_aletas',
+                        'envergadura_aletas', 'factor_aleta', 'espesor_ala',
+                        'factor_ala', 'craiz_ala', 'envergadura_ala', 'x_ala']
+DERIVADAS_GEOMETRIA = ['angulo_nariz', 'sup_cono', 'sref', 'sbase',
+                       'sup_cil', 'sgases', 'sw_aleta', 'swtotal_aletas',
+                       'sw_ala', 'flecha_aleta', 'flecha_ala',
+                       'espesor_medio_aleta', 'espesor_medio_ala',
+                       'a_aletas', 'a_ala', 'kwb', 'kbw', 'kbm', 'kmb',
+                       'xcp_cono', 'xcp_cil', 'xcp_aletas', 'xcp_ala',
+                       'x_etapas', 'huella']
+
+
+class GeometriaLanzador(namedtuple('GeometriaLanzador',
+                                   PARAMETROS_GEOMETRIA
+                                   + DERIVADAS_GEOMETRIA)):
+    '''
+    Geometría de un lanzador. Se construye a partir de los parámetros de
+    PARAMETROS_GEOMETRIA (por defecto, los del lanzador nominal definidos
+    en este módulo) y calcula una sola vez las magnitudes derivadas de
+    DERIVADAS_GEOMETRIA. Las listas se guardan como tuplas, por lo que el
+    registro puede usarse como clave de diccionario.
+
+    Para variar algún parámetro se crea una geometría nueva con
+    _replace(), que vuelve a calcular las magnitudes derivadas:
+        GEOMETRIA_NOMINAL._replace(diametro=.7)
+
+    Parámetros
+    ----------
+    diametro, diametro_salida : float, list
+        Diámetro del misil y de la salida de gases de cada etapa (m).
+
+    longitud_cono, longitud_misil : float, list
+        Longitud del cono y del misil en cada etapa, con la del cono como
+        último elemento (m).
+
+    tipo_nariz : int
+        0-Cono, 1-Ojiva Circular Tangente.
+
+    espesor_aleta, cmedia_aleta, craiz_aleta, envergadura_aletas : float
+        Espesor, cuerda media, cuerda raíz y envergadura de dos aletas (m).
+
+    num_aletas : int
+        Número de aletas.
+
+    espesor_ala, craiz_ala, envergadura_ala, x_ala : float
+        Espesor, cuerda raíz, envergadura del ala y posición de su borde de
+        salida desde la proa (m).
+
+    factor_aleta, factor_ala : float
+        Factores del tipo de perfil (apuntes misiles UPM).
+
+    Atributos derivados
+    -------------------
+    angulo_nariz : tuple
+        Ángulo del cuerpo (deg) para cada tipo de nariz.
+
+    sup_cono, sref, sbase : float
+        Superficie exterior del cono, de referencia y de la base (m2).
+
+    sup_cil, sgases : tuple
+        Superficie del cilindro y de la salida de gases de cada etapa (m2).
+
+    sw_aleta, swtotal_aletas, sw_ala : float
+        Superficie de una aleta, total de las aletas y del ala (m2).
+
+    flecha_aleta, flecha_ala : float
+        Ángulos de flecha (rad).
+
+    espesor_medio_aleta, espesor_medio_ala, a_aletas, a_ala : float
+        Espesores relativos y alargamientos.
+
+    kwb, kbw, kbm, kmb : float
+        Factores de interferencia para el coeficiente normal.
+
+    xcp_cono, xcp_aletas, xcp_ala : float
+        Centros de presión medidos desde la proa (m).
+
+    xcp_cil : tuple
+        Centro de presión del cilindro de cada etapa (m).
+
+    x_etapas : tuple
+        Distancias de la proa al centro de gravedad de cada etapa por
+        separado: etapa 1, ..., etapa n, carga de pago (m).
+
+    huella : int
+        Hash de los parámetros. Se calcula una vez para que usar la
+        geometría en claves de diccionario (por ejemplo, en las de
+        aero_misil.PUENTES_TRANSONICOS) no obligue a recorrerla entera.
+    '''
+    __slots__ = ()
+
+    def __new__(cls, diametro=DIAMETRO_M, diametro_salida=DIAMETRO_S,
+                longitud_cono=LONGITUD_CONO, longitud_misil=LONGITUD_MISIL,
+                tipo_nariz=TIPO_NARIZ, espesor_aleta=ESPESOR_ALETA,
+                cmedia_aleta=CMEDIA_ALETA, craiz_aleta=CRAIZ_ALETA,
+                num_aletas=NUM_ALETAS, envergadura_aletas=ENVERGADURA_ALETAS,
+                factor_aleta=FACTOR_ALETA, espesor_ala=ESPESOR_ALA,
+                factor_ala=FACTOR_ALA, craiz_ala=CRAIZ_ALA,
+                envergadura_ala=ENVERGADURA_ALA, x_ala=X_ALA):
+        diametro_salida = tuple(diametro_salida)
+        longitud_misil = tuple(longitud_misil)
+        parametros = (diametro, diametro_salida, longitud_cono,
+                      longitud_misil, tipo_nariz, espesor_aleta, cmedia_aleta,
+                      craiz_aleta, num_aletas, envergadura_aletas,
+                      factor_aleta, espesor_ala, factor_ala, craiz_ala,
+                      envergadura_ala, x_ala)
+        # Longitudes hasta el cono: una por etapa
+        longitudes = longitud_misil[:-1]
+
+        angulo_nariz = (degrees(atan(.5 * diametro / longitud_cono)),
+                        2*degrees(atan(.5 * diametro / longitud_cono)))
+        sup_cono = pi * diametro / 2 * sqrt(longitud_cono**2
+                                            + diametro**2 / 4)
+        sref = pi * diametro**2 / 4
+        sbase = sref  # No tiene porque ser igual a la de referencia.
+        sup_cil = tuple(pi*diametro*(s - longitud_cono) for s in longitudes)
+        sgases = tuple(pi * d**2 / 4 for d in diametro_salida)
+
+        sw_aleta = envergadura_aletas*cmedia_aleta/2
+        swtotal_aletas = sw_aleta * num_aletas
+        sw_ala = craiz_ala*envergadura_ala/2
+        flecha_aleta = 0  # Se suponen aletas rectangulares
+        flecha_ala = atan(craiz_ala/envergadura_ala)  # rad
+        espesor_medio_aleta = espesor_aleta/cmedia_aleta
+        espesor_medio_ala = espesor_ala/craiz_ala
+        a_aletas = envergadura_aletas/cmedia_aleta
+        a_ala = 2*envergadura_ala/craiz_ala
+
+        # Parámetros para el cálculo de del coeficiente normal
+        kwb = 1+diametro/(envergadura_aletas+diametro)
+        kbw = ((diametro/(diametro+envergadura_aletas))*
+               (1+diametro/(envergadura_aletas+diametro)))
+        kbm = diametro/(envergadura_aletas+diametro)
+        kmb = 1
+
+        # Centros de presión de cada parte del lanzador, medidos desde la
+        # proa del misil
+        xcp_cono = 2/3*longitud_cono
+        xcp_cil = tuple((xlan+longitud_cono)/2 for xlan in longitudes)
+        xcp_aletas = longitud_misil[0]-cmedia_aleta/2
+        xcp_ala = x_ala-craiz_ala/2
+
+        # Cada etapa (y la carga de pago) ocupa el tramo entre su longitud y
+        # la de la siguiente; su centro de gravedad está en la mitad.
+        l_etapas = [longitud_misil[i] - longitud_misil[i + 1]
+                    for i in range(len(longitudes))] + [longitud_misil[-1]]
+        x_etapas = tuple(l_etapas[i]/2 + sum(l_etapas[i + 1:])
+                         for i in range(len(l_etapas)))
+
+        return super().__new__(
+            cls, *parametros, angulo_nariz, sup_cono, sref, sbase, sup_cil,
+            sgases, sw_aleta, swtotal_aletas, sw_ala, flecha_aleta,
+            flecha_ala, espesor_medio_aleta, espesor_medio_ala, a_aletas,
+            a_ala, kwb, kbw, kbm, kmb, xcp_cono, xcp_cil, xcp_aletas,
+            xcp_ala, x_etapas, hash(parametros))
+
+    def __hash__(self):
+        return self.huella
+
+    def __getnewargs__(self):
+        # Al copiar o serializar (por ejemplo, entre procesos) se vuelve a
+        # construir a partir de los parámetros.
+        return tuple(self[:len(PARAMETROS_GEOMETRIA)])
+
+    def parametros(self):
+        '''
+        Diccionario con los parámetros de PARAMETROS_GEOMETRIA.
+        '''
+        return dict(zip(PARAMETROS_GEOMETRIA, self))
+
+    def _replace(self, **cambios):
+        return type(self)(**dict(self.parametros(), **cambios))
+
+
+GEOMETRIA_NOMINAL = GeometriaLanzador()  # Geometría del lanzador nominal
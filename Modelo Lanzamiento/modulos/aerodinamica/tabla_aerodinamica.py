@@ -0,0 +1,400 @@
+# -*- coding: utf-8 -*-
+"""
+@author: Team REOS
+
+Base de datos de coeficientes aerodinámicos precalculados. Los coeficientes
+de CoeficienteFuerza (aero_misil.py) se tabulan en una rejilla de número de
+Mach, altitud, ángulo de ataque y deflexión de mando para cada
+configuración discreta del lanzador (etapa, propulsión, aletas y ala), y
+CoeficienteFuerzaTabulado los obtiene por interpolación multilineal en
+lugar de evaluar el modelo analítico en cada paso.
+
+La estructura del modelo permite reducir el tamaño de las tablas sin
+pérdida de precisión:
+    - cd es la suma de un término que depende del Mach y de la altitud
+      (resistencia parásita con alfa = delta = 0) y de otro que depende del
+      Mach, alfa y delta (resistencia inducida).
+    - cn no depende de la altitud.
+    - cm depende linealmente de la posición del centro de gravedad, por lo
+      que se tabula en x_cdg = 0 y x_cdg = 1.
+
+La rejilla de altitud incluye los límites de los tramos del modelo
+atmosférico, en los que la densidad es discontinua; en ellos se guardan los
+valores a ambos lados. Fuera de la rejilla de Mach se toma el valor del
+extremo más cercano; la altitud, alfa y delta han de estar dentro de sus
+rejillas, como en el modelo analítico, que no admite altitudes fuera del
+modelo atmosférico.
+El error frente al modelo analítico se obtiene con
+TablaAerodinamica.errores(). Con las rejillas por defecto, el percentil 99
+del error relativo es menor que el 1 % en cd y que el 0.3 % en cn y cm; los
+errores mayores (hasta un 10 % en cd) aparecen a Mach > 20 por debajo de
+70 km, fuera de la envolvente de vuelo. En la trayectoria nominal
+(integracion.lanzamiento() con tabla) la altitud de inyección cambia unos
+380 m y la velocidad de inyección y las pérdidas de velocidad 0.5 m/s.
+
+Para integrar con la tabla en lugar del modelo analítico se pasa con el
+argumento <tabla> a integracion.lanzamiento() (y a etapa(), vuelo_libre()
+y step()) o a conjunto.lanzamiento_conjunto(); mecanica.fuerzas() obtiene
+entonces cd y cn con TablaAerodinamica.cd() y TablaAerodinamica.cn().
+
+Las tablas se construyen con las versiones vectorizadas de los coeficientes
+(cd_vectorizado(), cn_vectorizado() y cm_vectorizado()), en menos de una
+décima de segundo por configuración. También pueden construirse una vez y
+guardarse:
+    python -m modulos.aerodinamica.tabla_aerodinamica
+y cargarse después con cargar_tabla().
+"""
+
+from bisect import bisect_left
+from itertools import product
+
+import numpy as np
+
+from errores import ValorInadmisibleError
+from modulos.aerodinamica.aero_misil import (CoeficienteFuerza,
+                                              cd_vectorizado, cn_vectorizado,
+                                              cm_vectorizado)
+from modulos.aerodinamica.geometria_misil import (LONGITUD_MISIL,
+                                                  GEOMETRIA_NOMINAL)
+from modulos.atmosfera.modelo_msise00 import TRAMOS
+
+# Rejillas por defecto
+MACH_TABLA = np.round(np.concatenate((np.arange(.05, 3, .05),
+                                      np.arange(3, 10, .25),
+                                      np.arange(10, 30.1, .5))), 6)
+# La fricción crece de forma aproximadamente exponencial con la altitud, por
+# lo que el paso de altitud se ajusta a la escala de altura de la densidad.
+ALT_TABLA = np.union1d(np.concatenate((np.arange(0, 150e3, 1e3),
+                                       np.arange(150e3, 300e3, 2e3),
+                                       np.arange(300e3, 1e6 + 1, 5e3))),
+                       TRAMOS)  # m
+ALFA_TABLA = np.radians(np.arange(0, 5.01, .25))  # rad
+DELTA_TABLA = np.array([0.])  # rad
+ALT_REFERENCIA = 0.  # Altitud de la tabla de resistencia inducida (m)
+ESCALA_ERROR = 1e-2  # Valor mínimo de referencia de los errores relativos
+
+# Configuraciones discretas: (etapa, propulsión, aletas, ala). La última
+# longitud de LONGITUD_MISIL es la del cono de la carga de pago, que no es
+# una etapa con motor.
+CONFIGURACIONES = list(product(range(1, len(LONGITUD_MISIL)),
+                               (False, True), (False, True), (False, True)))
+ARCHIVO_TABLA = 'tabla_aerodinamica.npz'
+
+
+def localizar(rejilla, x):
+    '''
+    Devuelve el índice de la celda de la rejilla <rejilla> (lista
+    creciente) que contiene a <x> y el peso de interpolación del nodo
+    superior. Fuera de la rejilla el peso se limita a [0, 1].
+    '''
+    ultimo = len(rejilla) - 1
+    i = bisect_left(rejilla, x) - 1
+    if i < 0 or ultimo == 0:
+        return 0, 0.
+    if i >= ultimo:
+        return ultimo - 1, 1.
+    x_0 = rejilla[i]
+    return i, (x - x_0) / (rejilla[i + 1] - x_0)
+
+
+def bilineal(tabla, i, peso_i, j, peso_j, derecha=None):
+    '''
+    Interpolación bilineal en la tabla <tabla> (listas anidadas) a partir
+    de los índices y pesos de las celdas de cada dimensión. Si se indica la
+    tabla <derecha>, el extremo inferior de la celda de la segunda dimensión
+    se toma de ella (límites por la derecha en las discontinuidades).
+    '''
+    inferior = tabla if derecha is None else derecha
+    fila = tabla[i]
+    valor = inferior[i][j] + peso_j * (fila[j + 1] - inferior[i][j])
+    if peso_i == 0:
+        return valor
+    fila = tabla[i + 1]
+    valor_1 = inferior[i + 1][j] + peso_j * (fila[j + 1] - inferior[i + 1][j])
+    return valor + peso_i * (valor_1 - valor)
+
+
+def trilineal(tabla, posiciones):
+    '''
+    Interpolación en la tabla <tabla> (listas anidadas de tres dimensiones)
+    a partir de la posición (índice, peso) en cada dimensión. Si la última
+    dimensión tiene un único nodo, la interpolación es bilineal.
+    '''
+    (i, peso_i), (j, peso_j), (k, peso_k) = posiciones
+    valores = []
+    for plano in (tabla[i], tabla[i + 1]) if peso_i else (tabla[i],):
+        valor = plano[j][k]
+        if peso_k:
+            valor += peso_k * (plano[j][k + 1] - valor)
+        if peso_j:
+            valor_1 = plano[j + 1][k]
+            if peso_k:
+                valor_1 += peso_k * (plano[j + 1][k + 1] - valor_1)
+            valor += peso_j * (valor_1 - valor)
+        valores.append(valor)
+    if peso_i:
+        return valores[0] + peso_i * (valores[1] - valores[0])
+    return valores[0]
+
+
+class TablaAerodinamica(object):
+    '''
+    Tablas de coeficientes aerodinámicos de cada configuración discreta del
+    lanzador. Las tablas de una configuración se construyen la primera vez
+    que se consultan, o todas a la vez con construir().
+
+    Parámetros
+    ----------
+    mach, alt, alfa, delta : array
+        Rejillas crecientes de número de Mach, altitud (m), ángulo de ataque
+        (rad) y deflexión de mando (rad). Por defecto son MACH_TABLA,
+        ALT_TABLA, ALFA_TABLA y DELTA_TABLA.
+
+    geometria : GeometriaLanzador
+        Geometría del lanzador cuyos coeficientes se tabulan. Por defecto es
+        GEOMETRIA_NOMINAL.
+
+    Atributos
+    ---------
+    tablas : dictionary
+        Tablas de cada configuración (etapa, propulsión, aletas, ala): un
+        diccionario con los arrays 'cd_parasita' y 'cd_parasita_derecha'
+        (Mach x altitud; el segundo con los límites por la derecha en las
+        discontinuidades de la atmósfera), 'cd_inducida', 'cn', 'cm_0' y
+        'cm_1' (Mach x alfa x delta).
+    '''
+    def __init__(self, mach=MACH_TABLA, alt=ALT_TABLA, alfa=ALFA_TABLA,
+                 delta=DELTA_TABLA, geometria=GEOMETRIA_NOMINAL):
+        self.geometria = geometria
+        self.mach = np.asarray(mach, dtype=float)
+        self.alt = np.asarray(alt, dtype=float)
+        self.alfa = np.asarray(alfa, dtype=float)
+        self.delta = np.asarray(delta, dtype=float)
+        self._rejillas = [rejilla.tolist() for rejilla in
+                          (self.mach, self.alt, self.alfa, self.delta)]
+        self.tablas = {}
+        self._listas = {}
+        self._angulos = (None, None, None)  # Última posición de alfa y delta
+
+    def construir(self, configuraciones=CONFIGURACIONES):
+        '''
+        Construye las tablas de las configuraciones <configuraciones>
+        (tuplas (etapa, propulsión, aletas, ala)) que aún no existan.
+        '''
+        for configuracion in configuraciones:
+            self._tablas_configuracion(tuple(configuracion))
+
+    def _tablas_configuracion(self, configuracion):
+        '''
+        Devuelve las tablas (listas anidadas) de la configuración
+        <configuracion>, construyéndolas si no existen.
+        '''
+        listas = self._listas.get(configuracion)
+        if listas is not None:
+            return listas
+        etapa, propulsion, aletas, ala = configuracion
+        geo = self.geometria
+        mach = self.mach[:, np.newaxis, np.newaxis]
+        alfa = self.alfa[np.newaxis, :, np.newaxis]
+        delta = self.delta[np.newaxis, np.newaxis, :]
+        tablas = {'cd_parasita': cd_vectorizado(
+            self.mach[:, np.newaxis], self.alt, etapa, 0, 0, propulsion,
+            aletas, ala, geo)}
+        tablas['cd_parasita_derecha'] = tablas['cd_parasita'].copy()
+        for j, alt in enumerate(self.alt):
+            if alt in TRAMOS[1:] and j + 1 < len(self.alt):
+                derecha = alt + 1e-9 * (self.alt[j + 1] - alt)
+                tablas['cd_parasita_derecha'][:, j] = cd_vectorizado(
+                    self.mach, derecha, etapa, 0, 0, propulsion, aletas, ala,
+                    geo)
+        tablas['cd_inducida'] = (
+            cd_vectorizado(mach, ALT_REFERENCIA, etapa, delta, alfa,
+                           propulsion, aletas, ala, geo)
+            - cd_vectorizado(mach, ALT_REFERENCIA, etapa, 0, 0, propulsion,
+                             aletas, ala, geo))
+        tablas['cn'] = cn_vectorizado(mach, etapa, delta, alfa, propulsion,
+                                      aletas, ala, geo)
+        tablas['cm_0'] = cm_vectorizado(mach, 0., etapa, delta, alfa,
+                                        propulsion, aletas, ala, geo)
+        tablas['cm_1'] = cm_vectorizado(mach, 1., etapa, delta, alfa,
+                                        propulsion, aletas, ala, geo)
+        self._anadir(configuracion, tablas)
+        return self._listas[configuracion]
+
+    def _anadir(self, configuracion, tablas):
+        self.tablas[configuracion] = tablas
+        self._listas[configuracion] = {nombre: tabla.tolist() for nombre, tabla
+                                       in tablas.items()}
+
+    def _posiciones(self, configuracion, mach):
+        '''
+        Tablas de la configuración completa <configuracion> (ver
+        CoeficienteFuerza.configuracion()) y posiciones en las rejillas de
+        Mach, alfa y delta. La geometría de la configuración, si la lleva,
+        ha de ser la de la tabla.
+        '''
+        etapa, delta, alfa, propulsion, aletas, ala = configuracion[:6]
+        if len(configuracion) > 6:
+            geometria = configuracion[6]
+            if geometria is not self.geometria and geometria != self.geometria:
+                raise ValorInadmisibleError(dict(geometria=geometria), '',
+                                            'la de la tabla aerodinámica')
+        angulos, pos_alfa, pos_delta = self._angulos
+        if angulos != (alfa, delta):
+            rej_alfa, rej_delta = self._rejillas[2:]
+            if not rej_alfa[0] <= alfa <= rej_alfa[-1]:
+                raise ValorInadmisibleError(dict(alfa=alfa), '.4f',
+                                            'dentro de la tabla aerodinámica')
+            if not rej_delta[0] <= delta <= rej_delta[-1]:
+                raise ValorInadmisibleError(dict(delta=delta), '.4f',
+                                            'dentro de la tabla aerodinámica')
+            pos_alfa = localizar(rej_alfa, alfa)
+            pos_delta = localizar(rej_delta, delta)
+            self._angulos = ((alfa, delta), pos_alfa, pos_delta)
+        clave = (etapa, propulsion, aletas, ala)
+        listas = self._listas.get(clave)
+        if listas is None:
+            listas = self._tablas_configuracion(
+                (int(etapa), bool(propulsion), bool(aletas), bool(ala)))
+        return listas, (localizar(self._rejillas[0], mach), pos_alfa,
+                        pos_delta)
+
+    def cd(self, configuracion, mach, alt):
+        '''
+        Coeficiente de resistencia de la configuración <configuracion> en
+        el Mach <mach> y la altitud <alt> (m), que ha de estar dentro de la
+        rejilla de altitud.
+        '''
+        rej_alt = self._rejillas[1]
+        if not rej_alt[0] <= alt <= rej_alt[-1]:
+            raise ValorInadmisibleError(dict(alt=alt), '.0f',
+                                        'dentro de la tabla aerodinámica')
+        listas, posiciones = self._posiciones(configuracion, mach)
+        i, peso_i = posiciones[0]
+        j, peso_j = localizar(rej_alt, alt)
+        return (bilineal(listas['cd_parasita'], i, peso_i, j, peso_j,
+                         listas['cd_parasita_derecha'])
+                + trilineal(listas['cd_inducida'], posiciones))
+
+    def cn(self, configuracion, mach):
+        '''
+        Coeficiente normal de la configuración <configuracion> en el Mach
+        <mach>.
+        '''
+        listas, posiciones = self._posiciones(configuracion, mach)
+        return trilineal(listas['cn'], posiciones)
+
+    def cm(self, configuracion, mach, x_cdg):
+        '''
+        Coeficiente de momento de la configuración <configuracion> en el
+        Mach <mach> con el centro de gravedad en <x_cdg>.
+        '''
+        listas, posiciones = self._posiciones(configuracion, mach)
+        cm_0 = trilineal(listas['cm_0'], posiciones)
+        return cm_0 + x_cdg * (trilineal(listas['cm_1'], posiciones) - cm_0)
+
+    def errores(self, configuracion, puntos=1000, semilla=0):
+        '''
+        Compara la tabla de la configuración <configuracion> (etapa,
+        propulsión, aletas, ala) con el modelo analítico en <puntos> puntos
+        aleatorios de la rejilla. Devuelve un diccionario con el error
+        relativo (referido a max(|coeficiente|, ESCALA_ERROR)) de cd, cn y
+        cm: su percentil 99 y su máximo.
+        '''
+        aleatorio = np.random.default_rng(semilla)
+        etapa, propulsion, aletas, ala = configuracion
+        exactos = {'cd': [], 'cn': [], 'cm': []}
+        tabulados = {'cd': [], 'cn': [], 'cm': []}
+        for _ in range(puntos):
+            mach = aleatorio.uniform(self.mach[0], self.mach[-1])
+            alt = aleatorio.uniform(self.alt[0], self.alt[-1])
+            alfa = aleatorio.uniform(self.alfa[0], self.alfa[-1])
+            delta = aleatorio.uniform(self.delta[0], self.delta[-1])
+            x_cdg = aleatorio.uniform(0,
+                                      self.geometria.longitud_misil[etapa - 1])
+            coef = CoeficienteFuerza(etapa, delta, alfa, propulsion, aletas,
+                                     ala, self.geometria)
+            completa = coef.configuracion()
+            exactos['cd'].append(coef.cd_total(mach, alt))
+            exactos['cn'].append(coef.cn_total(mach))
+            exactos['cm'].append(coef.cm_total(mach, x_cdg))
+            tabulados['cd'].append(self.cd(completa, mach, alt))
+            tabulados['cn'].append(self.cn(completa, mach))
+            tabulados['cm'].append(self.cm(completa, mach, x_cdg))
+        errores = {}
+        for nombre in exactos:
+            exacto = np.array(exactos[nombre])
+            relativo = (np.abs(np.array(tabulados[nombre]) - exacto)
+                        / np.maximum(np.abs(exacto), ESCALA_ERROR))
+            errores[nombre] = {'percentil_99': float(np.percentile(relativo,
+                                                                   99)),
+                               'maximo': float(np.max(relativo))}
+        return errores
+
+    def guardar(self, nombre=ARCHIVO_TABLA):
+        '''
+        Guarda las rejillas y las tablas construidas en el archivo .npz
+        <nombre>.
+        '''
+        arrays = {'mach': self.mach, 'alt': self.alt, 'alfa': self.alfa,
+                  'delta': self.delta,
+                  'configuraciones': np.array(list(self.tablas), dtype=int)}
+        for n, tablas in enumerate(self.tablas.values()):
+            for tabla, valores in tablas.items():
+                arrays[tabla + '_' + str(n)] = valores
+        np.savez(nombre, **arrays)
+
+
+def cargar_tabla(nombre=ARCHIVO_TABLA, geometria=GEOMETRIA_NOMINAL):
+    '''
+    Carga una tabla guardada con TablaAerodinamica.guardar() y devuelve un
+    objeto TablaAerodinamica. El archivo no guarda la geometría, que se
+    indica con <geometria> (por defecto, GEOMETRIA_NOMINAL).
+    '''
+    with np.load(nombre) as contenido:
+        tabla = TablaAerodinamica(contenido['mach'], contenido['alt'],
+                                  contenido['alfa'], contenido['delta'],
+                                  geometria)
+        for n, configuracion in enumerate(contenido['configuraciones']):
+            etapa, propulsion, aletas, ala = configuracion.tolist()
+            tabla._anadir((etapa, bool(propulsion), bool(aletas), bool(ala)),
+                          {nombre_tabla: contenido[nombre_tabla + '_' + str(n)]
+                           for nombre_tabla in ('cd_parasita',
+                                                'cd_parasita_derecha',
+                                                'cd_inducida', 'cn', 'cm_0',
+                                                'cm_1')})
+    return tabla
+
+
+class CoeficienteFuerzaTabulado(CoeficienteFuerza):
+    '''
+    Variante de CoeficienteFuerza que obtiene cd, cn y cm por interpolación
+    en una TablaAerodinamica. Los parámetros y atributos son los de
+    CoeficienteFuerza, más:
+
+    tabla : object
+        Objeto TablaAerodinamica. Por defecto se crea uno con las rejillas
+        por defecto. La geometría del lanzador es la de la tabla.
+    '''
+    def __init__(self, etapa=1, delta=0, alpha=0, propulsion=False,
+                 aletas=False, ala=False, tabla=None):
+        self.tabla = TablaAerodinamica() if tabla is None else tabla
+        CoeficienteFuerza.__init__(self, etapa, delta, alpha, propulsion,
+                                   aletas, ala, self.tabla.geometria)
+
+    def cd_total(self, mach, alt):
+        return self.tabla.cd(self.configuracion(), mach, alt)
+
+    def cn_total(self, mach):
+        return self.tabla.cn(self.configuracion(), mach)
+
+    def cm_total(self, mach, x_cdg):
+        return self.tabla.cm(self.configuracion(), mach, x_cdg)
+
+
+if __name__ == '__main__':
+    TABLA = TablaAerodinamica()
+    for CONFIGURACION in CONFIGURACIONES:
+        TABLA.construir([CONFIGURACION])
+        print(CONFIGURACION, TABLA.errores(CONFIGURACION, puntos=200))
+    TABLA.guardar()
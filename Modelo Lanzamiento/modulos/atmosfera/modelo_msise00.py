@@ -8,10 +8,22 @@ Modelo atmosférico: NRL-MSISE00
 Funciones de temperatura (temperature), densidad (density), presión
 (pressure) y viscosidad (viscosity).  Sólo requieren una variable de
 entrada: la altitud, que no ha de ser superior a 1000 km.
-Los datos se obtienen del archivo modelo_considerado.reos
+La función atmosfera_estado devuelve todas las magnitudes a la vez con
+una única búsqueda del tramo.
+Los datos se obtienen del archivo modelo_atmosferico.reos, que se lee la
+primera vez que se necesitan (no al importar el módulo) y se guarda en la
+caché binaria modelo_atmosferico.npz. La caché se regenera cuando cambia
+el contenido del archivo .reos.
 Este archivo se ha obtenido del módulo modelo_atmosfera.py
 """
 
+import hashlib
+import os
+from bisect import bisect_left
+from collections import namedtuple
+from math import sqrt
+from zipfile import BadZipFile
+
 from errores import ValorInadmisibleError
 import numpy as np
 
@@ -22,51 +34,250 @@ GAMMA = 1.4  # Coeficiente de dilatación adiabática.
 BETA_VISC = 1.458e-6  # Viscosidad de referencia (Pa s/K.5).
 S_VISC = 110.4  # Temperatura de referencia para la viscosidad (K).
 
-TEMPER = []
-DENSIT = []
-
-FILE = open('./modulos/atmosfera/modelo_atmosferico.reos', 'r')
-for i in range(3):
-    HEAD = FILE.readline()
-for i, line in enumerate(FILE):
-    if i == 16:
-        break
-    s = line.strip()
-    s = s.split()
-    TEMPER_AUX = []
-    for n in range(np.size(s)):
-        TEMPER_AUX.append(float(s[n]))
-    TEMPER.append(TEMPER_AUX)
-for i in range(2):
-    BETWEEN_LINES = FILE.readline()
-for i, line in enumerate(FILE):
-    if i == 16:
-        break
-    s = line.strip()
-    s = s.split()
-    DENSIT_AUX = []
-    for n in range(np.size(s)):
-        DENSIT_AUX.append(float(s[n]))
-    DENSIT.append(DENSIT_AUX)
-FILE.close()
-    
+# Límites de los tramos del modelo (m).
+TRAMOS = [0, 11e3, 20e3, 32e3, 47e3, 51e3, 71e3, 85e3, 105e3, 125e3, 180e3,
+          300e3, 315.5e3, 390e3, 550e3, 600e3, 999.5e3]
+
+NUM_TRAMOS = len(TRAMOS) - 1
+
+# Archivo de coeficientes del modelo y caché binaria generada a partir de
+# él, ambos junto a este módulo (independientes del directorio de trabajo).
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+ARCHIVO_REOS = os.path.join(DIRECTORIO, 'modelo_atmosferico.reos')
+ARCHIVO_CACHE = os.path.join(DIRECTORIO, 'modelo_atmosferico.npz')
+
+
+class CoeficientesMsise00(namedtuple('CoeficientesMsise00',
+                                     ['temper', 'densit', 'coef_temper',
+                                      'coef_densit', 'horner_temper',
+                                      'horner_densit'])):
+    '''
+    Coeficientes de los polinomios de temperatura y densidad de cada tramo.
+
+    Atributos
+    ---------
+    temper, densit : list
+        Coeficientes de cada tramo, de menor a mayor grado, tal y como
+        aparecen en el archivo .reos.
+
+    coef_temper, coef_densit : array (NUM_TRAMOS, grado máximo + 1)
+        Coeficientes rellenos con ceros, de mayor a menor grado, para
+        evaluarlos por Horner sobre arrays.
+
+    horner_temper, horner_densit : list
+        Tuplas de coeficientes sin relleno, de mayor a menor grado, para las
+        consultas escalares.
+    '''
+    __slots__ = ()
+
+
+_COEFICIENTES = None  # Coeficientes cargados (ver coeficientes_msise00)
+
+
+def leer_reos(archivo=ARCHIVO_REOS):
+    '''Lee los coeficientes de temperatura y densidad del archivo
+    <archivo> (formato .reos).  Devuelve dos listas (temperatura y
+    densidad) con los coeficientes de cada tramo de menor a mayor grado.
+    '''
+    temper = []
+    densit = []
+    with open(archivo, 'r', encoding='latin-1') as fichero:
+        for i in range(3):
+            fichero.readline()
+        for i in range(NUM_TRAMOS):
+            temper.append([float(s) for s in fichero.readline().split()])
+        # Línea en blanco y cabecera de la densidad
+        for i in range(3):
+            fichero.readline()
+        for i in range(NUM_TRAMOS):
+            densit.append([float(s) for s in fichero.readline().split()])
+    return temper, densit
+
+
+def matriz_horner(coeficientes, grado):
+    '''Matriz de los coeficientes <coeficientes> (lista por tramo, de
+    menor a mayor grado) rellena con ceros hasta el grado <grado> y
+    ordenada de mayor a menor grado.
+    '''
+    matriz = np.zeros((len(coeficientes), grado + 1))
+    for i, coef in enumerate(coeficientes):
+        matriz[i, grado - len(coef) + 1:] = coef[::-1]
+    return matriz
+
+
+def cargar_coeficientes(archivo=ARCHIVO_REOS, cache=ARCHIVO_CACHE):
+    '''Carga los coeficientes del modelo.  Si la caché binaria <cache>
+    (.npz) se generó a partir del contenido actual de <archivo>, se leen de
+    ella; en caso contrario (o si la caché está dañada) se lee el archivo
+    .reos y se regenera la caché.
+    Si no se puede escribir la caché, se continúa sin ella.
+    Devuelve un registro CoeficientesMsise00.
+    '''
+    with open(archivo, 'rb') as fichero:
+        firma = hashlib.sha1(fichero.read()).hexdigest()
+    try:
+        with np.load(cache) as contenido:
+            if str(contenido['firma']) != firma:
+                raise ValueError('Caché desactualizada')
+            coef_temper = contenido['coef_temper']
+            coef_densit = contenido['coef_densit']
+            grados_temper = contenido['grados_temper']
+            grados_densit = contenido['grados_densit']
+        temper = [coef[len(coef) - g - 1:][::-1].tolist()
+                  for coef, g in zip(coef_temper, grados_temper)]
+        densit = [coef[len(coef) - g - 1:][::-1].tolist()
+                  for coef, g in zip(coef_densit, grados_densit)]
+    except (OSError, KeyError, ValueError, EOFError, BadZipFile):
+        # Caché inexistente, desactualizada o dañada
+        temper, densit = leer_reos(archivo)
+        grado = max(len(coef) for coef in temper + densit) - 1
+        coef_temper = matriz_horner(temper, grado)
+        coef_densit = matriz_horner(densit, grado)
+        temporal = cache + '.' + str(os.getpid())
+        try:
+            with open(temporal, 'wb') as fichero:
+                np.savez(fichero, firma=firma, coef_temper=coef_temper,
+                         coef_densit=coef_densit,
+                         grados_temper=[len(coef) - 1 for coef in temper],
+                         grados_densit=[len(coef) - 1 for coef in densit])
+            os.replace(temporal, cache)
+        except OSError:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+    return CoeficientesMsise00(temper, densit, coef_temper, coef_densit,
+                               [tuple(coef[::-1]) for coef in temper],
+                               [tuple(coef[::-1]) for coef in densit])
+
+
+def coeficientes_msise00():
+    '''Devuelve los coeficientes del modelo (CoeficientesMsise00),
+    cargándolos la primera vez que se necesitan.
+    '''
+    global _COEFICIENTES
+    if _COEFICIENTES is None:
+        _COEFICIENTES = cargar_coeficientes()
+    return _COEFICIENTES
+
+
+def __getattr__(nombre):
+    # Los nombres históricos del módulo se cargan bajo demanda.
+    atributos = dict(TEMPER='temper', DENSIT='densit',
+                     COEF_TEMPER='coef_temper', COEF_DENSIT='coef_densit',
+                     HORNER_TEMPER='horner_temper',
+                     HORNER_DENSIT='horner_densit')
+    if nombre in atributos:
+        return getattr(coeficientes_msise00(), atributos[nombre])
+    raise AttributeError("module '" + __name__ + "' has no attribute '"
+                         + nombre + "'")
+
+
 def interval_msise00(alt):
-    '''División de tramos del modelo atmosférico MSISE00.
+    '''División de tramos del modelo atmosférico MSISE00, por búsqueda
+    binaria.  El extremo superior de cada tramo pertenece al tramo
+    inferior y por encima del último límite se extrapola el último tramo.
     La variable de entrada alt es la altitud (m).  Debe ser menor o
-    igual que 800000 (8e5) metros.
+    igual que 1000000 (10e5) metros.
     '''
     if alt < 0:
         raise ValorInadmisibleError(dict(alt=alt), '.0f', 'positivo')
     elif alt > 10e5:
         raise ValorInadmisibleError(dict(alt=alt), '.0f', 'menor que 1000 km')
-    i = -1
-    tramos = [0, 11e3, 20e3, 32e3, 47e3, 51e3, 71e3, 85e3, 105e3, 125e3, 180e3,
-              300e3, 315.5e3, 390e3, 550e3, 600e3, 999.5e3]
-    en_tramo = False
-    while not en_tramo:
-        i = i + 1
-        en_tramo = tramos[i] <= alt and alt <= tramos[i+1]
-    return i
+    return min(max(bisect_left(TRAMOS, alt) - 1, 0), NUM_TRAMOS - 1)
+
+
+def tramos_msise00(alt):
+    '''Versión de interval_msise00 para un array de altitudes <alt> (m),
+    mediante np.searchsorted.
+    La variable de salida es un array de enteros con la forma de <alt>.
+    '''
+    if np.any(alt < 0):
+        raise ValorInadmisibleError(dict(alt=np.min(alt)), '.0f', 'positivo')
+    elif np.any(alt > 10e5):
+        raise ValorInadmisibleError(dict(alt=np.max(alt)), '.0f',
+                                    'menor que 1000 km')
+    return np.clip(np.searchsorted(TRAMOS, alt) - 1, 0, NUM_TRAMOS - 1)
+
+
+def horner(coeficientes, alt):
+    '''Evalúa por Horner el polinomio de coeficientes <coeficientes>
+    (ordenados de mayor a menor grado) en la altitud escalar <alt>.
+    '''
+    valor = 0.
+    for coef in coeficientes:
+        valor = valor * alt + coef
+    return valor
+
+
+def polinomio_tramos(coeficientes, alt, tramo=None):
+    '''Evalúa por Horner los polinomios por tramos <coeficientes>
+    (coef_temper o coef_densit de coeficientes_msise00) en un array de
+    altitudes <alt> (m), cada una con el polinomio de su tramo.  Las
+    altitudes han de cumplir las mismas condiciones que en
+    interval_msise00.  Si ya se conocen los tramos de las altitudes
+    (tramos_msise00), se pueden indicar en <tramo>.
+    La variable de salida es un array con la forma de <alt>.
+    '''
+    alt = np.asarray(alt, dtype=float)
+    if tramo is None:
+        tramo = tramos_msise00(alt)
+    filas = coeficientes[tramo]
+    valor = filas[..., 0]
+    for j in range(1, coeficientes.shape[1]):
+        valor = valor * alt + filas[..., j]
+    return valor
+
+
+class EstadoAtmosfera(namedtuple('EstadoAtmosfera',
+                                 ['temperatura', 'densidad', 'presion',
+                                  'viscosidad', 'sonido'])):
+    '''
+    Registro del estado atmosférico en una altitud, que se obtiene con la
+    función atmosfera_estado().
+
+    Atributos
+    ---------
+    temperatura : float o array
+        Temperatura (K).
+
+    densidad : float o array
+        Densidad (kg/m3).
+
+    presion : float o array
+        Presión (Pa).
+
+    viscosidad : float o array
+        Viscosidad dinámica (Pa s).
+
+    sonido : float o array
+        Velocidad del sonido (m/s).
+    '''
+    __slots__ = ()
+
+
+def atmosfera_estado(alt):
+    '''Cálculo de todas las magnitudes atmosféricas en función de la
+    altura dada por el modelo MSISE00, con una única búsqueda del tramo y
+    una única evaluación de los polinomios de temperatura y densidad.
+    La variable de entrada alt es la altitud (m).  Debe ser menor o
+    igual que 1000000 (10e5) metros.
+    La variable de salida es un registro EstadoAtmosfera.  Si alt es un
+    array, sus atributos son arrays.
+    '''
+    if np.ndim(alt):
+        alt = np.asarray(alt, dtype=float)
+        tramo = tramos_msise00(alt)
+        coef = coeficientes_msise00()
+        tem = polinomio_tramos(coef.coef_temper, alt, tramo)
+        den = polinomio_tramos(coef.coef_densit, alt, tramo)
+        sonido = np.sqrt(GAMMA * R_AIR * tem)
+    else:
+        i = interval_msise00(alt)
+        coef = _COEFICIENTES or coeficientes_msise00()
+        tem = horner(coef.horner_temper[i], alt)
+        den = horner(coef.horner_densit[i], alt)
+        sonido = sqrt(GAMMA * R_AIR * tem)
+    return EstadoAtmosfera(tem, den, den * R_AIR * tem,
+                           BETA_VISC * tem**(3 / 2) / (tem + S_VISC), sonido)
 
 
 def temperature(alt):
@@ -74,13 +285,13 @@ def temperature(alt):
     modelo MSISE00.
     La variable de entrada alt es la altitud (m).  Debe ser menor o
     igual que 1000000(10e5) metros.
-    La variable de salida es un float con la temperatura (K).
+    La variable de salida es un float con la temperatura (K).  Si alt es un
+    array, se devuelve un array.
     '''
-    tem = 0
-    i = interval_msise00(alt)
-    for j, k in enumerate(TEMPER[i]):
-        tem = tem + k * alt**j
-    return tem
+    if np.ndim(alt):
+        return polinomio_tramos(coeficientes_msise00().coef_temper, alt)
+    coef = _COEFICIENTES or coeficientes_msise00()
+    return horner(coef.horner_temper[interval_msise00(alt)], alt)
 
 
 def density(alt):
@@ -88,13 +299,13 @@ def density(alt):
     MSISE00.
     La variable de entrada alt es la altitud (m).  Debe ser menor o
     igual que 1000000 (10e5) metros.
-    La variable de salida es un float con la densidad (kg/m3).
+    La variable de salida es un float con la densidad (kg/m3).  Si alt es
+    un array, se devuelve un array.
     '''
-    den = 0
-    i = interval_msise00(alt)
-    for j, k in enumerate(DENSIT[i]):
-        den = den + k * alt**j
-    return den
+    if np.ndim(alt):
+        return polinomio_tramos(coeficientes_msise00().coef_densit, alt)
+    coef = _COEFICIENTES or coeficientes_msise00()
+    return horner(coef.horner_densit[interval_msise00(alt)], alt)
 
 
 def pressure(alt):
@@ -104,7 +315,7 @@ def pressure(alt):
     igual que 1000000 (10e5) metros.
     La variable de salida es un float con la presión (Pa).
     '''
-    return density(alt) * R_AIR * temperature(alt)
+    return atmosfera_estado(alt).presion
 
 
 def viscosity(alt):
@@ -112,7 +323,6 @@ def viscosity(alt):
     modelo MSISE00.  Se implementa la ley de Sutherland.
     La variable de entrada alt es la altitud (m).  Debe ser menor o
     igual que 1000000 (10e5) metros.
-    La variable de salida es un float con la presión (Pa).
+    La variable de salida es un float con la viscosidad (Pa s).
     '''
-    tem = temperature(alt)
-    return BETA_VISC * tem**(3 / 2) / (tem + S_VISC)
\ No newline at end of file
+    return atmosfera_estado(alt).viscosidad
\ No newline at end of file
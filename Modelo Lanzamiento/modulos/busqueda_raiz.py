@@ -0,0 +1,369 @@
+# -*- coding: utf-8 -*-
+"""
+@author: Team REOS
+
+Módulo que contiene métodos de búsqueda de raíces de funciones escalares
+costosas de evaluar (por ejemplo, el ángulo de inyección en función de un
+retardo de encendido, que requiere integrar un lanzamiento completo):
+secante, Brent e Illinois, junto con el acotamiento automático de la raíz.
+
+Todos los métodos cuentan las evaluaciones de la función y se detienen con
+un error ConvergenciaError si se supera el número máximo permitido.
+"""
+
+from collections import namedtuple
+
+from numpy import sign, inf
+
+from errores import ConvergenciaError
+
+TOL_X = 1e-3  # Tolerancia por defecto en la variable
+MAX_EVALUACIONES = 20  # Número máximo de evaluaciones por defecto
+FACTOR_ACOTACION = 1.6  # Factor de expansión del acotamiento
+SOBREPASO = 1.2  # Factor de sobrepaso de la extrapolación del acotamiento
+EXPANSION_MAX = 10.  # Expansión máxima del acotamiento en cada salto
+
+
+class ResultadoRaiz(namedtuple('ResultadoRaiz',
+                               ['raiz', 'valor', 'convergido', 'metodo',
+                                'iteraciones', 'evaluaciones',
+                                'max_evaluaciones'])):
+    '''
+    Resultado de una búsqueda de raíz.
+
+    Atributos
+    ---------
+    raiz : float
+        Última aproximación de la raíz (siempre un punto evaluado).
+
+    valor : float
+        Valor de la función en <raiz>.
+
+    convergido : bool
+        Indica si se cumple la tolerancia en el valor de la función (o, si
+        no se ha indicado, la tolerancia en la variable).
+
+    metodo : string
+        Nombre del método.
+
+    iteraciones : int
+        Número de iteraciones del método (sin contar el acotamiento).
+
+    evaluaciones, max_evaluaciones : int
+        Número de evaluaciones de la función realizadas y permitidas.
+    '''
+    __slots__ = ()
+
+    def informe(self):
+        '''
+        Devuelve un texto con el resultado y el consumo de evaluaciones.
+        '''
+        return ('{0}: raíz {1:.6g} (valor {2:.3g}) en {3} iteraciones, '
+                '{4} de {5} evaluaciones{6}'
+                .format(self.metodo, self.raiz, self.valor, self.iteraciones,
+                        self.evaluaciones, self.max_evaluaciones,
+                        '' if self.convergido else ' (no converge)'))
+
+
+class FuncionContada(object):
+    '''
+    Envoltorio de una función que cuenta sus evaluaciones, recuerda la
+    mejor aproximación de la raíz (la de menor valor absoluto) y produce un
+    error ConvergenciaError si se supera el número máximo de evaluaciones.
+
+    Parámetros
+    ----------
+    funcion : function
+        Función escalar de una variable.
+
+    max_evaluaciones : int
+        Número máximo de evaluaciones.
+
+    metodo : string
+        Nombre del método, para los mensajes de error.
+    '''
+    def __init__(self, funcion, max_evaluaciones, metodo):
+        self.funcion = funcion
+        self.max_evaluaciones = max_evaluaciones
+        self.metodo = metodo
+        self.evaluaciones = 0
+        self.mejor = None
+
+    def __call__(self, x):
+        if self.evaluaciones >= self.max_evaluaciones:
+            raise ConvergenciaError(self.metodo, self.evaluaciones)
+        self.evaluaciones += 1
+        valor = self.funcion(x)
+        if self.mejor is None or abs(valor) < abs(self.mejor[1]):
+            self.mejor = (x, valor)
+        return valor
+
+
+def acotar(funcion, x0, paso, minimo=-inf, maximo=inf,
+           factor=FACTOR_ACOTACION):
+    '''
+    Busca un intervalo en el que la función cambia de signo, partiendo de
+    los puntos x0 y x0 + paso y alejando en cada iteración el extremo de
+    menor valor absoluto (por extrapolación de la secante, pero al menos
+    multiplicando la anchura por <factor>). Devuelve la tupla (a, b, fa, fb) con los extremos
+    y sus valores (a no es necesariamente menor que b).
+
+    funcion : function
+        Función escalar de una variable (normalmente un objeto
+        FuncionContada).
+
+    x0, paso : float
+        Punto inicial y salto inicial.
+
+    minimo, maximo : float
+        Límites del intervalo de búsqueda. Por defecto no hay límites.
+
+    factor : float
+        Factor de expansión. Por defecto es factor=FACTOR_ACOTACION.
+    '''
+    def limitar(x):
+        return min(max(x, minimo), maximo)
+
+    def expandir(x, fx, y, fy):
+        # Nuevo punto más allá de x (el extremo de menor valor absoluto),
+        # alejándose de y. Si la secante corta el cero en ese sentido se
+        # extrapola hasta pasarlo ligeramente; el salto es al menos <factor>
+        # y como mucho EXPANSION_MAX veces la anchura del intervalo.
+        salto = factor * (x - y)
+        if fx != fy:
+            secante = -fx * (x - y) / (fx - fy)
+            if secante * (x - y) > 0:
+                salto = min(max(SOBREPASO * secante, salto, key=abs),
+                            EXPANSION_MAX * (x - y), key=abs)
+        return limitar(x + salto)
+
+    a, b = x0, limitar(x0 + paso)
+    fa = funcion(a)
+    if fa == 0:
+        return a, a, fa, fa
+    fb = funcion(b)
+    while sign(fa) == sign(fb):
+        if abs(fa) < abs(fb):
+            nuevo = expandir(a, fa, b, fb)
+            if nuevo == a:
+                break
+            b, fb = a, fa
+            a, fa = nuevo, funcion(nuevo)
+        else:
+            nuevo = expandir(b, fb, a, fa)
+            if nuevo == b:
+                break
+            a, fa = b, fb
+            b, fb = nuevo, funcion(nuevo)
+    else:
+        return a, b, fa, fb
+    raise ConvergenciaError('acotar', getattr(funcion, 'evaluaciones', 0),
+                            'la raíz no está dentro de los límites')
+
+
+def secante(funcion, x0, x1, tol_x=TOL_X, tol_f=None):
+    '''
+    Método de la secante, sin acotar la raíz. Devuelve la tupla (raíz,
+    valor, iteraciones).
+
+    funcion : function
+        Función escalar de una variable (normalmente un objeto
+        FuncionContada).
+
+    x0, x1 : float
+        Puntos iniciales.
+
+    tol_x : float
+        Tolerancia en la variable. Por defecto es tol_x=TOL_X.
+
+    tol_f : float
+        Tolerancia en el valor de la función. Si tol_f=None, solo se
+        emplea tol_x. Por defecto es tol_f=None.
+    '''
+    f0 = funcion(x0)
+    f1 = funcion(x1)
+    iteraciones = 0
+    while not convergido(x1, f1, x0, tol_x, tol_f):
+        if f1 == f0:
+            raise ConvergenciaError('secante', getattr(funcion,
+                                                       'evaluaciones', 0),
+                                    'la secante es horizontal')
+        x0, f0, x1 = x1, f1, x1 - f1 * (x1 - x0) / (f1 - f0)
+        f1 = funcion(x1)
+        iteraciones += 1
+    return x1, f1, iteraciones
+
+
+def illinois(funcion, a, b, fa, fb, tol_x=TOL_X, tol_f=None):
+    '''
+    Método de Illinois (regula falsi modificada) sobre el intervalo [a, b],
+    en el que la función ha de cambiar de signo. Devuelve la tupla (raíz,
+    valor, iteraciones).
+
+    funcion : function
+        Función escalar de una variable (normalmente un objeto
+        FuncionContada).
+
+    a, b, fa, fb : float
+        Extremos del intervalo y valores de la función en ellos.
+
+    tol_x, tol_f : float
+        Tolerancias (ver secante()).
+    '''
+    lado = 0
+    iteraciones = 0
+    if abs(fa) < abs(fb):
+        x, fx = a, fa
+    else:
+        x, fx = b, fb
+    while not convergido(x, fx, None, tol_x, tol_f, a, b):
+        x = b - fb * (b - a) / (fb - fa)
+        fx = funcion(x)
+        iteraciones += 1
+        if sign(fx) == sign(fb):
+            b, fb = x, fx
+            if lado == 1:
+                fa = fa / 2
+            lado = 1
+        else:
+            a, fa = x, fx
+            if lado == -1:
+                fb = fb / 2
+            lado = -1
+    return x, fx, iteraciones
+
+
+def brent(funcion, a, b, fa, fb, tol_x=TOL_X, tol_f=None):
+    '''
+    Método de Brent (interpolación cuadrática inversa y secante con
+    bisección de seguridad) sobre el intervalo [a, b], en el que la función
+    ha de cambiar de signo. Devuelve la tupla (raíz, valor, iteraciones).
+
+    funcion : function
+        Función escalar de una variable (normalmente un objeto
+        FuncionContada).
+
+    a, b, fa, fb : float
+        Extremos del intervalo y valores de la función en ellos.
+
+    tol_x, tol_f : float
+        Tolerancias (ver secante()).
+    '''
+    c, fc = a, fa
+    d = e = b - a
+    iteraciones = 0
+    while True:
+        if sign(fb) == sign(fc):
+            # c es el extremo del intervalo opuesto a b
+            c, fc = a, fa
+            d = e = b - a
+        if abs(fc) < abs(fb):
+            a, b, c = b, c, b
+            fa, fb, fc = fb, fc, fb
+        mitad = (c - b) / 2
+        if convergido(b, fb, None, tol_x, tol_f, b, c):
+            return b, fb, iteraciones
+        if abs(e) >= tol_x / 2 and abs(fa) > abs(fb):
+            s = fb / fa
+            if a == c:
+                # Secante
+                p = 2 * mitad * s
+                q = 1 - s
+            else:
+                # Interpolación cuadrática inversa
+                q = fa / fc
+                r = fb / fc
+                p = s * (2 * mitad * q * (q - r) - (b - a) * (r - 1))
+                q = (q - 1) * (r - 1) * (s - 1)
+            if p > 0:
+                q = -q
+            p = abs(p)
+            if 2 * p < min(3 * mitad * q - abs(tol_x * q / 2), abs(e * q)):
+                e = d
+                d = p / q
+            else:
+                d = mitad
+                e = d
+        else:
+            # Bisección
+            d = mitad
+            e = d
+        a, fa = b, fb
+        if abs(d) > tol_x / 2:
+            b = b + d
+        else:
+            b = b + (tol_x / 2 if mitad > 0 else -tol_x / 2)
+        fb = funcion(b)
+        iteraciones += 1
+
+
+def convergido(x, fx, x_previo, tol_x, tol_f, a=None, b=None):
+    '''
+    Criterio de convergencia común a los métodos: si se indica tol_f, se
+    exige |fx| <= tol_f; en caso contrario, que el último salto (o el
+    intervalo [a, b]) sea menor que tol_x. Si el intervalo o el salto ya
+    es menor que tol_x, la búsqueda también termina para no seguir
+    evaluando la función.
+    '''
+    if tol_f is not None and abs(fx) <= tol_f:
+        return True
+    if fx == 0:
+        return True
+    if a is not None:
+        return abs(b - a) <= tol_x
+    return x_previo is not None and abs(x - x_previo) <= tol_x
+
+
+METODOS = {'secante': secante, 'brent': brent, 'illinois': illinois}
+
+
+def resolver(funcion, x0, paso, metodo='brent', tol_x=TOL_X, tol_f=None,
+             max_evaluaciones=MAX_EVALUACIONES, minimo=-inf, maximo=inf):
+    '''
+    Busca la raíz de <funcion> partiendo de x0 con el método <metodo>.
+    Los métodos acotados (Brent e Illinois) acotan antes la raíz
+    automáticamente (ver acotar()); la secante parte de x0 y x0 + paso.
+    Devuelve un objeto ResultadoRaiz.
+
+    funcion : function
+        Función escalar de una variable.
+
+    x0, paso : float
+        Punto inicial y salto inicial.
+
+    metodo : string
+        'secante', 'brent' o 'illinois'. Por defecto es metodo='brent'.
+
+    tol_x, tol_f : float
+        Tolerancias (ver secante()).
+
+    max_evaluaciones : int
+        Número máximo de evaluaciones de la función. Si se agota, se
+        produce un error ConvergenciaError. Por defecto es
+        max_evaluaciones=MAX_EVALUACIONES.
+
+    minimo, maximo : float
+        Límites del acotamiento. Por defecto no hay límites.
+    '''
+    if metodo not in METODOS:
+        raise ValueError('El método ha de ser uno de: '
+                         + ', '.join(METODOS) + '.')
+    contada = FuncionContada(funcion, max_evaluaciones, metodo)
+    if metodo == 'secante':
+        raiz, valor, iteraciones = secante(contada, x0, x0 + paso, tol_x,
+                                           tol_f)
+    else:
+        a, b, fa, fb = acotar(contada, x0, paso, minimo, maximo)
+        if fa == 0:
+            raiz, valor, iteraciones = a, fa, 0
+        else:
+            raiz, valor, iteraciones = METODOS[metodo](contada, a, b, fa, fb,
+                                                       tol_x, tol_f)
+    if abs(contada.mejor[1]) < abs(valor):
+        raiz, valor = contada.mejor
+    if tol_f is None:
+        exito = True
+    else:
+        exito = abs(valor) <= tol_f
+    return ResultadoRaiz(raiz, valor, exito, metodo, iteraciones,
+                         contada.evaluaciones, max_evaluaciones)
@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+"""
+@author: Team REOS
+
+Módulo que contiene los eventos de la integración del movimiento (fin de la
+combustión, apogeo, techo de altitud, caída e impacto con el suelo) y el
+método con el que se localiza el instante en el que ocurren dentro de un
+paso de integración.
+
+Cada evento es una función escalar del estado (tiempo, masa, posición y
+velocidad) que cambia de signo cuando ocurre el evento.
+"""
+
+from numpy import dot, arccos, degrees, sign
+from numpy.linalg import norm
+
+from modulos.atmosfera.gravedad import RT
+
+TOL_EVENTO = 1e-6  # Tolerancia temporal de la localización de eventos (s)
+ITER_EVENTO = 100  # Número máximo de iteraciones de la localización
+ALTURA_IMPACTO = 1.  # Altitud a la que se detecta el impacto (m)
+
+
+class Evento(object):
+    '''
+    Clase que define un evento de la integración.
+
+    Parámetros
+    ----------
+    funcion : function
+        Función funcion(tiempo, masa, pos, vel) que devuelve un escalar que
+        cambia de signo cuando ocurre el evento.
+
+    direccion : int
+        Sentido del cruce por cero que se considera: 1 si la función pasa de
+        negativa a positiva, -1 si pasa de positiva a negativa y 0 en ambos
+        casos. Por defecto es direccion=0.
+
+    terminal : bool
+        Indica si el evento detiene la integración. Por defecto es
+        terminal=True.
+
+    nombre : string
+        Nombre del evento. Por defecto es nombre=''.
+    '''
+    def __init__(self, funcion, direccion=0, terminal=True, nombre=''):
+        self.funcion = funcion
+        self.direccion = direccion
+        self.terminal = terminal
+        self.nombre = nombre
+
+    def __call__(self, tiempo, masa, pos, vel):
+        return self.funcion(tiempo, masa, pos, vel)
+
+    def cruza(self, valor_inicial, valor_final):
+        '''
+        Indica si el evento ocurre entre dos valores consecutivos de la
+        función. Un valor final nulo cuenta como cruce.
+        '''
+        if valor_inicial == 0 or sign(valor_inicial) == sign(valor_final):
+            return False
+        if self.direccion == 0:
+            return True
+        return self.direccion * (valor_final - valor_inicial) > 0
+
+
+def localizar_evento(funcion, a, b, fa, fb, tol=TOL_EVENTO,
+                     max_iter=ITER_EVENTO):
+    '''
+    Localiza la raíz de <funcion> en el intervalo [a, b] mediante el método
+    de Illinois (regula falsi modificada). Los valores fa y fb han de tener
+    signo contrario (fb puede ser nulo). Devuelve el extremo del intervalo
+    final posterior al cruce, de modo que en él el evento ya ha ocurrido.
+
+    funcion : function
+        Función escalar de una variable.
+
+    a, b : float
+        Extremos del intervalo.
+
+    fa, fb : float
+        Valores de la función en los extremos.
+
+    tol : float
+        Anchura máxima del intervalo final. Por defecto es tol=TOL_EVENTO.
+
+    max_iter : int
+        Número máximo de iteraciones. Por defecto es max_iter=ITER_EVENTO.
+    '''
+    lado = 0
+    for _ in range(max_iter):
+        if fb == 0 or b - a <= tol:
+            break
+        c = b - fb * (b - a) / (fb - fa)
+        if not a < c < b:
+            c = (a + b) / 2
+        fc = funcion(c)
+        if fc != 0 and sign(fc) == sign(fa):
+            a, fa = c, fc
+            if lado == -1:
+                fb = fb / 2
+            lado = -1
+        else:
+            b, fb = c, fc
+            if lado == 1:
+                fa = fa / 2
+            lado = 1
+    return b
+
+
+def buscar_eventos(eventos, valores, nuevos, estado, h, tol=TOL_EVENTO):
+    '''
+    Busca los eventos que ocurren durante un paso de integración de salto
+    <h>. Devuelve una lista ordenada temporalmente de tuplas (salto, evento)
+    que termina con el primer evento terminal, si lo hay.
+
+    eventos : list
+        Lista de objetos Evento.
+
+    valores, nuevos : list
+        Valores de las funciones de los eventos al inicio y al final del
+        paso.
+
+    estado : function
+        Función estado(s) que devuelve la tupla (tiempo, masa, pos, vel)
+        tras un salto s, con 0 <= s <= h, desde el inicio del paso.
+
+    h : float
+        Salto temporal del paso.
+
+    tol : float
+        Tolerancia temporal de la localización. Por defecto es
+        tol=TOL_EVENTO.
+    '''
+    ocurridos = []
+    for evento, valor, nuevo in zip(eventos, valores, nuevos):
+        if evento.cruza(valor, nuevo):
+            s = localizar_evento(lambda s: evento(*estado(s)), 0, h, valor,
+                                 nuevo, tol=tol)
+            ocurridos.append((s, evento))
+    ocurridos.sort(key=lambda ocurrido: ocurrido[0])
+    for i, (s, evento) in enumerate(ocurridos):
+        if evento.terminal:
+            return ocurridos[:i + 1]
+    return ocurridos
+
+
+def terminar_en_evento(evento, valor, repetir, s, h, tol=TOL_EVENTO):
+    '''
+    Repite el paso de integración con un salto <s> para terminarlo en el
+    instante del evento <evento>. Como el salto se localiza sobre una
+    interpolación del paso, si el estado repetido aún no ha cruzado el
+    evento se alarga el salto (duplicando cada vez el incremento) hasta que
+    lo cruce o hasta recuperar el salto completo <h>. Devuelve lo que
+    devuelva la última llamada a <repetir>.
+
+    evento : object
+        Evento terminal (objeto Evento).
+
+    valor : float
+        Valor de la función del evento al inicio del paso.
+
+    repetir : function
+        Función repetir(s) que repite el paso con salto s y devuelve una
+        tupla cuyos cuatro primeros elementos son el tiempo, la masa, la
+        posición y la velocidad finales.
+
+    s, h : float
+        Salto en el que se ha localizado el evento y salto completo del
+        paso.
+
+    tol : float
+        Incremento inicial del salto. Por defecto es tol=TOL_EVENTO.
+    '''
+    incremento = tol
+    while True:
+        resultado = repetir(s)
+        tiempo, masa, pos, vel = resultado[:4]
+        if s >= h or evento.cruza(valor, evento(tiempo, masa, pos, vel)):
+            return resultado
+        s = min(h, s + incremento)
+        incremento = 2 * incremento
+
+
+def angulo_trayectoria(pos, vel):
+    '''
+    Ángulo de la trayectoria sobre el horizonte local (deg).
+
+    pos : array (3 componentes)
+        Vector posición.
+
+    vel : array (3 componentes)
+        Vector velocidad.
+    '''
+    return 90 - degrees(arccos(dot(vel, pos)/(norm(vel)*norm(pos))))
+
+
+# EVENTOS DEL LANZAMIENTO
+# -----------------------
+
+def evento_fin_combustion(masa_minima):
+    '''
+    Evento terminal de fin de la combustión: la masa alcanza la masa mínima
+    de la etapa.
+    '''
+    return Evento(lambda t, m, p, v: m - masa_minima, direccion=-1,
+                  nombre='fin_combustion')
+
+
+def evento_techo(altura_maxima):
+    '''
+    Evento terminal de techo: se supera la altura máxima.
+    '''
+    return Evento(lambda t, m, p, v: norm(p) - RT - altura_maxima,
+                  direccion=1, nombre='techo')
+
+
+def evento_apogeo():
+    '''
+    Evento no terminal de apogeo: el ángulo de la trayectoria pasa de
+    positivo a negativo.
+    '''
+    return Evento(lambda t, m, p, v: angulo_trayectoria(p, v), direccion=-1,
+                  terminal=False, nombre='apogeo')
+
+
+def evento_caida(gamma_minima=-5.):
+    '''
+    Evento terminal de caída: el ángulo de la trayectoria es menor que
+    <gamma_minima> (deg).
+    '''
+    return Evento(lambda t, m, p, v: angulo_trayectoria(p, v) - gamma_minima,
+                  direccion=-1, nombre='caida')
+
+
+def evento_impacto(altura_impacto=ALTURA_IMPACTO):
+    '''
+    Evento terminal de impacto con el suelo. Se detecta a una altitud
+    <altura_impacto> ligeramente positiva para que el modelo atmosférico,
+    que no admite altitudes negativas, pueda evaluarse en el estado final.
+    '''
+    return Evento(lambda t, m, p, v: norm(p) - RT - altura_impacto,
+                  direccion=-1, nombre='impacto')
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+@author: Team REOS
+
+Módulo que contiene la propagación analítica del problema de los dos
+cuerpos mediante la variable universal (anomalía universal) y las
+funciones de Stumpff. Es válida para órbitas elípticas, parabólicas e
+hiperbólicas y se emplea en integracion.py para los vuelos libres fuera de
+la atmósfera, en los que solo actúa el peso.
+"""
+
+from numpy import sqrt, sin, cos, sinh, cosh, dot
+from numpy.linalg import norm
+
+from modulos.atmosfera.gravedad import MU
+from errores import ConvergenciaError
+
+TOL_KEPLER = 1e-12  # Tolerancia relativa de la anomalía universal
+ITER_KEPLER = 50  # Número máximo de iteraciones de Newton
+Z_SERIE = 1e-2  # Por debajo de |z| se usa el desarrollo en serie
+
+
+def stumpff(z):
+    '''
+    Funciones de Stumpff C(z) y S(z). Para |z| pequeño se emplea su
+    desarrollo en serie para evitar la cancelación numérica.
+
+    z : float
+        Argumento (alfa por el cuadrado de la anomalía universal).
+    '''
+    if abs(z) < Z_SERIE:
+        return (1/2 - z/24 + z**2/720 - z**3/40320,
+                1/6 - z/120 + z**2/5040 - z**3/362880)
+    if z > 0:
+        raiz = sqrt(z)
+        return (1 - cos(raiz))/z, (raiz - sin(raiz))/raiz**3
+    raiz = sqrt(-z)
+    return (cosh(raiz) - 1)/(-z), (sinh(raiz) - raiz)/raiz**3
+
+
+def anomalia_universal(radio, vel_radial, alfa, dt, mu=MU):
+    '''
+    Resuelve la ecuación de Kepler universal mediante el método de Newton.
+    Devuelve la anomalía universal (m^0.5) tras un tiempo <dt>.
+
+    radio : float
+        Módulo del vector posición inicial.
+
+    vel_radial : float
+        Componente radial de la velocidad inicial.
+
+    alfa : float
+        Inversa del semieje mayor (1/m); negativa para órbitas
+        hiperbólicas.
+
+    dt : float
+        Tiempo de propagación.
+
+    mu : float
+        Parámetro gravitacional. Por defecto es mu=MU.
+    '''
+    raiz_mu = sqrt(mu)
+    chi = raiz_mu * abs(alfa) * dt
+    for _ in range(ITER_KEPLER):
+        z = alfa * chi**2
+        c, s = stumpff(z)
+        funcion = (radio * vel_radial / raiz_mu * chi**2 * c
+                   + (1 - alfa * radio) * chi**3 * s + radio * chi
+                   - raiz_mu * dt)
+        derivada = (radio * vel_radial / raiz_mu * chi * (1 - z * s)
+                    + (1 - alfa * radio) * chi**2 * c + radio)
+        incremento = funcion / derivada
+        chi = chi - incremento
+        if abs(incremento) <= TOL_KEPLER * max(1, abs(chi)):
+            return chi
+    raise ConvergenciaError('kepler', ITER_KEPLER)
+
+
+def propagar_kepler(pos, vel, dt, mu=MU):
+    '''
+    Propaga analíticamente el estado (posición y velocidad) durante un
+    tiempo <dt> bajo la única acción de la gravedad de un cuerpo puntual.
+    Devuelve la posición y la velocidad finales.
+
+    pos : array (3 componentes)
+        Vector posición inicial.
+
+    vel : array (3 componentes)
+        Vector velocidad inicial.
+
+    dt : float
+        Tiempo de propagación.
+
+    mu : float
+        Parámetro gravitacional. Por defecto es mu=MU.
+    '''
+    if dt == 0:
+        return pos, vel
+    radio = norm(pos)
+    vel_radial = dot(pos, vel) / radio
+    alfa = 2 / radio - dot(vel, vel) / mu
+    chi = anomalia_universal(radio, vel_radial, alfa, dt, mu)
+
+    # Coeficientes de Lagrange
+    z = alfa * chi**2
+    c, s = stumpff(z)
+    f = 1 - chi**2 / radio * c
+    g = dt - chi**3 * s / sqrt(mu)
+    posicion = f * pos + g * vel
+    radio_final = norm(posicion)
+    f_punto = sqrt(mu) / (radio * radio_final) * chi * (z * s - 1)
+    g_punto = 1 - chi**2 / radio_final * c
+    velocidad = f_punto * pos + g_punto * vel
+
+    return posicion, velocidad
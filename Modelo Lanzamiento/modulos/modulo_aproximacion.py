@@ -4,10 +4,15 @@ Created on Wed Aug 29 09:55:46 2018
 
 @author: Team REOS
 Modulo que contiene las funciones necesarias para realizar una aproximación
-polinómica y el cálculo de la regresión lineal de la aproximación.
+polinómica y el cálculo de la regresión lineal de la aproximación, tanto en
+una variable (aprox_pol()) como en varias (aprox_pol_multiple(), con todos
+los monomios hasta un grado total dado).
 """
-from numpy import transpose, zeros, matmul, array, size, dot
-from numpy.linalg import cholesky, inv
+from itertools import combinations_with_replacement
+
+from numpy import (transpose, zeros, matmul, array, size, dot, atleast_2d,
+                   arange, prod, newaxis)
+from numpy.linalg import cholesky, inv, lstsq
 
 def aprox_pol(x, y, k):
     """
@@ -61,4 +66,62 @@ def coef_det(y_r, y_a, y_m):
     r_2 = y_a - y_m  # Variación de regresion
     R_2 = (dot(r_2, r_2))/(dot(r_1, r_1) + dot(r_2, r_2))  # Coef. determ.
 
-    return R_2
\ No newline at end of file
+    return R_2
+
+
+def exponentes_polinomio(dimension, grado):
+    """
+    Exponentes de todos los monomios de <dimension> variables con grado
+    total menor o igual que <grado>, ordenados por grado. Devuelve un array
+    de enteros de forma (número de monomios, dimension).
+    """
+    exponentes = []
+    for g in range(grado + 1):
+        for variables in combinations_with_replacement(range(dimension), g):
+            fila = [0] * dimension
+            for j in variables:
+                fila[j] += 1
+            exponentes.append(fila)
+    return array(exponentes, dtype=int)
+
+
+def matriz_polinomio(x, exponentes):
+    """
+    Matriz de los monomios de <exponentes> (ver exponentes_polinomio())
+    evaluados en los puntos x (array de forma (puntos, variables)). Cada
+    fila corresponde a un punto y cada columna a un monomio.
+    """
+    x = atleast_2d(x)
+    # Potencias de cada variable hasta el mayor exponente; cada monomio es
+    # el producto de una potencia de cada variable.
+    potencias = x[:, :, newaxis]**arange(exponentes.max() + 1)
+    return prod(potencias[:, arange(x.shape[1]), exponentes], axis=-1)
+
+
+def aprox_pol_multiple(x, y, k):
+    """
+    Realiza una aproximación por mínimos cuadrados con un polinomio en
+    varias variables de grado total k. Donde:
+    x es el array de la variable independiente, de forma (puntos, variables)
+    y es el array de la variable dependiente, de forma (puntos,) o
+      (puntos, salidas) para aproximar varias variables a la vez
+    k es el grado total del polinomio
+    Así pues obtenemos un polinomio:
+        p(x) = suma de c_i·x1**e_i1·x2**e_i2···
+    La función devuelve la tupla (c, e) con los coeficientes c (un array
+    con una fila por monomio y, si y tiene varias columnas, una columna por
+    salida) y los exponentes e de cada monomio (ver exponentes_polinomio()).
+    Conviene que las variables estén normalizadas (por ejemplo, en
+    [-1, 1]); el sistema se resuelve por descomposición en valores
+    singulares en lugar de con las ecuaciones normales de aprox_pol(),
+    que están peor condicionadas con muchos monomios.
+    """
+    x = atleast_2d(array(x, dtype=float))
+    e = exponentes_polinomio(x.shape[1], k)
+    M = matriz_polinomio(x, e)
+    if M.shape[0] < M.shape[1]:
+        raise ValueError('Se necesitan al menos ' + str(M.shape[1])
+                         + ' puntos para un polinomio de grado ' + str(k)
+                         + ' en ' + str(x.shape[1]) + ' variables.')
+    c = lstsq(M, array(y, dtype=float), rcond=None)[0]
+    return c, e
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+@author: Team REOS
+
+Módulo que contiene el registro en memoria de la trayectoria del
+lanzamiento. Los estados se guardan en un array estructurado de NumPy
+reservado de antemano, que se amplía al llenarse, de modo que durante la
+integración no se da formato a texto ni se escribe en archivos. El registro
+se exporta en formato binario (.npy o .npz) y, opcionalmente, a los
+archivos de texto que leen plots_lanzamiento.py y
+plots_coeficientes_aerodinamicos.py.
+"""
+
+from numpy import empty, nan, isnan, save, savez, load
+
+CAPACIDAD_INICIAL = 4096  # Número de filas reservadas inicialmente
+
+# Tipo de las filas del registro
+TIPO_REGISTRO = [('tiempo', float),  # s
+                 ('altitud', float),  # m
+                 ('velocidad', float),  # m/s
+                 ('masa', float),  # kg
+                 ('gamma', float),  # deg
+                 ('alfa', float),  # deg
+                 ('factor_carga', float),
+                 ('etapa', int),
+                 ('propulsion', bool),
+                 ('cd', float),
+                 ('cn', float)]
+CAMPOS = [campo for campo, tipo in TIPO_REGISTRO]
+
+
+class RegistroTrayectoria(object):
+    '''
+    Registro de los estados de una trayectoria.
+
+    Parámetros
+    ----------
+    capacidad : int
+        Número de filas reservadas inicialmente. Cuando se llena, la
+        capacidad se duplica. Por defecto es capacidad=CAPACIDAD_INICIAL.
+
+    Atributos
+    ---------
+    datos : array estructurado
+        Filas registradas, de tipo TIPO_REGISTRO (vista, sin copia).
+    '''
+    def __init__(self, capacidad=CAPACIDAD_INICIAL):
+        self._filas = empty(capacidad, dtype=TIPO_REGISTRO)
+        self._num = 0
+
+    def anadir(self, tiempo, altitud, velocidad, masa, gamma, alfa,
+               factor_carga, etapa, propulsion, cd=nan, cn=nan):
+        '''
+        Añade una fila al registro. Los coeficientes aerodinámicos son nan
+        en los estados en los que no se han calculado.
+        '''
+        if self._num == len(self._filas):
+            filas = empty(max(1, 2 * len(self._filas)), dtype=TIPO_REGISTRO)
+            filas[:self._num] = self._filas
+            self._filas = filas
+        self._filas[self._num] = (tiempo, altitud, velocidad, masa, gamma,
+                                  alfa, factor_carga, etapa, propulsion, cd,
+                                  cn)
+        self._num += 1
+
+    @property
+    def datos(self):
+        return self._filas[:self._num]
+
+    def __len__(self):
+        return self._num
+
+    def __getitem__(self, campo):
+        return self.datos[campo]
+
+    def guardar(self, nombre):
+        '''
+        Guarda el registro en el archivo binario <nombre>. Si la extensión
+        es .npz se guarda un array por campo; en caso contrario, el array
+        estructurado completo en formato .npy.
+        '''
+        if nombre.endswith('.npz'):
+            savez(nombre, **{campo: self[campo] for campo in CAMPOS})
+        else:
+            save(nombre, self.datos)
+
+    def guardar_texto(self, nombre,
+                      nombre_aerodinamica='caracteristicas_aerodinamicas'):
+        '''
+        Escribe el registro en los archivos de texto de resultados: la
+        trayectoria en <nombre> y los coeficientes aerodinámicos en
+        <nombre_aerodinamica> (solo de los estados en los que se han
+        calculado).
+        '''
+        datos = self.datos
+        with open(nombre, 'w') as archivo:
+            archivo.write(format('Tiempo (s)','^12')
+                          + '\t' + format('Altura (m)','^12')
+                          + '\t' + format('Velocidad (m/s)','^17')
+                          + '\t' + format('Masa (kg)', '^11')
+                          + '\t' + format('Gamma (º)','^13')
+                          + '\t' + format('Alfa (º)','^17')
+                          + '\t' + format('Factor de Carga (-)','^13')
+                          + '\t' + format('Etapa (-)','^13')
+                          + '\t' + format('Propulsión (-)','^15'))
+            for fila in datos:
+                archivo.write('\n' + format(fila['tiempo'], '^12.3f')
+                              + '\t' + format(fila['altitud'], '^12.1f')
+                              + '\t' + format(fila['velocidad'], '^17.1f')
+                              + '\t' + format(fila['masa'], '^11.1f')
+                              + '\t' + format(fila['gamma'], '^13.3f')
+                              + '\t' + format(fila['alfa'], '^14.3f')
+                              + '\t' + format(fila['factor_carga'], '^14.3f')
+                              + '\t' + format(fila['etapa'], '^17.3f')
+                              + '\t' + format('On' if fila['propulsion']
+                                              else 'Off', '^14'))
+
+        with open(nombre_aerodinamica, 'w') as archivo:
+            archivo.write(format('Tiempo (s)','^17')
+                          + '\t' + format('CD (-)','^17')
+                          + '\t' + format('CN (-)','^17')
+                          + '\t' + format('Alfa (º)','^17'))
+            for fila in datos[~isnan(datos['cd'])]:
+                archivo.write('\n' + format(fila['tiempo'], '^17.3f')
+                              + '\t' + format(fila['cd'], '^17.3f')
+                              + '\t' + format(fila['cn'], '^17.3f')
+                              + '\t' + format(fila['alfa'], '^17.3f'))
+
+
+def cargar_registro(nombre):
+    '''
+    Carga un registro guardado con RegistroTrayectoria.guardar() y devuelve
+    un objeto RegistroTrayectoria.
+    '''
+    registro = RegistroTrayectoria(capacidad=0)
+    if nombre.endswith('.npz'):
+        with load(nombre) as contenido:
+            filas = empty(len(contenido['tiempo']), dtype=TIPO_REGISTRO)
+            for campo in CAMPOS:
+                filas[campo] = contenido[campo]
+    else:
+        filas = load(nombre)
+    registro._filas = filas
+    registro._num = len(filas)
+    return registro
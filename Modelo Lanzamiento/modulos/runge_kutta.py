@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+@author: Team REOS
+
+Módulo que contiene un integrador Runge-Kutta embebido de paso adaptativo
+(Dormand-Prince 5(4)). Se emplea en integracion.py como alternativa al paso
+fijo de Taylor de primer orden.
+"""
+
+from numpy import array, zeros, sqrt, mean, maximum, abs as np_abs, inf
+
+# Tabla de Butcher del método Dormand-Prince 5(4)
+C_DP = array([0, 1/5, 3/10, 4/5, 8/9, 1, 1])
+A_DP = [array([]),
+        array([1/5]),
+        array([3/40, 9/40]),
+        array([44/45, -56/15, 32/9]),
+        array([19372/6561, -25360/2187, 64448/6561, -212/729]),
+        array([9017/3168, -355/33, 46732/5247, 49/176, -5103/18656]),
+        array([35/384, 0, 500/1113, 125/192, -2187/6784, 11/84])]
+# Diferencia entre los pesos de orden 5 y de orden 4 (estimación del error)
+E_DP = array([71/57600, 0, -71/16695, 71/1920, -17253/339200, 22/525,
+              -1/40])
+
+# Parámetros del control de paso
+SEGURIDAD = 0.9
+FACTOR_MIN = 0.2
+FACTOR_MAX = 5.
+
+
+def paso_dormand_prince(derivada, t, y, h, k1):
+    '''
+    Realiza un paso del método Dormand-Prince 5(4). Devuelve la solución de
+    orden 5, la estimación del error local y la derivada en el estado final
+    (que por la propiedad FSAL es la primera etapa del siguiente paso).
+
+    derivada : function
+        Función derivada(t, y) que devuelve dy/dt.
+
+    t : float
+        Tiempo inicial del paso.
+
+    y : array
+        Vector de estado inicial.
+
+    h : float
+        Salto temporal.
+
+    k1 : array
+        Derivada en el estado inicial.
+    '''
+    k = zeros((7, len(y)))
+    k[0] = k1
+    for i in range(1, 7):
+        k[i] = derivada(t + C_DP[i] * h, y + h * A_DP[i] @ k[:i])
+    y_nueva = y + h * A_DP[6] @ k[:6]
+
+    return y_nueva, h * E_DP @ k, k[6]
+
+
+def norma_error(error, y, y_nueva, rtol, atol):
+    '''
+    Norma cuadrática media del error local escalado con las tolerancias
+    relativa <rtol> y absoluta <atol>. El paso se acepta si es menor que 1.
+    '''
+    escala = atol + rtol * maximum(np_abs(y), np_abs(y_nueva))
+    return sqrt(mean((error / escala)**2))
+
+
+class IntegradorDormandPrince(object):
+    '''
+    Integrador de paso adaptativo Dormand-Prince 5(4).
+
+    Parámetros
+    ----------
+    derivada : function
+        Función derivada(t, y) que devuelve dy/dt.
+
+    t : float
+        Tiempo inicial.
+
+    y : array
+        Vector de estado inicial.
+
+    h : float
+        Salto temporal inicial.
+
+    rtol, atol : float o array
+        Tolerancias relativa y absoluta del error local.
+
+    k1 : array
+        Derivada en el estado inicial, si ya se conoce (por ejemplo, al
+        reanudar una integración). Si k1=None, se calcula. Por defecto es
+        k1=None.
+
+    Atributos
+    ---------
+    pasos : int
+        Número de pasos aceptados.
+
+    rechazados : int
+        Número de pasos rechazados.
+
+    evaluaciones : int
+        Número de evaluaciones de la función derivada.
+    '''
+    def __init__(self, derivada, t, y, h, rtol, atol, k1=None):
+        self.derivada = derivada
+        self.t = t
+        self.y = array(y, dtype=float)
+        self.h = h
+        self.rtol = rtol
+        self.atol = atol
+        self.pasos = 0
+        self.rechazados = 0
+        self.evaluaciones = 0
+        if k1 is None:
+            k1 = derivada(t, self.y)
+            self.evaluaciones = 1
+        self.k1 = k1
+
+    def avanzar(self, h_max=inf):
+        '''
+        Avanza un paso aceptado, limitado a un salto máximo <h_max>.
+        Devuelve el nuevo tiempo y el nuevo vector de estado.
+        '''
+        rechazado = False
+        while True:
+            h = min(self.h, h_max)
+            y_nueva, error, k7 = paso_dormand_prince(self.derivada, self.t,
+                                                     self.y, h, self.k1)
+            self.evaluaciones += 6
+            err = norma_error(error, self.y, y_nueva, self.rtol, self.atol)
+            if err <= 1:
+                break
+            # Paso rechazado: se reduce el salto y se repite.
+            self.rechazados += 1
+            rechazado = True
+            self.h = h * max(FACTOR_MIN, SEGURIDAD * err**(-1/5))
+
+        if err == 0:
+            factor = FACTOR_MAX
+        else:
+            factor = min(FACTOR_MAX, max(FACTOR_MIN,
+                                         SEGURIDAD * err**(-1/5)))
+        if rechazado:
+            factor = min(factor, 1)
+        # Si el paso se ha recortado por h_max se conserva el salto previo.
+        if h == self.h:
+            self.h = h * factor
+
+        self.t_anterior, self.y_anterior, self.k1_anterior = (self.t, self.y,
+                                                              self.k1)
+        self.t = self.t + h
+        self.y = y_nueva
+        self.k1 = k7
+        self.pasos += 1
+        return self.t, self.y
+
+    def interpolar(self, s):
+        '''
+        Salida densa del último paso aceptado: interpolación de Hermite
+        cúbica del vector de estado tras un salto <s> desde el inicio del
+        paso (0 <= s <= h). No requiere nuevas evaluaciones de la derivada.
+        '''
+        h = self.t - self.t_anterior
+        x = s / h
+        h00 = (1 + 2*x) * (1 - x)**2
+        h10 = x * (1 - x)**2
+        h01 = x**2 * (3 - 2*x)
+        h11 = x**2 * (x - 1)
+        return (h00 * self.y_anterior + h10 * h * self.k1_anterior
+                + h01 * self.y + h11 * h * self.k1)
+
+    def recortar(self, s):
+        '''
+        Repite el último paso aceptado con un salto <s> menor, por ejemplo
+        para terminar exactamente en un evento. Devuelve el nuevo tiempo y
+        el nuevo vector de estado.
+        '''
+        y_nueva, error, k7 = paso_dormand_prince(self.derivada,
+                                                 self.t_anterior,
+                                                 self.y_anterior, s,
+                                                 self.k1_anterior)
+        self.evaluaciones += 6
+        self.t = self.t_anterior + s
+        self.y = y_nueva
+        self.k1 = k7
+        return self.t, self.y
@@ -23,13 +23,26 @@ for i, gas in enumerate(GASTOS):
 
 
 # Tiempos característicos de lanzamiento
-def tiempos_lanzamiento(t0, RETARDOS):
+def tiempos_lanzamiento(t0, RETARDOS, gastos=None, masas=MASAS,
+                        estructuras=ESTRUCTURAS, programa_alfa=None):
     '''
     División temporal en tiempos característicos.
         - t0 : float
             tiempo inicial del lanzamiento
         - RETARDOS : list
             lista que contiene los valores de retardo de cada etapa
+        - gastos, masas, estructuras : list
+            gastos másicos, masas y razones estructurales de cada etapa con
+            los que se calculan los tiempos de combustión. Si gastos=None se
+            emplean los tiempos T_COMBUSTION de inputs_iniciales. Sus
+            elementos (y los de t0 y RETARDOS) pueden ser arrays con un
+            valor por lanzador, en cuyo caso también lo son los tiempos
+            del diccionario.
+        - programa_alfa : object
+            programa del ángulo de ataque de la primera etapa
+            (mecanica.ProgramaAlfa). Si no es None, se guarda en el
+            diccionario bajo la clave 'programa_alfa' y sustituye a la ley
+            fija de mecanica.ley_alfa().
     Esta función devuelve un diccionario con n + 1 entradas (n = etapas), cada
     una incluye los tiempos ideales de retardo y de combustión de cada etapa en
     un entorno global, es decir, teniendo en cuenta el tiempo inicial de
@@ -43,12 +56,22 @@ def tiempos_lanzamiento(t0, RETARDOS):
     T_LANZAMIENTO = []
     dicc_temp = {'t_inicial': t0}
     
-    for i, gas in enumerate(GASTOS):
+    if gastos is None:
+        gastos = GASTOS
+        t_combustion = T_COMBUSTION
+    else:
+        t_combustion = [(1 - estructuras[i])*masas[i]/gas
+                        for i, gas in enumerate(gastos)]
+
+    for i, gas in enumerate(gastos):
         nom = 'etapa_' + str(i + 1)
         a = RETARDOS[i] + t
-        b = a + T_COMBUSTION[i]
+        b = a + t_combustion[i]
         t = b
         T_LANZAMIENTO.append([a, b])
         dicc_temp.update({nom:T_LANZAMIENTO[i]})
 
+    if programa_alfa is not None:
+        dicc_temp['programa_alfa'] = programa_alfa
+
     return dicc_temp
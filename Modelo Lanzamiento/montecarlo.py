@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+@author: Team REOS
+
+Módulo que contiene el análisis de dispersión (Monte Carlo) del lanzamiento.
+Se perturban los parámetros de inputs_iniciales, se integra un lanzamiento
+por cada muestra repartiendo las muestras entre varios procesos y se
+recogen en una tabla los valores de inyección de cada lanzamiento.
+
+Cada muestra es independiente de las demás, por lo que el tiempo de
+ejecución escala con el número de núcleos disponibles.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from os import cpu_count
+from time import time
+
+from numpy import zeros, full, nan, radians, nanmean, nanstd, isnan
+from numpy.random import default_rng
+
+from inputs_iniciales import LAT, LON, AZ, Z0, INC, V_inicial, Zmax
+from inputs_iniciales import GASTOS, MASAS, ISPS, ESTRUCTURAS, RETARDOS_IN
+from modulos.tiempo.division_temporal import tiempos_lanzamiento
+from apoyo import condiciones_iniciales
+from integracion import lanzamiento, DT, Q_KEPLER
+from errores import ValorInadmisibleError
+
+# Desviaciones típicas de las perturbaciones. Las de los parámetros de las
+# etapas son relativas; las demás son absolutas (en unidades de
+# inputs_iniciales).
+DISPERSION = {'GASTOS': .01,
+              'ISPS': .01,
+              'MASAS': .005,
+              'ESTRUCTURAS': .02,
+              'RETARDOS_IN': 1.,  # s
+              'Z0': 100.,  # m
+              'V_inicial': 5.,  # m/s
+              'INC': radians(.5),  # rad
+              'AZ': radians(.5)}  # rad
+
+# Parámetros cuya desviación es relativa
+RELATIVOS = ('GASTOS', 'ISPS', 'MASAS', 'ESTRUCTURAS')
+
+# Parámetros nominales
+NOMINALES = {'GASTOS': GASTOS, 'ISPS': ISPS, 'MASAS': MASAS,
+             'ESTRUCTURAS': ESTRUCTURAS, 'RETARDOS_IN': RETARDOS_IN,
+             'Z0': Z0, 'V_inicial': V_inicial, 'INC': INC, 'AZ': AZ}
+
+# Tipo de la tabla de muestras y resultados
+TIPO_MUESTRA = [('GASTOS', float, len(GASTOS)), ('ISPS', float, len(ISPS)),
+                ('MASAS', float, len(MASAS)),
+                ('ESTRUCTURAS', float, len(ESTRUCTURAS)),
+                ('RETARDOS_IN', float, len(RETARDOS_IN)), ('Z0', float),
+                ('V_inicial', float), ('INC', float), ('AZ', float)]
+TIPO_RESULTADO = [('altitud', float), ('velocidad', float),
+                  ('gam_iny', float), ('vloss', float)]
+
+
+def muestras(num, dispersion=DISPERSION, semilla=None):
+    '''
+    Genera <num> muestras de los parámetros del lanzamiento con
+    perturbaciones normales alrededor de los valores nominales. Devuelve un
+    array estructurado de tipo TIPO_MUESTRA.
+
+    num : int
+        Número de muestras.
+
+    dispersion : dictionary
+        Desviaciones típicas de cada parámetro (ver DISPERSION). Los
+        parámetros que no aparecen no se perturban. Por defecto es
+        dispersion=DISPERSION.
+
+    semilla : int
+        Semilla del generador aleatorio. Por defecto es semilla=None.
+    '''
+    generador = default_rng(semilla)
+    tabla = zeros(num, dtype=TIPO_MUESTRA)
+    for nombre, nominal in NOMINALES.items():
+        sigma = dispersion.get(nombre, 0)
+        perturbacion = generador.standard_normal(tabla[nombre].shape) * sigma
+        if nombre in RELATIVOS:
+            tabla[nombre] = nominal * (1 + perturbacion)
+        elif nombre == 'RETARDOS_IN':
+            # Los retardos nulos (etapas que encienden sin retardo) no se
+            # perturban y ningún retardo puede ser negativo.
+            tabla[nombre] = (nominal + perturbacion * (nominal != 0)).clip(0)
+        else:
+            tabla[nombre] = nominal + perturbacion
+    return tabla
+
+
+def caso(muestra, step_size=DT, rtol=None, kepler=None, programa_alfa=None):
+    '''
+    Integra el lanzamiento de una muestra y devuelve la tupla (altitud,
+    velocidad, gam_iny, vloss) del estado de inyección. Si el lanzamiento
+    no llega al final de la última etapa o sale del modelo atmosférico, los
+    valores son nan.
+
+    muestra : array estructurado
+        Muestra de tipo TIPO_MUESTRA.
+
+    step_size : float
+        Salto temporal (o salto inicial si rtol no es None). Por defecto es
+        step_size=DT (DT=0.05).
+
+    rtol : float
+        Tolerancia relativa del integrador adaptativo. Por defecto es
+        rtol=None (paso fijo).
+
+    kepler : float
+        Presión dinámica (Pa) por debajo de la cual los vuelos libres se
+        propagan analíticamente (ver integracion.vuelo_libre()). Por
+        defecto es kepler=None (siempre se integra).
+
+    programa_alfa : object
+        Programa del ángulo de ataque de la primera etapa
+        (mecanica.ProgramaAlfa). Si programa_alfa=None, se sigue la ley
+        fija de mecanica.ley_alfa(). Por defecto es programa_alfa=None.
+    '''
+    retardos = list(muestra['RETARDOS_IN'])
+    t0, x0, v0 = condiciones_iniciales(muestra['Z0'], LAT, LON, muestra['AZ'],
+                                       muestra['INC'], muestra['V_inicial'])
+    dic_tie = tiempos_lanzamiento(t0, retardos, gastos=muestra['GASTOS'],
+                                  masas=muestra['MASAS'],
+                                  estructuras=muestra['ESTRUCTURAS'],
+                                  programa_alfa=programa_alfa)
+    informe = {}
+    try:
+        lanzamiento(muestra['MASAS'], muestra['ESTRUCTURAS'],
+                    muestra['GASTOS'], muestra['ISPS'], x0, v0,
+                    muestra['INC'], retardos, diccionario_tiempo=dic_tie,
+                    step_size=step_size, alt_maxima=Zmax, perdidas=True,
+                    rtol=rtol, informe=informe, kepler=kepler)
+    except ValorInadmisibleError:
+        return nan, nan, nan, nan
+    if 'inyeccion' not in informe:
+        return nan, nan, nan, nan
+    inyeccion = informe['inyeccion']
+    return (inyeccion['altitud'], inyeccion['velocidad'],
+            inyeccion['gamma'], inyeccion['vloss'])
+
+
+def montecarlo(tabla, procesos=None, chunksize=None, step_size=DT,
+               rtol=None, kepler=None):
+    '''
+    Integra los lanzamientos de todas las muestras de <tabla> repartiéndolos
+    entre <procesos> procesos. Devuelve un array estructurado de tipo
+    TIPO_RESULTADO con una fila por muestra.
+
+    tabla : array estructurado
+        Muestras de tipo TIPO_MUESTRA (ver muestras()).
+
+    procesos : int
+        Número de procesos. Si procesos=None se usan todos los núcleos.
+
+    chunksize : int
+        Número de muestras que se envían a la vez a cada proceso. Si
+        chunksize=None se reparten en unos cuatro bloques por proceso.
+
+    step_size, rtol, kepler : float
+        Parámetros de la integración (ver caso()).
+    '''
+    if procesos is None:
+        procesos = cpu_count() or 1
+    if chunksize is None:
+        chunksize = max(1, len(tabla) // (4 * procesos))
+    resultados = full(len(tabla), nan, dtype=TIPO_RESULTADO)
+    funcion = partial(caso, step_size=step_size, rtol=rtol, kepler=kepler)
+    with ProcessPoolExecutor(max_workers=procesos) as ejecutor:
+        for i, fila in enumerate(ejecutor.map(funcion, tabla,
+                                              chunksize=chunksize)):
+            resultados[i] = fila
+    return resultados
+
+
+def guardar_tabla(nombre, tabla, resultados):
+    '''
+    Escribe en el archivo <nombre> una fila por muestra con los parámetros
+    perturbados y los valores de inyección.
+    '''
+    columnas = []
+    for campo, tipo, *forma in TIPO_MUESTRA:
+        if forma:
+            columnas += [campo + '_' + str(i + 1) for i in range(forma[0])]
+        else:
+            columnas.append(campo)
+    columnas += [campo for campo, tipo in TIPO_RESULTADO]
+    with open(nombre, 'w') as archivo:
+        archivo.write('\t'.join(format(col, '^14') for col in columnas))
+        for muestra, resultado in zip(tabla, resultados):
+            valores = []
+            for campo, tipo, *forma in TIPO_MUESTRA:
+                valores += list(muestra[campo]) if forma else [muestra[campo]]
+            valores += list(resultado)
+            archivo.write('\n' + '\t'.join(format(val, '^14.6g')
+                                           for val in valores))
+
+
+if __name__ == '__main__':
+    NUM = 100  # Número de muestras
+    NOM = 'Lanzamiento_REOS_Dispersion'
+
+    TIME = time()
+    TABLA = muestras(NUM, semilla=0)
+    RESULTADOS = montecarlo(TABLA, kepler=Q_KEPLER)
+    guardar_tabla(NOM, TABLA, RESULTADOS)
+
+    print('Muestras: {0} ({1} sin inyección)'
+          .format(NUM, int(isnan(RESULTADOS['gam_iny']).sum())))
+    for campo, unidad in zip(('altitud', 'velocidad', 'gam_iny', 'vloss'),
+                             ('m', 'm/s', 'deg', 'm/s')):
+        print('{0}:\t{1:12.3f} +- {2:.3f} {3}'
+              .format(campo, nanmean(RESULTADOS[campo]),
+                      nanstd(RESULTADOS[campo]), unidad))
+    print('\nTiempo de ejecución: ' + format(time() - TIME, '.4f') + ' s')
@@ -0,0 +1,373 @@
+# -*- coding: utf-8 -*-
+"""
+@author: Team REOS
+
+Módulo que contiene la optimización de la trayectoria de lanzamiento. Los
+parámetros son los retardos de encendido de las etapas y el programa del
+ángulo de ataque de la primera etapa (mecanica.ProgramaAlfa), y se maximiza
+la velocidad de inyección o la carga de pago con la restricción
+|gam_iny| <= GAMMA_INY_MIN.
+
+Los gradientes del objetivo y del ángulo de inyección se calculan por
+diferencias finitas hacia delante, integrando a la vez, en varios procesos,
+el lanzamiento nominal y uno perturbado por cada parámetro. Cada iteración
+combina un paso de Newton sobre la restricción con un paso de ascenso en
+la dirección del gradiente proyectado sobre ella, cuya longitud se elige
+entre varios candidatos que también se integran en paralelo (con una región
+de confianza que se amplía o se reduce según el candidato elegido). El
+paso de Newton modifica solo el retardo de la última etapa, y los
+candidatos que quedan fuera de la banda de la restricción se devuelven a
+ella corrigiendo ese retardo con el método de la secante antes de
+compararlos. La optimización converge cuando el punto es factible
+y el gradiente proyectado (tangente a la restricción y a los límites
+activos) es pequeño frente al gradiente del objetivo.
+"""
+
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from math import exp
+from os import cpu_count
+from time import time
+
+import numpy as np
+
+from inputs_iniciales import RETARDOS_IN, GAMMA_INY_MIN, N_ETAPAS
+from mecanica import ProgramaAlfa, G0
+from montecarlo import muestras, caso, TIPO_RESULTADO
+from modulos.atmosfera.gravedad import vel_orbital
+from integracion import DT, Q_KEPLER
+from errores import ValorInadmisibleError, ConvergenciaError
+
+PROGRAMA_NOMINAL = ProgramaAlfa(2.5, 2.5)  # Equivale a la ley fija (deg)
+NOMBRES = (['retardo_' + str(i + 1) for i in range(N_ETAPAS)]
+           + list(ProgramaAlfa._fields))
+# Salto de las diferencias finitas, escala de los parámetros y límites
+PASOS = np.array([.5] * N_ETAPAS + [.02] * 2)  # s, deg
+ESCALAS = np.array([10.] * N_ETAPAS + [1.] * 2)  # s, deg
+MINIMOS = np.array([0.] * N_ETAPAS + [-10.] * 2)
+MAXIMOS = np.array([np.inf] * N_ETAPAS + [10.] * 2)
+RADIO_INICIAL = .5  # Radio inicial de la región de confianza (escalado)
+RADIO_MINIMO = 1e-2  # Radio por debajo del cual se detiene la búsqueda
+TOL_GRADIENTE = 1e-2  # Norma relativa del gradiente proyectado
+N_RESTAURACIONES = 3  # Correcciones del último retardo por candidato
+FRACCIONES = (0., .5, 1., 2.)  # Longitudes candidatas (fracción del radio)
+MAX_ITERACIONES = 20  # Número máximo de iteraciones
+OBJETIVOS = ('velocidad', 'carga_pago')
+
+
+class ResultadoTrayectoria(namedtuple('ResultadoTrayectoria',
+                                      ['retardos', 'programa', 'objetivo',
+                                       'inyeccion', 'convergido',
+                                       'iteraciones', 'simulaciones',
+                                       'historial'])):
+    '''
+    Resultado de la optimización de la trayectoria.
+
+    Atributos
+    ---------
+    retardos : array
+        Retardos de encendido de cada etapa (s).
+
+    programa : ProgramaAlfa
+        Programa del ángulo de ataque de la primera etapa.
+
+    objetivo : float
+        Valor del objetivo (velocidad de inyección en m/s o carga de pago
+        en kg).
+
+    inyeccion : array estructurado
+        Estado de inyección, de tipo montecarlo.TIPO_RESULTADO.
+
+    convergido : bool
+        Indica si se cumple la restricción y la norma del gradiente
+        proyectado es menor que TOL_GRADIENTE veces la del gradiente del
+        objetivo. Si la región de confianza se reduce por debajo de
+        RADIO_MINIMO sin cumplirse, la búsqueda se detiene sin converger.
+
+    iteraciones, simulaciones : int
+        Número de iteraciones y de lanzamientos integrados.
+
+    historial : list
+        Tuplas (parámetros, objetivo, gam_iny) de los puntos aceptados.
+    '''
+    __slots__ = ()
+
+
+def simular(parametros, muestra, step_size=DT, rtol=None, kepler=Q_KEPLER):
+    '''
+    Integra el lanzamiento de la muestra <muestra> (montecarlo.TIPO_MUESTRA)
+    con los retardos y el programa del ángulo de ataque del vector
+    <parametros> (ver NOMBRES) y devuelve el estado de inyección (ver
+    montecarlo.caso()).
+    '''
+    muestra = muestra.copy()
+    muestra['RETARDOS_IN'] = parametros[:N_ETAPAS]
+    return caso(muestra, step_size=step_size, rtol=rtol, kepler=kepler,
+                programa_alfa=ProgramaAlfa(*parametros[N_ETAPAS:]))
+
+
+def valor_objetivo(fila, muestra, objetivo):
+    '''
+    Valor del objetivo <objetivo> para el estado de inyección <fila> de la
+    muestra <muestra>:
+
+        'velocidad': velocidad de inyección (m/s).
+        'carga_pago': carga de pago (kg) con la que la última etapa
+            llegaría justo a la velocidad orbital circular de la altitud de
+            inyección, a partir del margen de velocidad sobre ella (la masa
+            de carga de pago que se añade o se quita no modifica la
+            trayectoria de las etapas anteriores).
+    '''
+    if objetivo == 'velocidad':
+        return float(fila['velocidad'])
+    margen = float(fila['velocidad'] - vel_orbital(fila['altitud']))
+    masas = muestra['MASAS']
+    # Masas de la última etapa al encenderla (a) y al apagarla (b), y razón
+    # de masas k que consume el margen
+    a = masas[-2] + masas[-1]
+    b = masas[-2] * muestra['ESTRUCTURAS'][-1] + masas[-1]
+    k = a / b * exp(-margen / (G0 * muestra['ISPS'][-1]))
+    return float(masas[-1] + (k * b - a) / (1 - k))
+
+
+def optimizar_trayectoria(retardos=RETARDOS_IN, programa=PROGRAMA_NOMINAL,
+                          objetivo='velocidad', activos=None,
+                          tol_gamma=GAMMA_INY_MIN,
+                          max_iteraciones=MAX_ITERACIONES, procesos=None,
+                          muestra=None, step_size=DT, rtol=None,
+                          kepler=Q_KEPLER, imprimir=True):
+    '''
+    Maximiza el objetivo <objetivo> respecto de los retardos de encendido y
+    del programa del ángulo de ataque con la restricción
+    |gam_iny| <= tol_gamma. Devuelve un objeto ResultadoTrayectoria.
+
+    retardos : array
+        Retardos iniciales de encendido de cada etapa (s). Por defecto es
+        retardos=RETARDOS_IN.
+
+    programa : ProgramaAlfa
+        Programa inicial del ángulo de ataque. Por defecto es
+        programa=PROGRAMA_NOMINAL (equivalente a la ley fija).
+
+    objetivo : string
+        'velocidad' o 'carga_pago' (ver valor_objetivo()). Por defecto es
+        objetivo='velocidad'.
+
+    activos : array de bool
+        Parámetros que se optimizan (ver NOMBRES). Si activos=None, se
+        optimizan los retardos no nulos y el programa del ángulo de ataque.
+
+    tol_gamma : float
+        Valor máximo de |gam_iny| (deg). Por defecto es
+        tol_gamma=GAMMA_INY_MIN.
+
+    max_iteraciones : int
+        Número máximo de iteraciones. Por defecto es
+        max_iteraciones=MAX_ITERACIONES.
+
+    procesos : int
+        Número de procesos. Si procesos=None se usan todos los núcleos.
+
+    muestra : array estructurado
+        Resto de parámetros del lanzamiento (montecarlo.TIPO_MUESTRA). Si
+        muestra=None, se emplean los de inputs_iniciales.
+
+    step_size, rtol, kepler : float
+        Parámetros de la integración (ver montecarlo.caso()). Las
+        diferencias finitas requieren que el resultado varíe de forma suave
+        con los parámetros, por lo que conviene integrar con paso fijo.
+
+    imprimir : bool
+        Indica si se imprime el avance de cada iteración. Por defecto es
+        imprimir=True.
+    '''
+    if objetivo not in OBJETIVOS:
+        raise ValueError('El objetivo ha de ser uno de: '
+                         + ', '.join(OBJETIVOS) + '.')
+    if muestra is None:
+        muestra = muestras(1, dispersion={})[0]
+    x = np.append(np.asarray(retardos, dtype=float), programa)
+    if activos is None:
+        activos = np.append(x[:N_ETAPAS] != 0, [True, True])
+    indices = np.flatnonzero(activos)
+    if procesos is None:
+        procesos = cpu_count() or 1
+    funcion = partial(simular, muestra=muestra, step_size=step_size,
+                      rtol=rtol, kepler=kepler)
+    evaluados = {}
+
+    def evaluar(puntos, base=True):
+        # Estados de inyección de los puntos, integrando en paralelo los
+        # que no se han evaluado antes. Los puntos que no llegan a la
+        # inyección son infactibles (objetivo -inf y |gam_iny| inf); solo
+        # se produce un error si es el primero y base=True (el punto
+        # actual de la optimización).
+        nuevos = [p for p in {tuple(p): p for p in puntos}.values()
+                  if tuple(p) not in evaluados]
+        for p, fila in zip(nuevos, ejecutor.map(funcion, nuevos)):
+            evaluados[tuple(p)] = np.array(fila, dtype=TIPO_RESULTADO)[()]
+        filas = [evaluados[tuple(p)] for p in puntos]
+        if base and np.isnan(filas[0]['gam_iny']):
+            raise ValorInadmisibleError(dict(parametros=puntos[0]), '',
+                                        'tal que el lanzador llegue a la '
+                                        'inyección')
+        valores, gammas = [], []
+        for fila in filas:
+            if np.isnan(fila['gam_iny']):
+                valores.append(-np.inf)
+                gammas.append(np.inf)
+            else:
+                valores.append(valor_objetivo(fila, muestra, objetivo))
+                gammas.append(float(fila['gam_iny']))
+        return valores, gammas, filas
+
+    def acotar(z):
+        return np.clip(z, MINIMOS / ESCALAS, MAXIMOS / ESCALAS)
+
+    def restaurar(candidatos, valores, gammas, filas, pendiente):
+        # Corrige el retardo de la última etapa de los candidatos que llegan
+        # a la inyección fuera de la banda de la restricción. El primer
+        # salto usa la derivada <pendiente> (deg/s) del punto actual y los
+        # siguientes la secante entre las dos últimas correcciones.
+        u = N_ETAPAS - 1
+        pendientes = [pendiente] * len(candidatos)
+        for _ in range(N_RESTAURACIONES):
+            fuera = [k for k, g in enumerate(gammas)
+                     if tol_gamma < abs(g) < np.inf and pendientes[k] != 0]
+            if not fuera:
+                break
+            nuevos = []
+            for k in fuera:
+                c = candidatos[k].copy()
+                c[u] = np.clip(c[u] - gammas[k] / pendientes[k], MINIMOS[u],
+                               MAXIMOS[u])
+                nuevos.append(c)
+            for k, c, valor, gamma, fila in zip(fuera, nuevos,
+                                                *evaluar(nuevos, base=False)):
+                if not np.isfinite(gamma) or c[u] == candidatos[k][u]:
+                    pendientes[k] = 0
+                    continue
+                pendientes[k] = (gamma - gammas[k]) / (c[u] - candidatos[k][u])
+                candidatos[k], valores[k] = c, valor
+                gammas[k], filas[k] = gamma, fila
+
+    radio = RADIO_INICIAL
+    historial = []
+    convergido = False
+    with ProcessPoolExecutor(max_workers=procesos) as ejecutor:
+        for iteracion in range(1, max_iteraciones + 1):
+            # Gradientes por diferencias finitas (en variables escaladas)
+            puntos = [x] + [x + PASOS[i] * (np.arange(len(x)) == i)
+                            for i in indices]
+            valores, gammas, filas = evaluar(puntos)
+            j_0, g_0, fila_0 = valores[0], gammas[0], filas[0]
+            if not historial:
+                historial.append((x, j_0, g_0))
+            d_j = np.zeros(len(x))
+            d_g = np.zeros(len(x))
+            d_j[indices] = ((np.array(valores[1:]) - j_0)
+                            / PASOS[indices] * ESCALAS[indices])
+            d_g[indices] = ((np.array(gammas[1:]) - g_0)
+                            / PASOS[indices] * ESCALAS[indices])
+            # Los parámetros cuyo punto perturbado no llega a la inyección
+            # no se modifican en esta iteración.
+            sin_inyeccion = ~(np.isfinite(d_j) & np.isfinite(d_g))
+            d_j[sin_inyeccion] = 0
+            d_g[sin_inyeccion] = 0
+
+            # Gradiente del objetivo proyectado sobre la restricción. Los
+            # parámetros en un límite hacia el que apunta la proyección se
+            # fijan y se vuelve a proyectar.
+            libres = np.ones(len(x), dtype=bool)
+            while True:
+                norma_g = np.dot(d_g * libres, d_g * libres)
+                if norma_g == 0:
+                    raise ConvergenciaError('optimizar_trayectoria',
+                                            len(evaluados), 'el ángulo de '
+                                            'inyección no depende de los '
+                                            'parámetros libres')
+                tangente = (d_j - np.dot(d_j * libres, d_g) / norma_g
+                            * d_g) * libres
+                bloqueados = libres & (((x <= MINIMOS) & (tangente < 0))
+                                       | ((x >= MAXIMOS) & (tangente > 0)))
+                if not bloqueados.any():
+                    break
+                libres &= ~bloqueados
+            proyectado = np.linalg.norm(tangente) / max(np.linalg.norm(d_j),
+                                                        np.finfo(float).tiny)
+            if imprimir:
+                print('Iteración {0}: objetivo {1:.4f}, gam_iny {2:.4f} deg, '
+                      'gradiente proyectado {3:.3g}, radio {4:.3g}, '
+                      'parámetros {5}'
+                      .format(iteracion, j_0, g_0, proyectado, radio,
+                              np.array2string(x, precision=3)))
+            factible = abs(g_0) <= tol_gamma
+            if factible and proyectado <= TOL_GRADIENTE:
+                convergido = True
+                break
+            if radio < RADIO_MINIMO:
+                break
+
+            # Paso de Newton sobre la restricción (con el retardo de la
+            # última etapa si se optimiza) más paso de ascenso en la
+            # dirección del gradiente proyectado sobre ella
+            u = N_ETAPAS - 1
+            if libres[u] and d_g[u] != 0 and u in indices:
+                restauracion = -g_0 / d_g[u] * (np.arange(len(x)) == u)
+            else:
+                restauracion = -g_0 * d_g * libres / norma_g
+            if np.any(tangente):
+                tangente = tangente / np.linalg.norm(tangente)
+            z = x / ESCALAS
+            candidatos = [acotar(z + restauracion + f * radio * tangente)
+                          * ESCALAS for f in FRACCIONES]
+            valores, gammas, filas = evaluar(candidatos, base=False)
+            if u in indices:
+                restaurar(candidatos, valores, gammas, filas,
+                          d_g[u] / ESCALAS[u])
+
+            # Se elige el mejor candidato factible; si no hay ninguno, el
+            # que más se acerca a la restricción.
+            factibles = [k for k, g in enumerate(gammas)
+                         if abs(g) <= tol_gamma]
+            if factibles:
+                k = max(factibles, key=lambda k: valores[k])
+                mejora = not factible or valores[k] > j_0
+            else:
+                k = min(range(len(gammas)), key=lambda k: abs(gammas[k]))
+                mejora = not factible and abs(gammas[k]) < abs(g_0)
+            if mejora:
+                x = candidatos[k]
+                historial.append((x, valores[k], gammas[k]))
+                if FRACCIONES[k] == max(FRACCIONES):
+                    radio *= 2
+                elif FRACCIONES[k] == 0:
+                    radio /= 2
+            else:
+                radio /= 2
+        else:
+            # Último punto aceptado
+            valores, gammas, filas = evaluar([x])
+            j_0, g_0, fila_0 = valores[0], gammas[0], filas[0]
+    return ResultadoTrayectoria(x[:N_ETAPAS], ProgramaAlfa(*x[N_ETAPAS:]),
+                                j_0, fila_0, convergido, iteracion,
+                                len(evaluados), historial)
+
+
+if __name__ == '__main__':
+    TIME = time()
+    RESULTADO = optimizar_trayectoria(objetivo='carga_pago')
+    print('\nRetardos: {0} s'.format(RESULTADO.retardos))
+    print('Programa de alfa: {0:.3f} deg en el encendido, {1:.3f} deg en el '
+          'apagado'.format(*RESULTADO.programa))
+    print('Objetivo: {0:.4f} ({1})'.format(RESULTADO.objetivo,
+                                          'convergido' if RESULTADO.convergido
+                                          else 'sin converger'))
+    print('Inyección: altitud {0:.1f} km, velocidad {1:.1f} m/s, gamma '
+          '{2:.4f} deg'.format(RESULTADO.inyeccion['altitud'] / 1000,
+                               RESULTADO.inyeccion['velocidad'],
+                               RESULTADO.inyeccion['gam_iny']))
+    print('{0} iteraciones, {1} lanzamientos integrados'
+          .format(RESULTADO.iteraciones, RESULTADO.simulaciones))
+    print('\nTiempo de ejecución: ' + format(time() - TIME, '.4f') + ' s')
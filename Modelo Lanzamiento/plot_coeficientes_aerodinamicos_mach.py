@@ -5,6 +5,7 @@ Created on Mon Nov 26 12:28:38 2018
 @author: Team REOS
 """
 from math import radians
+from numpy import arange
 import matplotlib.pyplot as plt
 from modulos.aerodinamica.aero_misil import CoeficienteFuerza
 from mecanica import altitud
@@ -13,14 +14,8 @@ from apoyo import condiciones_iniciales
 
 t0, x0, v0 = condiciones_iniciales(Z0, LAT, LON, AZ, INC, V_inicial)
 alt = altitud(x0)
-mach=0.01
 x_cdg=3
 
-mach_lanzador=[]
-cd_lanzador=[]
-cn_lanzador=[]
-cm_lanzador=[]
-
 coef_fuerzas=CoeficienteFuerza()
 coef_fuerzas.set_alpha(radians(5))
 coef_fuerzas.set_delta(radians(0))
@@ -28,12 +23,11 @@ coef_fuerzas.set_propulsion(prop=True)
 coef_fuerzas.set_ala(ala=True)
 coef_fuerzas.set_aletas(aletas=True)
 
-while mach<5:
-    mach_lanzador.append(mach)
-    cd_lanzador.append(coef_fuerzas.cd_total(mach, alt))
-    cn_lanzador.append(coef_fuerzas.cn_total(mach))
-    cm_lanzador.append(coef_fuerzas.cm_total(mach,x_cdg))
-    mach += 0.01
+# Barrido en Mach con las versiones vectorizadas de los coeficientes
+mach_lanzador=arange(0.01, 5, 0.01)
+cd_lanzador=coef_fuerzas.cd_total_vectorizado(mach_lanzador, alt)
+cn_lanzador=coef_fuerzas.cn_total_vectorizado(mach_lanzador)
+cm_lanzador=coef_fuerzas.cm_total_vectorizado(mach_lanzador, x_cdg)
     
 #### Gráficas ####
     
@@ -5,54 +5,74 @@ Created on Mon Nov 26 08:29:07 2018
 @author: Team REOS
 """
 
+from numpy import loadtxt, load, where, searchsorted, arange
 import matplotlib.pyplot as plt
 from inputs_iniciales import GASTOS
+from modulos.registro import (RegistroTrayectoria, TIPO_REGISTRO,
+                              cargar_registro)
+
+
+def cargar_datos(nombre_archivo):
+    '''
+    Lee de una sola pasada los datos de un lanzamiento y los devuelve como
+    un array estructurado de tipo modulos.registro.TIPO_REGISTRO (los
+    archivos de texto no tienen los campos cd y cn).
+
+    nombre_archivo : string u object
+        Archivo de texto escrito por lanzamiento() (imprimir), archivo
+        binario .npy o .npz escrito por RegistroTrayectoria.guardar() (el
+        .npy se proyecta en memoria sin leerlo) u objeto
+        RegistroTrayectoria.
+    '''
+    if isinstance(nombre_archivo, RegistroTrayectoria):
+        return nombre_archivo.datos
+    if nombre_archivo.endswith('.npy'):
+        return load(nombre_archivo, mmap_mode='r')
+    if nombre_archivo.endswith('.npz'):
+        return cargar_registro(nombre_archivo).datos
+    # La etapa se escribe con decimales y la propulsión como 'On'/'Off'.
+    return loadtxt(nombre_archivo, skiprows=1, dtype=TIPO_REGISTRO[:9],
+                   converters={7: lambda s: int(float(s)),
+                               8: lambda s: s == 'On'},
+                   encoding='latin-1')
+
+
+def indice_etapas(datos, num_etapas):
+    '''
+    Ordena los datos por tramos (0: vuelo sin propulsión; i: etapa i
+    propulsada) conservando el orden temporal dentro de cada tramo.
+    Devuelve los datos ordenados (un diccionario de arrays por campo) y la
+    lista de objetos slice de cada tramo, de modo que la serie de un tramo
+    es una vista sin copia.
+
+    datos : array estructurado
+        Datos del lanzamiento (ver cargar_datos()).
+
+    num_etapas : int
+        Número de etapas.
+    '''
+    tramo = where(datos['propulsion'], datos['etapa'], 0)
+    orden = tramo.argsort(kind='stable')
+    limites = searchsorted(tramo[orden], arange(num_etapas + 2))
+    ordenados = {campo: datos[campo][orden] for campo in datos.dtype.names}
+    return ordenados, [slice(limites[i], limites[i + 1])
+                       for i in range(num_etapas + 1)]
 
 
 def plot_graficas(nombre_archivo):
 
-    # Definición de los vectores
-    
-    def desglose_etapas(variable, j): # La variable j indica la columna a leer en la hoja de datos  
-        
-        diccionario = {}
-        paso_temporal = []
-        paso_variable = []
-        
-        for i in range(len(GASTOS)+1):
-            
-            Lanzamiento = open(nombre_archivo, "r") # Lectura del archivo 
-            HEAD = Lanzamiento.readline() # Lectura de la primera línea
-            nom = variable + str(i)
-
-            for line in Lanzamiento:
-                s = line.strip() # Divide el string principal en strings por líneas
-                s = s.split() # Elimina los espacios
-                
-                if i == 0 and s[8] == 'Off':
-                    
-                    paso_temporal.append(float(s[0]))
-                    paso_variable.append(float(s[j]))  
-                
-                if i == float(s[7]) and s[8] == 'On':
-                    
-                    paso_temporal.append(float(s[0]))
-                    paso_variable.append(float(s[j]))            
-                    
-                etapa = [paso_temporal, paso_variable]
-                diccionario.update({nom:etapa})               
-                
-            Lanzamiento.close()
-            diccionario.update({nom:etapa})
-    
-            paso_temporal = []
-            paso_variable = []
-            
-        return diccionario
+    # Definición de los vectores: los datos se leen e indexan una sola vez.
+    datos, tramos = indice_etapas(cargar_datos(nombre_archivo), len(GASTOS))
+
+    def desglose_etapas(variable, campo):  # campo: columna de los datos
+
+        return {variable + str(i): [datos['tiempo'][tramo],
+                                    datos[campo][tramo]]
+                for i, tramo in enumerate(tramos)}
 
     ############## GRÁFICAS #############
     
-    dicc_altura = desglose_etapas('Altura_', 1)
+    dicc_altura = desglose_etapas('Altura_', 'altitud')
     
     Retardos_altura=dicc_altura['Altura_0']
     Altura_1=dicc_altura['Altura_1']
@@ -74,7 +94,7 @@ def plot_graficas(nombre_archivo):
     plt.show()
     
     
-    dicc_velocidad = desglose_etapas('Velocidad_', 2)
+    dicc_velocidad = desglose_etapas('Velocidad_', 'velocidad')
     
     Retardos_vel=dicc_velocidad['Velocidad_0']
     Velocidad_1=dicc_velocidad['Velocidad_1']
@@ -96,7 +116,7 @@ def plot_graficas(nombre_archivo):
     plt.show()
  
     
-    dicc_masa = desglose_etapas('Masa_', 3)
+    dicc_masa = desglose_etapas('Masa_', 'masa')
     
     Retardos_mas=dicc_masa['Masa_0']
     Masa_1=dicc_masa['Masa_1']
@@ -118,7 +138,7 @@ def plot_graficas(nombre_archivo):
     plt.show()
 
 
-    dicc_gamma = desglose_etapas('Gamma_', 4)
+    dicc_gamma = desglose_etapas('Gamma_', 'gamma')
     
     Retardos_gamma=dicc_gamma['Gamma_0']
     Gamma_1=dicc_gamma['Gamma_1']
@@ -140,7 +160,7 @@ def plot_graficas(nombre_archivo):
     plt.show()
 
 
-#    dicc_alfa = desglose_etapas('Alfa_', 5)
+#    dicc_alfa = desglose_etapas('Alfa_', 'alfa')
 #    
 #    Retardos=dicc_alfa['Alfa_0']
 #    Alfa_1=dicc_alfa['Alfa_1']
@@ -6,7 +6,6 @@ Created on Tue Jul 31 08:20:44 2018
 """
 
 from time import time
-from numpy import sign, log
 from numpy.linalg import norm
 from inputs_iniciales import LAT, LON, AZ, Z0, INC, V_inicial, Zmax
 from inputs_iniciales import GASTOS, MASAS, ISPS, ESTRUCTURAS, RETARDOS_IN
@@ -14,7 +13,9 @@ from inputs_iniciales import GAMMA_INY_MIN
 from modulos.atmosfera.gravedad import vel_orbital, RT
 from modulos.tiempo.division_temporal import tiempos_lanzamiento
 from apoyo import condiciones_iniciales
-from integracion import lanzamiento, DT
+from integracion import lanzamiento, DT, CacheLanzamiento, Q_KEPLER
+from modulos.busqueda_raiz import resolver
+from modulos.registro import RegistroTrayectoria
 from plots_lanzamiento import plot_graficas
 from plots_coeficientes_aerodinamicos import plot_coeficientes_aerodinamicos
 import matplotlib.pyplot as plt
@@ -23,6 +24,9 @@ plt.close('all')
 
 TIME = time()
 NOM = 'Lanzamiento_REOS_Datos'
+RTOL = None  # Tolerancia del integrador adaptativo (None: paso fijo DT)
+KEPLER = Q_KEPLER  # Presión dinámica de la propagación kepleriana (None: se integra)
+TEXTO = True  # Escribe también los archivos de texto de resultados
 MASA_TOTAL = float(sum(MASAS))
 V0 = V_inicial
 string_masa = 'Masa del lanzador por etapas'
@@ -36,40 +40,69 @@ for i, masa in enumerate(MASAS):
 print('Masa Total:\t{0:6.2f} kg'.format(MASA_TOTAL))
 print('\nVelocidad inicial del lanzador: {0:.2f} m/s'.format(V0))
 
-# Condiciones que cambiarán en el bucle.
-gamma_inyec = -1
+# Búsqueda del retardo de encendido de la tercera (última) etapa (retardos[2])
+# que anula el ángulo de inyección.
+METODO = 'brent'  # Método de búsqueda: 'secante', 'brent' o 'illinois'
+PASO = -5.  # Salto inicial del retardo (s)
 retardos = RETARDOS_IN
+cache = CacheLanzamiento()  # Estados de las etapas que no cambian
+t0, x0, v0 = condiciones_iniciales(Z0, LAT, LON, AZ, INC, V0)
+iteracion = [0]
+
+
+def gamma_inyeccion(retardo):
+    '''
+    Ángulo de inyección (deg) del lanzamiento con retardos[2] = <retardo>.
+    Como solo cambia retardos[2], cada evaluación se reanuda desde los
+    estados guardados en la cache.
+    '''
+    iteracion[0] += 1
+    retardos[2] = retardo
+    print('\nIteración {0}\n------------'.format(iteracion[0]))
+    print('RETARDOS: {0}'.format(retardos))
+    dic_tie = tiempos_lanzamiento(t0, retardos)  # Diccionario que divide el lanzamiento
+    informe = {}  # Pasos y evaluaciones de la integración
+    gamma_inyec = lanzamiento(MASAS, ESTRUCTURAS, GASTOS, ISPS, x0, v0, INC,
+                              retardos, diccionario_tiempo=dic_tie,
+                              step_size=DT, alt_maxima=Zmax, perdidas=True,
+                              rtol=RTOL, informe=informe, cache=cache,
+                              kepler=KEPLER)[5]
+    print('Ángulo de inyección: ' + format(gamma_inyec, '.4f') + ' deg')
+    print('Pasos de integración: {0} ({1} rechazados, {2} evaluaciones)'
+          .format(informe['pasos'], informe['rechazados'],
+                  informe['evaluaciones']))
+    return gamma_inyec
+
 
 # COMIENZA LA SIMULACIÓN DE LANZAMIENTO.
 # --------------------------------------
-i = 1
-while abs(gamma_inyec) > GAMMA_INY_MIN:
-    print('\nIteración {0}\n------------'.format(i))
-    print('RETARDOS: {0}'.format(retardos))
-    t0, x0, v0 = condiciones_iniciales(Z0, LAT, LON, AZ, INC, V0)
-    DIC_TIE = tiempos_lanzamiento(t0, retardos)  # Diccionario que divide el lanzamiento
+resultado = resolver(gamma_inyeccion, retardos[2], PASO, metodo=METODO,
+                     tol_f=GAMMA_INY_MIN, minimo=0)
+print('\n' + resultado.informe())
+retardos[2] = resultado.raiz
 
-    m, t, x, v, gamma, gamma_inyec, vloss = lanzamiento(MASAS, ESTRUCTURAS, GASTOS,
-                                                        ISPS, x0, v0, INC,
-                                                        retardos,
-                                                        diccionario_tiempo=DIC_TIE,
-                                                        step_size=DT,
-                                                        alt_maxima=Zmax,
-                                                        perdidas=True,
-                                                        imprimir=NOM)
-    if abs(gamma_inyec) > 0.1:
-        retardos[2] = round((retardos[2] + sign(gamma_inyec)*log(abs(gamma_inyec) + 1)/log(1.1)), 2)
-    else:
-        retardos[2] = round((retardos[2] + sign(gamma_inyec)*(10*gamma_inyec)**2), 2)
-        
-    print('Ángulo de inyección: ' + format(gamma_inyec, '.2f') + ' deg')
-    i += 1
+# Lanzamiento final con el retardo encontrado, registrando la trayectoria.
+DIC_TIE = tiempos_lanzamiento(t0, retardos)
+registro = RegistroTrayectoria()
+m, t, x, v, gamma, gamma_inyec, vloss = lanzamiento(MASAS, ESTRUCTURAS, GASTOS,
+                                                    ISPS, x0, v0, INC,
+                                                    retardos,
+                                                    diccionario_tiempo=DIC_TIE,
+                                                    step_size=DT,
+                                                    alt_maxima=Zmax,
+                                                    perdidas=True,
+                                                    imprimir=NOM if TEXTO else False,
+                                                    rtol=RTOL,
+                                                    kepler=KEPLER,
+                                                    registro=registro)
+registro.guardar(NOM + '.npy')
 print('\nVelocidad final: '
       + format(norm(v) / vel_orbital(norm(x) - RT), '.3%')
       + ' de la velocidad orbital')
 print('Altitud final: ' + format((norm(x) - RT) / 1000, '.3f') + ' km')
 
-plot_graficas(NOM)
-plot_coeficientes_aerodinamicos('caracteristicas_aerodinamicas')
+plot_graficas(registro)
+if TEXTO:
+    plot_coeficientes_aerodinamicos('caracteristicas_aerodinamicas')
 
 print('\nTiempo de ejecución: ' + format(time() - TIME, '.4f') + ' s')
@@ -0,0 +1,377 @@
+# -*- coding: utf-8 -*-
+"""
+@author: Team REOS
+
+Optimización de etapas en lazo cerrado con el modelo de lanzamiento. En
+lugar de suponer unas pérdidas de velocidad fijas (V_perdidas en
+optimizador_etapas.py), se dimensionan las etapas con una estimación de las
+pérdidas, se integra el lanzamiento del lanzador resultante y se corrige la
+estimación con las pérdidas simuladas (vloss) hasta que ambas coinciden.
+
+En cada iteración se integran varios candidatos alrededor de la estimación
+actual repartidos entre varios procesos, y la nueva estimación es la raíz
+del ajuste lineal de vloss - V_perdidas sobre los candidatos. Como en
+simulador_trayectorias.py, en cada candidato se busca el retardo de
+encendido de la última etapa que anula el ángulo de inyección, de modo que
+solo se comparan las pérdidas de trayectorias que inyectan. Los
+resultados de las integraciones se guardan en disco (CacheSimulaciones)
+bajo un hash de los parámetros del lanzador, de modo que repetir o
+reanudar una optimización no vuelve a integrar los lanzadores ya vistos.
+"""
+
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from hashlib import sha1
+from os import cpu_count, replace
+from os.path import exists
+from time import time
+
+import numpy as np
+
+from inputs_iniciales import (ISPS, ESTRUCTURAS, MASA_TOTAL, V_inicial,
+                              LAT, LON, Zmax, GAMMA_INY_MIN)
+from montecarlo import muestras, TIPO_RESULTADO
+from modulos.tiempo.division_temporal import T_COMBUSTION, tiempos_lanzamiento
+from modulos.busqueda_raiz import resolver
+from apoyo import condiciones_iniciales
+from integracion import lanzamiento, CacheLanzamiento, DT, Q_KEPLER
+from errores import ValorInadmisibleError, ConvergenciaError
+from reparto_etapas import (velocidad_inyeccion, reparto_etapas,
+                            ALTITUD_ORBITA, V_PERDIDAS)
+
+ARCHIVO_CACHE = 'cache_lazo_cerrado.npz'  # Archivo de la cache persistente
+TOL_PERDIDAS = 1.  # Tolerancia en las pérdidas (m/s)
+DELTA_PERDIDAS = 25.  # Separación entre candidatos (m/s)
+CANDIDATOS = 2  # Candidatos integrados en cada iteración
+MAX_ITERACIONES = 10  # Número máximo de iteraciones
+PASO_RETARDO = -5.  # Salto inicial del retardo de la última etapa (s)
+# Estado de inyección y retardo de encendido de la última etapa que lo da
+TIPO_INYECCION = TIPO_RESULTADO + [('retardo', float)]
+
+
+class ResultadoLazoCerrado(namedtuple('ResultadoLazoCerrado',
+                                      ['perdidas', 'reparto', 'muestra',
+                                       'inyeccion', 'iteraciones',
+                                       'simulaciones', 'historial'])):
+    '''
+    Resultado de la optimización de etapas en lazo cerrado.
+
+    Atributos
+    ---------
+    perdidas : float
+        Pérdidas de velocidad con las que se dimensionan las etapas (m/s).
+
+    reparto : RepartoEtapas
+        Reparto de masas entre las etapas (ver reparto_etapas.py).
+
+    muestra : array estructurado
+        Parámetros del lanzamiento del lanzador dimensionado, de tipo
+        montecarlo.TIPO_MUESTRA, con el retardo de la última etapa que
+        anula el ángulo de inyección.
+
+    inyeccion : array estructurado
+        Estado de inyección simulado y retardo de encendido de la última
+        etapa con el que se obtiene, de tipo TIPO_INYECCION.
+
+    iteraciones : int
+        Número de iteraciones.
+
+    simulaciones : int
+        Número de candidatos integrados, cada uno con la búsqueda de su
+        retardo (sin contar los que ya estaban en la cache).
+
+    historial : list
+        Tuplas (V_perdidas, vloss) de todos los candidatos evaluados.
+    '''
+    __slots__ = ()
+
+
+class CacheSimulaciones(object):
+    '''
+    Cache persistente de resultados de lanzamientos (estados de inyección
+    de tipo TIPO_INYECCION, ver inyectar()) indexados por
+    clave_simulacion().
+    Solo la modifica el proceso principal; los procesos que integran los
+    lanzamientos devuelven los resultados sin escribir nada.
+
+    Los resultados dependen del modelo de lanzamiento, por lo que el
+    archivo ha de borrarse si cambia algo distinto de los parámetros que
+    forman la clave (la aerodinámica, la atmósfera, la ley de alfa...).
+
+    Parámetros
+    ----------
+    nombre : string
+        Archivo .npz de la cache. Si existe, se cargan sus resultados. Si
+        nombre=None, la cache solo se guarda en memoria. Un archivo con
+        resultados de otro tipo (de una versión anterior) se descarta. Por
+        defecto es nombre=ARCHIVO_CACHE.
+    '''
+    def __init__(self, nombre=ARCHIVO_CACHE):
+        self.nombre = nombre
+        self.resultados = {}
+        if nombre is not None and exists(nombre):
+            with np.load(nombre) as contenido:
+                if contenido['resultados'].dtype != np.dtype(TIPO_INYECCION):
+                    return
+                for clave, fila in zip(contenido['claves'],
+                                       contenido['resultados']):
+                    self.resultados[str(clave)] = fila
+
+    def __len__(self):
+        return len(self.resultados)
+
+    def __contains__(self, clave):
+        return clave in self.resultados
+
+    def __getitem__(self, clave):
+        return self.resultados[clave]
+
+    def guardar(self, nuevos):
+        '''
+        Añade los resultados del diccionario {clave: resultado} <nuevos> y
+        reescribe el archivo (primero en un archivo temporal, de modo que
+        una interrupción no deja el archivo a medias).
+        '''
+        self.resultados.update(nuevos)
+        if self.nombre is None or not nuevos:
+            return
+        claves = list(self.resultados)
+        filas = np.array([tuple(self.resultados[clave]) for clave in claves],
+                         dtype=TIPO_INYECCION)
+        temporal = self.nombre + '.tmp'
+        with open(temporal, 'wb') as archivo:
+            np.savez(archivo, claves=np.array(claves), resultados=filas)
+        replace(temporal, self.nombre)
+
+
+def clave_simulacion(muestra, ajustes):
+    '''
+    Clave de CacheSimulaciones: hash SHA-1 de los parámetros del
+    lanzamiento <muestra> (masas, gastos, impulsos, razones estructurales,
+    retardos y condiciones iniciales, de tipo montecarlo.TIPO_MUESTRA) y de
+    los ajustes <ajustes> (step_size, rtol, kepler, paso) de inyectar().
+    '''
+    huella = sha1(np.ascontiguousarray(muestra).tobytes())
+    huella.update(repr(tuple(ajustes)).encode())
+    return huella.hexdigest()
+
+
+def disenar(perdidas, isps=ISPS, estructuras=ESTRUCTURAS,
+            masa_total=MASA_TOTAL, v_lanzamiento=V_inicial,
+            altitud_orbita=ALTITUD_ORBITA):
+    '''
+    Dimensiona las etapas para las pérdidas <perdidas> (m/s) y devuelve la
+    tupla (reparto, muestra) con el reparto de masas (RepartoEtapas) y los
+    parámetros del lanzamiento correspondiente (montecarlo.TIPO_MUESTRA).
+    Los gastos másicos se ajustan para conservar los tiempos de combustión
+    nominales, de modo que los retardos de encendido siguen teniendo
+    sentido; el resto de los parámetros son los de inputs_iniciales.
+    '''
+    reparto = reparto_etapas(isps, estructuras, masa_total,
+                             velocidad_inyeccion(v_lanzamiento,
+                                                 altitud_orbita, perdidas))
+    muestra = muestras(1, dispersion={})[0]
+    muestra['ISPS'] = isps
+    muestra['ESTRUCTURAS'] = estructuras
+    muestra['MASAS'] = np.append(reparto.masas_etapa, reparto.masa_pago)
+    muestra['GASTOS'] = reparto.masas_propulsante / np.asarray(T_COMBUSTION)
+    muestra['V_inicial'] = v_lanzamiento
+    return reparto, muestra
+
+
+def inyectar(muestra, step_size=DT, rtol=None, kepler=Q_KEPLER,
+             paso=PASO_RETARDO):
+    '''
+    Integra el lanzamiento de <muestra> (montecarlo.TIPO_MUESTRA) buscando,
+    como simulador_trayectorias.py, el retardo de encendido de la última
+    etapa que anula el ángulo de inyección (con la tolerancia
+    GAMMA_INY_MIN). La búsqueda parte del retardo de la muestra con un
+    salto inicial <paso> (s) y solo repite la integración desde la última
+    frontera entre etapas (integracion.CacheLanzamiento). Devuelve la tupla
+    (altitud, velocidad, gam_iny, vloss, retardo) del estado de inyección
+    con el retardo encontrado (TIPO_INYECCION); si no se encuentra, los
+    valores son nan. Los parámetros step_size, rtol y kepler son los de la
+    integración (ver montecarlo.caso()).
+    '''
+    retardos = list(muestra['RETARDOS_IN'])
+    t0, x0, v0 = condiciones_iniciales(muestra['Z0'], LAT, LON, muestra['AZ'],
+                                       muestra['INC'], muestra['V_inicial'])
+    cache = CacheLanzamiento()
+    inyecciones = {}
+
+    def gamma_inyeccion(retardo):
+        retardos[-1] = retardo
+        dic_tie = tiempos_lanzamiento(t0, retardos, gastos=muestra['GASTOS'],
+                                      masas=muestra['MASAS'],
+                                      estructuras=muestra['ESTRUCTURAS'])
+        informe = {}
+        lanzamiento(muestra['MASAS'], muestra['ESTRUCTURAS'],
+                    muestra['GASTOS'], muestra['ISPS'], x0, v0,
+                    muestra['INC'], retardos, diccionario_tiempo=dic_tie,
+                    step_size=step_size, alt_maxima=Zmax, perdidas=True,
+                    rtol=rtol, informe=informe, cache=cache, kepler=kepler)
+        if 'inyeccion' not in informe:
+            raise ValorInadmisibleError(dict(retardo=retardo), '.2f',
+                                        'tal que el lanzador llegue a la '
+                                        'inyección')
+        inyecciones[retardo] = informe['inyeccion']
+        return informe['inyeccion']['gamma']
+
+    try:
+        resultado = resolver(gamma_inyeccion, retardos[-1], paso,
+                             tol_f=GAMMA_INY_MIN, minimo=0)
+    except (ValorInadmisibleError, ConvergenciaError):
+        return (np.nan,) * 5
+    if not resultado.convergido:
+        return (np.nan,) * 5
+    inyeccion = inyecciones[resultado.raiz]
+    return (inyeccion['altitud'], inyeccion['velocidad'],
+            inyeccion['gamma'], inyeccion['vloss'], resultado.raiz)
+
+
+def evaluar(muestras_lanzamiento, cache, ejecutor, ajustes):
+    '''
+    Estados de inyección y retardos de la última etapa (filas de tipo
+    TIPO_INYECCION, ver inyectar()) de los lanzamientos de
+    <muestras_lanzamiento>. Los que no están en la cache <cache> se
+    integran en el ejecutor <ejecutor> (ProcessPoolExecutor) y se añaden a
+    ella. Devuelve la tupla (resultados, integrados).
+    '''
+    claves = [clave_simulacion(muestra, ajustes)
+              for muestra in muestras_lanzamiento]
+    pendientes = {}
+    for clave, muestra in zip(claves, muestras_lanzamiento):
+        if clave not in cache and clave not in pendientes:
+            pendientes[clave] = muestra
+    step_size, rtol, kepler, paso = ajustes
+    funcion = partial(inyectar, step_size=step_size, rtol=rtol, kepler=kepler,
+                      paso=paso)
+    nuevos = {}
+    for clave, fila in zip(pendientes, ejecutor.map(funcion,
+                                                    pendientes.values())):
+        nuevos[clave] = np.array(fila, dtype=TIPO_INYECCION)[()]
+    cache.guardar(nuevos)
+    return [cache[clave] for clave in claves], len(nuevos)
+
+
+def optimizar_lazo_cerrado(perdidas=V_PERDIDAS, tol=TOL_PERDIDAS,
+                           delta=DELTA_PERDIDAS, candidatos=CANDIDATOS,
+                           max_iteraciones=MAX_ITERACIONES, cache=None,
+                           procesos=None, step_size=DT, rtol=None,
+                           kepler=Q_KEPLER, paso=PASO_RETARDO, imprimir=True,
+                           **diseno):
+    '''
+    Busca las pérdidas V_perdidas para las que las pérdidas simuladas del
+    lanzador dimensionado con ellas coinciden con V_perdidas. Devuelve un
+    objeto ResultadoLazoCerrado.
+
+    perdidas : float
+        Estimación inicial de las pérdidas (m/s). Por defecto es
+        perdidas=V_PERDIDAS.
+
+    tol : float
+        Tolerancia en |vloss - V_perdidas| (m/s). Por defecto es
+        tol=TOL_PERDIDAS.
+
+    delta : float
+        Separación entre los candidatos de cada iteración (m/s). Por
+        defecto es delta=DELTA_PERDIDAS.
+
+    candidatos : int
+        Número de candidatos integrados en cada iteración (V_perdidas,
+        V_perdidas + delta, ...). Por defecto es candidatos=CANDIDATOS.
+
+    max_iteraciones : int
+        Número máximo de iteraciones. Si se agota, se produce un error
+        ConvergenciaError. Por defecto es max_iteraciones=MAX_ITERACIONES.
+
+    cache : object
+        Objeto CacheSimulaciones. Si cache=None, se usa el archivo
+        ARCHIVO_CACHE. Por defecto es cache=None.
+
+    procesos : int
+        Número de procesos. Si procesos=None, se usan tantos como
+        candidatos (sin superar el número de núcleos).
+
+    step_size, rtol, kepler : float
+        Parámetros de la integración (ver montecarlo.caso()).
+
+    paso : float
+        Salto inicial de la búsqueda del retardo de la última etapa (ver
+        inyectar()). Por defecto es paso=PASO_RETARDO.
+
+    imprimir : bool
+        Indica si se imprime el avance de cada iteración. Por defecto es
+        imprimir=True.
+
+    diseno
+        Parámetros adicionales de disenar() (isps, estructuras, masa_total,
+        v_lanzamiento, altitud_orbita).
+    '''
+    if cache is None:
+        cache = CacheSimulaciones()
+    if procesos is None:
+        procesos = min(candidatos, cpu_count() or 1)
+    ajustes = (step_size, rtol, kepler, paso)
+    historial = []
+    simulaciones = 0
+    with ProcessPoolExecutor(max_workers=procesos) as ejecutor:
+        for iteracion in range(1, max_iteraciones + 1):
+            estimaciones = perdidas + delta * np.arange(candidatos)
+            disenos = [disenar(estimacion, **diseno)
+                       for estimacion in estimaciones]
+            resultados, integrados = evaluar([muestra for reparto, muestra
+                                              in disenos], cache, ejecutor,
+                                             ajustes)
+            simulaciones += integrados
+            vloss = np.array([float(fila['vloss']) for fila in resultados])
+            gam_iny = np.array([float(fila['gam_iny'])
+                                for fila in resultados])
+            # Solo sirven las pérdidas de las trayectorias que inyectan (nan
+            # si no se ha encontrado el retardo de la última etapa).
+            if not (np.abs(gam_iny) <= GAMMA_INY_MIN).all():
+                raise ValorInadmisibleError(dict(perdidas=perdidas), '.1f',
+                                            'tal que el lanzador llegue a '
+                                            'la inyección con |gam_iny| <= '
+                                            'GAMMA_INY_MIN')
+            historial.extend(zip(estimaciones, vloss))
+            residuos = vloss - estimaciones
+            if imprimir:
+                print('Iteración {0}: V_perdidas = {1:.2f} m/s, vloss = '
+                      '{2:.2f} m/s, retardo = {3:.2f} s, carga de pago = '
+                      '{4:.3f} kg ({5} candidatos integrados)'
+                      .format(iteracion, perdidas, vloss[0],
+                              float(resultados[0]['retardo']),
+                              disenos[0][0].masa_pago, integrados))
+            if abs(residuos[0]) <= tol:
+                reparto, muestra = disenos[0]
+                muestra['RETARDOS_IN'][-1] = resultados[0]['retardo']
+                return ResultadoLazoCerrado(perdidas, reparto, muestra,
+                                            resultados[0], iteracion,
+                                            simulaciones, historial)
+            # Raíz del ajuste lineal del residuo sobre los candidatos
+            pendiente, ordenada = np.polyfit(estimaciones, residuos, 1)
+            if pendiente >= 0:
+                # Las pérdidas crecen más rápido que la estimación: se
+                # recurre a la iteración de punto fijo.
+                perdidas = float(vloss[0])
+            else:
+                perdidas = float(-ordenada / pendiente)
+    raise ConvergenciaError('lazo cerrado', len(historial))
+
+
+if __name__ == '__main__':
+    TIME = time()
+    RESULTADO = optimizar_lazo_cerrado(procesos=None)
+    print('\nPérdidas: {0:.2f} m/s en {1} iteraciones ({2} candidatos '
+          'integrados)'.format(RESULTADO.perdidas, RESULTADO.iteraciones,
+                               RESULTADO.simulaciones))
+    print(RESULTADO.reparto.informe())
+    print('Inyección: altitud {0:.1f} km, velocidad {1:.1f} m/s, gamma '
+          '{2:.3f} deg (retardo de la última etapa {3:.2f} s)'
+          .format(RESULTADO.inyeccion['altitud'] / 1000,
+                  RESULTADO.inyeccion['velocidad'],
+                  RESULTADO.inyeccion['gam_iny'],
+                  RESULTADO.inyeccion['retardo']))
+    print('\nTiempo de ejecución: ' + format(time() - TIME, '.4f') + ' s')
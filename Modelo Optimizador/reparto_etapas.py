@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+"""
+@author: Team REOS
+
+Módulo que contiene el reparto óptimo de la masa de un lanzador entre sus
+etapas por el método de los multiplicadores de Lagrange, para un número
+cualquiera de etapas.
+
+Con la velocidad de eyección c_i = g Isp_i y la razón estructural e_i de
+cada etapa, la razón de masas óptima de la etapa i en función del
+multiplicador lamda es
+
+    r_i = (1 + lamda c_i) / (e_i lamda c_i),
+
+y lamda se obtiene de la condición de velocidad de inyección
+
+    sum(c_i ln(r_i)) = V_inyeccion.
+
+Con el cambio w = -1/lamda, r_i = (1 - w/c_i) / e_i y la condición queda
+f(w) = sum(c_i ln(1 - w/c_i)) - sum(c_i ln(e_i)) - V_inyeccion = 0, con
+f decreciente y cóncava en el intervalo 0 < w < min((1 - e_i) c_i), en
+cuyos extremos se conoce el signo de f (la razón de masas de alguna etapa
+se hace igual a 1 en el extremo superior). El método de Newton partiendo
+del extremo superior converge entonces de forma monótona sin salir del
+intervalo, de modo que no hace falta resolver la ecuación simbólicamente.
+
+Las funciones *_vectorizado resuelven a la vez mallas completas de
+impulsos específicos, razones estructurales, masas y velocidades de
+inyección (por ejemplo, para mapas de carga de pago en función de la
+altitud de la órbita y de las pérdidas), iterando el mismo método de
+Newton sobre arrays. Los casos sin solución dan nan en lugar de un error.
+"""
+
+from collections import namedtuple
+from math import log
+
+import numpy as np
+from numpy import asarray, empty, sqrt
+
+from errores import ValorInadmisibleError, ConvergenciaError
+
+GRAVEDAD = 9.81  # m/s**2
+MU_TIERRA = 3.986e14  # Parámetro gravitacional estándar (m**3/s**2)
+RADIO_TIERRA = 6378140  # Radio de la Tierra (m)
+ALTITUD_ORBITA = 567000  # Altitud de la órbita por defecto (m)
+V_PERDIDAS = 1200  # Pérdidas aerodinámicas y gravitatorias por defecto (m/s)
+TOL_MULTIPLICADOR = 1e-13  # Tolerancia relativa en w = -1/lamda
+MAX_ITERACIONES = 50  # Número máximo de iteraciones de Newton
+
+
+class RepartoEtapas(namedtuple('RepartoEtapas',
+                               ['multiplicador', 'razones_masa',
+                                'masas_escalon', 'masas_etapa',
+                                'masas_propulsante', 'masa_pago'])):
+    '''
+    Reparto óptimo de masas entre las etapas de un lanzador.
+
+    Atributos
+    ---------
+    multiplicador : float
+        Multiplicador de Lagrange lamda (s/m).
+
+    razones_masa : array
+        Razón de masas r_i de cada etapa (masa del escalón al encender la
+        etapa entre la masa al apagarla).
+
+    masas_escalon : array
+        Masa de cada escalón (la etapa y todo lo que lleva encima) (kg).
+
+    masas_etapa : array
+        Masa de cada etapa (estructura y propulsante) (kg).
+
+    masas_propulsante : array
+        Masa de propulsante de cada etapa (kg).
+
+    masa_pago : float
+        Masa de la carga de pago (kg).
+    '''
+    __slots__ = ()
+
+    def informe(self):
+        '''
+        Devuelve un texto con las masas de cada etapa y de la carga de
+        pago.
+        '''
+        lineas = ['Multiplicador lambda = {0:.6g} s/m'
+                  .format(self.multiplicador)]
+        for i, (escalon, etapa, propulsante) in enumerate(
+                zip(self.masas_escalon, self.masas_etapa,
+                    self.masas_propulsante)):
+            lineas.append('Etapa {0}: escalón {1:.1f} kg, etapa {2:.1f} kg, '
+                          'propulsante {3:.1f} kg'
+                          .format(i + 1, escalon, etapa, propulsante))
+        lineas.append('Masa de carga de pago: {0:.2f} kg'
+                      .format(self.masa_pago))
+        return '\n'.join(lineas)
+
+
+def velocidad_inyeccion(v_lanzamiento, altitud_orbita=ALTITUD_ORBITA,
+                        v_perdidas=V_PERDIDAS):
+    '''
+    Velocidad total que han de proporcionar las etapas (m/s): la velocidad
+    de la órbita circular menos la de lanzamiento más las pérdidas. Los
+    parámetros pueden ser arrays (se combinan por broadcasting).
+
+    v_lanzamiento : float
+        Velocidad del lanzador al separarse del avión (m/s).
+
+    altitud_orbita : float
+        Altitud de la órbita circular (m). Por defecto es
+        altitud_orbita=ALTITUD_ORBITA.
+
+    v_perdidas : float
+        Pérdidas aerodinámicas y gravitatorias (m/s). Por defecto es
+        v_perdidas=V_PERDIDAS.
+    '''
+    v_orbita = sqrt(MU_TIERRA / (RADIO_TIERRA + altitud_orbita))
+    return v_orbita - v_lanzamiento + v_perdidas
+
+
+def multiplicador(isps, estructuras, v_inyeccion, tol=TOL_MULTIPLICADOR,
+                  max_iteraciones=MAX_ITERACIONES):
+    '''
+    Resuelve la condición de velocidad de inyección y devuelve el
+    multiplicador de Lagrange lamda (s/m).
+
+    isps : array
+        Impulso específico de cada etapa (s).
+
+    estructuras : array
+        Razón estructural de cada etapa.
+
+    v_inyeccion : float
+        Velocidad que han de proporcionar las etapas (m/s).
+
+    tol : float
+        Tolerancia relativa en w = -1/lamda. Por defecto es
+        tol=TOL_MULTIPLICADOR.
+
+    max_iteraciones : int
+        Número máximo de iteraciones. Por defecto es
+        max_iteraciones=MAX_ITERACIONES.
+    '''
+    velocidades = [GRAVEDAD * float(isp) for isp in isps]
+    estructuras = [float(e) for e in estructuras]
+    if len(velocidades) != len(estructuras) or not velocidades:
+        raise ValueError('Ha de haber un impulso específico y una razón '
+                         'estructural por etapa.')
+    if not all(0 < e < 1 for e in estructuras):
+        raise ValorInadmisibleError(dict(estructuras=estructuras), '',
+                                    'mayor que 0 y menor que 1')
+    constante = sum(c * log(e) for c, e in zip(velocidades, estructuras))
+
+    def funcion(w):
+        return (sum(c * log(1 - w / c) for c in velocidades) - constante
+                - v_inyeccion)
+
+    # Con w = 0 las etapas no llevarían carga de pago; con w = w_max la
+    # razón de masas de alguna etapa es 1 (la etapa no aporta nada).
+    if funcion(0) <= 0:
+        v_maxima = -constante
+        raise ValorInadmisibleError(dict(v_inyeccion=v_inyeccion), '.1f',
+                                    'menor que {0:.1f} m/s (límite con {1} '
+                                    'etapas)'.format(v_maxima,
+                                                     len(velocidades)))
+    w_max = min((1 - e) * c for c, e in zip(velocidades, estructuras))
+    f = funcion(w_max)
+    if f >= 0:
+        raise ValorInadmisibleError(dict(v_inyeccion=v_inyeccion), '.1f',
+                                    'mayor para aprovechar las {0} etapas'
+                                    .format(len(velocidades)))
+
+    # Newton desde el extremo superior: f es decreciente y cóncava, por lo
+    # que las iteraciones se acercan a la raíz sin sobrepasarla (f < 0 en
+    # todas ellas salvo por el redondeo, ya en la raíz).
+    w = w_max
+    for iteracion in range(max_iteraciones):
+        if f >= 0:
+            return -1 / w
+        salto = f / sum(-1 / (1 - w / c) for c in velocidades)
+        w -= salto
+        if salto <= tol * w:
+            return -1 / w
+        f = funcion(w)
+    raise ConvergenciaError('Newton', max_iteraciones)
+
+
+def reparto_etapas(isps, estructuras, masa_total, v_inyeccion):
+    '''
+    Reparto óptimo de la masa total <masa_total> (kg) entre las etapas de
+    impulsos específicos <isps> (s) y razones estructurales <estructuras>
+    para proporcionar la velocidad <v_inyeccion> (m/s). Devuelve un objeto
+    RepartoEtapas.
+    '''
+    isps = asarray(isps, dtype=float)
+    estructuras = asarray(estructuras, dtype=float)
+    lamda = multiplicador(isps, estructuras, v_inyeccion)
+    velocidades = GRAVEDAD * isps
+    razones = (1 + lamda * velocidades) / (estructuras * lamda * velocidades)
+    # Razón entre la masa de cada escalón y la del siguiente
+    razones_escalon = razones * (1 - estructuras) / (1 - razones * estructuras)
+    masas = empty(len(isps) + 1)
+    masas[0] = masa_total
+    for i, razon in enumerate(razones_escalon):
+        masas[i + 1] = masas[i] / razon
+    masas_etapa = masas[:-1] - masas[1:]
+    return RepartoEtapas(lamda, razones, masas[:-1], masas_etapa,
+                         masas_etapa * (1 - estructuras), float(masas[-1]))
+
+
+def multiplicador_vectorizado(isps, estructuras, v_inyeccion,
+                              tol=TOL_MULTIPLICADOR,
+                              max_iteraciones=MAX_ITERACIONES):
+    '''
+    Versión vectorizada de multiplicador(). Devuelve un array con el
+    multiplicador de Lagrange lamda (s/m) de cada caso, que es nan en los
+    casos sin solución (velocidad inalcanzable, etapas que no aportan nada
+    o razones estructurales fuera de (0, 1)).
+
+    isps, estructuras : array
+        Impulsos específicos (s) y razones estructurales, con las etapas en
+        el último eje. El resto de los ejes se combina por broadcasting con
+        los de v_inyeccion.
+
+    v_inyeccion : float o array
+        Velocidad que han de proporcionar las etapas (m/s).
+
+    tol, max_iteraciones
+        Ver multiplicador().
+    '''
+    velocidades, estructuras = np.broadcast_arrays(
+        GRAVEDAD * asarray(isps, dtype=float),
+        asarray(estructuras, dtype=float))
+    v_inyeccion = asarray(v_inyeccion, dtype=float)
+    forma = np.broadcast_shapes(velocidades.shape[:-1], v_inyeccion.shape)
+    velocidades = np.broadcast_to(velocidades,
+                                  forma + velocidades.shape[-1:])
+    estructuras = np.broadcast_to(estructuras, velocidades.shape)
+    v_inyeccion = np.broadcast_to(v_inyeccion, forma)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        constante = np.sum(velocidades * np.log(estructuras), axis=-1)
+
+        def funcion(w):
+            return (np.sum(velocidades * np.log1p(-w[..., np.newaxis]
+                                                  / velocidades), axis=-1)
+                    - constante - v_inyeccion)
+
+        # Mismas comprobaciones que en multiplicador(): f(0) > 0 y
+        # f(w_max) < 0; los casos que no las cumplen quedan como nan.
+        w = np.min((1 - estructuras) * velocidades, axis=-1)
+        f = funcion(w)
+        valido = ((-constante - v_inyeccion > 0) & (f < 0)
+                  & np.all((estructuras > 0) & (estructuras < 1), axis=-1))
+        w = np.where(valido, w, np.nan)
+        f = np.where(valido, f, np.nan)
+
+        for iteracion in range(max_iteraciones):
+            activo = f < 0
+            if not activo.any():
+                return -1 / w
+            salto = f / -np.sum(1 / (1 - w[..., np.newaxis] / velocidades),
+                                axis=-1)
+            w = np.where(activo, w - salto, w)
+            sigue = activo & (salto > tol * w)
+            f = np.where(sigue, funcion(w), np.where(valido, 0, np.nan))
+    raise ConvergenciaError('Newton vectorizado', max_iteraciones)
+
+
+def reparto_vectorizado(isps, estructuras, masa_total, v_inyeccion):
+    '''
+    Versión vectorizada de reparto_etapas(). Devuelve un objeto
+    RepartoEtapas cuyos atributos son arrays: el multiplicador y la masa de
+    pago tienen la forma común de los casos, y las masas y razones de cada
+    etapa tienen además las etapas en el último eje. Los casos sin solución
+    son nan.
+
+    isps, estructuras : array
+        Impulsos específicos (s) y razones estructurales, con las etapas en
+        el último eje.
+
+    masa_total, v_inyeccion : float o array
+        Masa total del lanzador (kg) y velocidad que han de proporcionar
+        las etapas (m/s).
+
+    Ejemplo: mapa de carga de pago en función de la altitud de la órbita
+    (filas) y de las pérdidas (columnas)
+
+    >>> v = velocidad_inyeccion(V_inicial, altitudes[:, np.newaxis],
+    ...                         perdidas[np.newaxis, :])
+    >>> reparto_vectorizado(ISPS, ESTRUCTURAS, MASA_TOTAL, v).masa_pago
+    '''
+    isps = asarray(isps, dtype=float)
+    estructuras = asarray(estructuras, dtype=float)
+    lamda = multiplicador_vectorizado(isps, estructuras, v_inyeccion)
+    w = (-1 / lamda)[..., np.newaxis]
+    velocidades = GRAVEDAD * isps
+    razones = (1 - w / velocidades) / estructuras
+    # Razón entre la masa de cada escalón y la del siguiente (el
+    # denominador 1 - r_i e_i es igual a w / c_i)
+    razones_escalon = razones * (1 - estructuras) * velocidades / w
+    masa_total = asarray(masa_total, dtype=float)[..., np.newaxis]
+    fracciones = np.cumprod(1 / razones_escalon, axis=-1)
+    masas = masa_total * np.concatenate(
+        (np.ones_like(fracciones[..., :1]), fracciones), axis=-1)
+    masas_etapa = masas[..., :-1] - masas[..., 1:]
+    return RepartoEtapas(lamda, razones, masas[..., :-1], masas_etapa,
+                         masas_etapa * (1 - estructuras), masas[..., -1])